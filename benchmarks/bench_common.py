@@ -0,0 +1,230 @@
+"""
+Dati sintetici e misure condivisi dai benchmark (e da database/check_query_plans.py).
+
+  - synthetic_catalog: catalogo in memoria con la forma di catalog.load_catalog, per i benchmark
+    che non usano il database
+  - create_synthetic_schema: schema PostgreSQL temporaneo creato con database_setup.sql (stesse
+    tabelle, indici e recipe_stats del database reale) e popolato con ricette, ingredienti e utenti
+    sintetici; insert_recipes / insert_recipe_ingredients aggiungono ricette a uno schema esistente
+  - median_ms / median_us: latenza mediana di una funzione su più ripetizioni
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from recommendation.catalog import Catalog  # noqa: E402
+
+SETUP_SCRIPT = PROJECT_ROOT / "database" / "database_setup.sql"
+
+CATEGORIES = ("Antipasto", "Primo Piatto", "Secondo Piatto", "Pasto Completo", "Torta Salata")
+WORDS = (
+    "pasta", "riso", "pollo", "manzo", "pesce", "verdure", "funghi", "zucca", "tonno", "ricotta",
+    "forno", "fritto", "grigliato", "al sugo", "in crosta", "alla griglia", "rustico", "classico",
+)
+
+
+def median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    return sorted(times)[len(times) // 2]
+
+
+def median_us(fn, repeat: int) -> float:
+    return median_ms(fn, repeat) * 1000
+
+
+def synthetic_catalog(
+    n_recipes: int,
+    n_ingredients: int,
+    per_recipe: int,
+    n_classes: int = 40,
+    n_metaclasses: int = 12,
+    seed: int = 42,
+    skew: float = 0.0,
+) -> Catalog:
+    """
+    Catalogo in memoria con la stessa forma di load_catalog (ingredienti distinti per ricetta).
+    Con skew > 0 la popolarità degli ingredienti segue una legge di Zipf con quell'esponente
+    (pochi ingredienti comuni come sale e olio, molti rari); con 0 è uniforme. Costo (1-5),
+    difficoltà (1-4) e tempo di preparazione (5-180 min) sono casuali, assenti (-1) nel 5% dei casi.
+    """
+    rng = np.random.default_rng(seed)
+    words = np.array(WORDS)
+    titles = rng.choice(words, size=(n_recipes, 2))
+    recipe_ids = np.arange(1, n_recipes + 1, dtype=np.int64)
+    ingredient_ids = np.arange(1, n_ingredients + 1, dtype=np.int64)
+    class_ids = rng.integers(1, n_classes + 1, size=n_ingredients).astype(np.int32)
+    metaclass_of_class = rng.integers(1, n_metaclasses + 1, size=n_classes + 1).astype(np.int32)
+    popularity = None
+    if skew > 0:
+        popularity = 1.0 / np.arange(1, n_ingredients + 1) ** skew
+        popularity /= popularity.sum()
+    positions = np.stack(
+        [np.sort(rng.choice(n_ingredients, size=per_recipe, replace=False, p=popularity)) for _ in range(n_recipes)]
+    )
+    quantities = rng.integers(1, 6, size=n_recipes * per_recipe).astype(np.int32)
+
+    def facet(low: int, high: int) -> np.ndarray:
+        values = rng.integers(low, high + 1, size=n_recipes).astype(np.int32)
+        values[rng.random(n_recipes) < 0.05] = -1
+        return values
+
+    cost, difficulty, preparation_time = facet(1, 5), facet(1, 4), 5 * facet(1, 36)
+    preparation_time[preparation_time < 0] = -1
+    return Catalog(
+        recipe_ids=recipe_ids,
+        recipe_names=[f"{a.capitalize()} {b}" for a, b in titles],
+        recipe_links=[""] * n_recipes,
+        category_names=[CATEGORIES[i % len(CATEGORIES)] for i in range(1, n_recipes + 1)],
+        category_ids=(1 + recipe_ids % len(CATEGORIES)).astype(np.int32),
+        cost=cost,
+        difficulty=difficulty,
+        preparation_time=preparation_time,
+        image_paths=[None] * n_recipes,
+        ingredient_ids=ingredient_ids,
+        ingredient_names=[f"Ingrediente {g}" for g in ingredient_ids],
+        ingredient_class_ids=class_ids,
+        ingredient_metaclass_ids=metaclass_of_class[class_ids],
+        ri_indptr=np.arange(0, n_recipes * per_recipe + 1, per_recipe, dtype=np.int64),
+        ri_ingredients=positions.ravel().astype(np.int32),
+        ri_quantities=quantities,
+    )
+
+
+def create_synthetic_schema(
+    conn,
+    schema: str,
+    n_recipes: int,
+    n_ingredients: int,
+    per_recipe: int,
+    n_classes: int = 1,
+    categories: Sequence[str] = CATEGORIES,
+    n_users: int = 1,
+    owned: int = 0,
+    favorites: int = 0,
+) -> int:
+    """
+    Crea lo schema con database_setup.sql e lo popola: n_classes classi di ingredienti, le categorie
+    (category_id = posizione da 1 in categories, ricetta g nella categoria 1 + g % len(categories)),
+    n_recipes ricette (vedi insert_recipes) e n_users utenti con fino a owned ingredienti posseduti e
+    favorites preferiti casuali. Aggiorna recipe_stats ed esegue VACUUM ANALYZE sulle tabelle dello
+    schema (statistiche e visibility map, come farebbe autovacuum). Ritorna lo user_id del primo utente.
+    """
+    with conn.cursor() as cur:
+        cur.execute(f"CREATE SCHEMA {schema}")
+        cur.execute(f"SET search_path TO {schema}")
+        cur.execute(SETUP_SCRIPT.read_text(encoding="utf-8"))
+        cur.execute("SELECT setseed(0.42)")
+        cur.execute("INSERT INTO ingredients_metaclasses VALUES (1, 'Metaclasse')")
+        cur.execute(
+            """
+            INSERT INTO ingredient_classes (class_id, class_name, metaclass_id)
+            SELECT g, 'Classe ' || g, 1 FROM generate_series(1, %s) g
+            """,
+            (n_classes,),
+        )
+        cur.execute(
+            """
+            INSERT INTO ingredients (ingredient_id, ingredient_name, class_id)
+            SELECT g, 'Ingrediente ' || g, 1 + g %% %s FROM generate_series(1, %s) g
+            """,
+            (n_classes, n_ingredients),
+        )
+        cur.execute(
+            """
+            INSERT INTO recipe_categories (category_id, category_name)
+            SELECT g, (%s::text[])[g] FROM generate_series(1, %s) g
+            """,
+            (list(categories), len(categories)),
+        )
+        insert_recipes(cur, 1, n_recipes, n_ingredients, per_recipe, categories)
+        cur.execute(
+            """
+            INSERT INTO users (user_id, name, surname, nickname)
+            SELECT g, 'Utente', 'Bench', 'bench_' || g FROM generate_series(1, %s) g
+            """,
+            (n_users,),
+        )
+        cur.execute(
+            """
+            INSERT INTO user_owned_ingredients (user_id, ingredient_id)
+            SELECT u, 1 + floor(random() * %s)::int
+            FROM generate_series(1, %s) u, generate_series(1, %s) k
+            ON CONFLICT DO NOTHING
+            """,
+            (n_ingredients, n_users, owned),
+        )
+        cur.execute(
+            """
+            INSERT INTO user_selected_recipes (user_id, recipe_id, selected_at)
+            SELECT u, 1 + floor(random() * %s)::int, NOW() - random() * INTERVAL '365 days'
+            FROM generate_series(1, %s) u, generate_series(1, %s) k
+            ON CONFLICT DO NOTHING
+            """,
+            (n_recipes, n_users, favorites),
+        )
+        cur.execute("REFRESH MATERIALIZED VIEW recipe_stats")
+        cur.execute(
+            "SELECT oid::regclass::text FROM pg_class WHERE relnamespace = %s::regnamespace AND relkind IN ('r', 'm')",
+            (schema,),
+        )
+        relations = [row[0] for row in cur.fetchall()]
+        cur.execute("SET search_path TO DEFAULT")
+    conn.commit()
+    # VACUUM non può girare in una transazione
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema}")
+            cur.execute(f"VACUUM ANALYZE {', '.join(relations)}")
+            cur.execute("SET search_path TO DEFAULT")
+    finally:
+        conn.autocommit = False
+    return 1
+
+
+def insert_recipes(
+    cur, first_id: int, last_id: int, n_ingredients: int, per_recipe: int, categories: Sequence[str] = CATEGORIES
+) -> None:
+    """
+    Ricette first_id..last_id (nello schema del search_path) con titolo di due parole casuali di
+    WORDS, costo, difficoltà e tempo di preparazione e per_recipe ingredienti casuali.
+    """
+    cur.execute(
+        """
+        INSERT INTO recipes (recipe_id, recipe_name, recipe_link, category_name, category_id,
+                             cost, difficulty, preparation_time, image_path)
+        SELECT g,
+               initcap(w[1 + floor(random() * cardinality(w))::int]) || ' '
+                   || w[1 + floor(random() * cardinality(w))::int] || ' ' || g,
+               'https://ricette.giallozafferano.it/Ricetta-sintetica-' || g,
+               (%s::text[])[1 + g %% %s], 1 + g %% %s, 1 + g %% 5, 1 + g %% 4, 10 + g %% 120,
+               'images/' || g || '.jpg'
+        FROM generate_series(%s, %s) g, (SELECT %s::text[] AS w) words
+        """,
+        (list(categories), len(categories), len(categories), first_id, last_id, list(WORDS)),
+    )
+    insert_recipe_ingredients(cur, first_id, last_id, n_ingredients, per_recipe)
+
+
+def insert_recipe_ingredients(cur, first_id: int, last_id: int, n_ingredients: int, per_recipe: int) -> None:
+    """per_recipe ingredienti casuali (quantità 1-5) per le ricette first_id..last_id."""
+    cur.execute(
+        """
+        INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity)
+        SELECT r, 1 + floor(random() * %s)::int, 1 + floor(random() * 5)::int
+        FROM generate_series(%s, %s) r, generate_series(1, %s) k
+        ON CONFLICT DO NOTHING
+        """,
+        (n_ingredients, first_id, last_id, per_recipe),
+    )
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark dei filtri a faccette (recommendation.facet_index).
+
+Per ogni dimensione genera in memoria un catalogo sintetico (vedi bench_common.py) con
+costo, difficoltà e tempo di preparazione casuali, poi per alcune combinazioni di filtri misura la
+latenza mediana di una ricerca completa (risultato e conteggi di tutte le faccette) su tre ambiti:
+la categoria, le ricette della categoria a cui mancano al massimo --max-missing ingredienti
+(indice bitmap del frigo, con un frigo di --owned ingredienti) e le stesse contando i sostituti
+della stessa classe (OwnedRatioEngine.match, l'ambito della pagina in modalità "class"):
+  - bitmap:  FacetIndex.search (intervalli da bitmap cumulative, conteggi con popcount)
+  - dense:   riferimento con maschere booleane (R,) e bincount per faccetta
+Verifica che risultato e conteggi coincidano con il riferimento. Non usa il database.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_facet_index.py [--sizes 1000 10000 50000 100000] [--owned 30]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import median_us, synthetic_catalog  # noqa: E402
+from recommendation.facet_index import FACETS, FacetIndex  # noqa: E402
+from recommendation.fridge_index import FridgeIndex, unpack_bits  # noqa: E402
+from recommendation.ranking import OwnedRatioEngine  # noqa: E402
+
+# Combinazioni di filtri misurate: (nome, {faccetta: (minimo, massimo)})
+FILTERS = (
+    ("nessuno", {}),
+    ("tempo<=30", {"preparation_time": (None, 30)}),
+    ("tempo<=30,diff<=2", {"preparation_time": (None, 30), "difficulty": (None, 2)}),
+    ("tutte", {"preparation_time": (20, 60), "difficulty": (None, 2), "cost": (2, 4)}),
+)
+
+
+def dense_search(catalog, scope: np.ndarray, filters):
+    """Riferimento: maschere booleane e conteggi per valore con gli altri filtri applicati."""
+    masks = {}
+    for name, (lo, hi) in filters.items():
+        column = getattr(catalog, name)
+        mask = column >= 0
+        if lo is not None:
+            mask &= column >= lo
+        if hi is not None:
+            mask &= column <= hi
+        masks[name] = mask
+    counts = {}
+    for name in FACETS:
+        others = scope.copy()
+        for other, mask in masks.items():
+            if other != name:
+                others &= mask
+        column = getattr(catalog, name)
+        values = np.unique(column[column >= 0])
+        counts[name] = np.bincount(np.searchsorted(values, column[others & (column >= 0)]), minlength=values.size)
+    result = scope.copy()
+    for mask in masks.values():
+        result &= mask
+    return result, counts
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--owned", type=int, default=30)
+    parser.add_argument("--max-missing", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    category_id = 2
+    mismatches = 0
+    print(f"{'ricette':>8} {'build ms':>9} {'ambito':>9} {'filtri':>18} {'risultati':>9} {'bitmap µs':>10} {'dense µs':>9}")
+    for n in args.sizes:
+        catalog = synthetic_catalog(n, args.ingredients, args.per_recipe)
+        fridge_index = FridgeIndex(catalog)
+        t0 = time.perf_counter()
+        facet_index = FacetIndex(catalog)
+        build_ms = (time.perf_counter() - t0) * 1000
+        owned = rng.choice(catalog.ingredient_ids, size=args.owned, replace=False)
+        match = fridge_index.match(owned)
+        class_match = OwnedRatioEngine(catalog).match(owned, "class")
+        scopes = (
+            ("categoria", fridge_index.scope_bits(category_id)),
+            ("frigo", match.missing_at_most(args.max_missing, category_id)),
+            ("sostituti", class_match.missing_at_most(args.max_missing, category_id)),
+        )
+        for scope_name, scope in scopes:
+            scope_mask = unpack_bits(scope, n)
+            for filter_name, filters in FILTERS:
+                result = facet_index.search(scope, filters)
+                expected, expected_counts = dense_search(catalog, scope_mask, filters)
+                same = np.array_equal(fridge_index.rows(result.bits), np.flatnonzero(expected)) and all(
+                    np.array_equal(result.counts[name][1], expected_counts[name]) for name in FACETS
+                )
+                if not same:
+                    mismatches += 1
+                    print(f"  DIFFERENZA {scope_name}/{filter_name} su {n} ricette")
+                bitmap_us = median_us(lambda: facet_index.search(scope, filters), args.repeat)
+                dense_us = median_us(lambda: dense_search(catalog, scope_mask, filters), args.repeat)
+                print(
+                    f"{n:>8} {build_ms:>9.1f} {scope_name:>9} {filter_name:>18} {result.count:>9} "
+                    f"{bitmap_us:>10.0f} {dense_us:>9.0f}"
+                )
+
+    if mismatches:
+        print(f"ERRORE: {mismatches} ricerche diverse dal riferimento")
+        return 1
+    print("OK: risultati e conteggi delle faccette coincidono con il riferimento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
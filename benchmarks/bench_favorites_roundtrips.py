@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark di regressione: round trip verso PostgreSQL per un render della pagina preferiti.
+
+Crea uno schema temporaneo con un catalogo sintetico, assegna a un utente un numero
+crescente di preferiti e conta connessioni prese dal pool e query eseguite dal percorso dati della pagina
+(recommendation.favorites.fetch_favorites_with_ingredients). Il numero di round trip deve
+restare costante al crescere dei preferiti; in caso contrario lo script termina con codice 1.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_favorites_roundtrips.py [--sizes 1 10 100 1000]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import psycopg2
+import psycopg2.extensions
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import create_synthetic_schema, median_ms  # noqa: E402
+from recommendation import catalog, db, favorites  # noqa: E402
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+
+COUNTER = QueryCounter()
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        COUNTER.queries += 1
+        return super().execute(query, vars)
+
+
+def set_favorites(conn, schema: str, user_id: int, n: int) -> None:
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {schema}.user_selected_recipes WHERE user_id = %s", (user_id,))
+        cur.execute(
+            f"""
+            INSERT INTO {schema}.user_selected_recipes (user_id, recipe_id)
+            SELECT %s, g FROM generate_series(1, %s) g
+            """,
+            (user_id, n),
+        )
+    conn.commit()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 50, 200, 1000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    schema = f"bench_fav_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(**db.DB_CONFIG)
+    pool = db.init_pool(options=f"-c search_path={schema}", cursor_factory=CountingCursor)
+    results = []
+    try:
+        user_id = create_synthetic_schema(admin, schema, max(args.sizes), n_ingredients=500, per_recipe=8)
+        print(f"{'preferiti':>10} {'connessioni':>12} {'query':>6} {'ms (cold)':>10} {'ms (warm)':>10}")
+        for n in args.sizes:
+            set_favorites(admin, schema, user_id, n)
+
+            # render "a freddo": cache ingredienti vuota, versione catalogo da rileggere
+            catalog.invalidate_catalog()
+            checkouts_before, COUNTER.queries = pool.stats()["checkouts"], 0
+            t0 = time.perf_counter()
+            favs, ing_by_recipe = favorites.fetch_favorites_with_ingredients(user_id)
+            cold_ms = (time.perf_counter() - t0) * 1000
+            assert len(favs) == n and len(ing_by_recipe) == n
+            connections, queries = pool.stats()["checkouts"] - checkouts_before, COUNTER.queries
+
+            warm_ms = median_ms(lambda: favorites.fetch_favorites_with_ingredients(user_id), args.repeat)
+
+            results.append((n, connections, queries))
+            print(f"{n:>10} {connections:>12} {queries:>6} {cold_ms:>10.2f} {warm_ms:>10.2f}")
+    finally:
+        db.close_pool()
+        admin.rollback()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        admin.commit()
+        admin.close()
+
+    baseline = results[0][1:]
+    regressions = [r for r in results if r[1:] != baseline]
+    if regressions:
+        print(f"REGRESSIONE: round trip non costanti al crescere dei preferiti: {regressions}")
+        return 1
+    print(f"OK: {baseline[0]} prestiti dal pool / {baseline[1]} query per render, indipendenti dal numero di preferiti")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark dell'indice bitmap del frigo (recommendation.fridge_index).
+
+Per ogni dimensione genera in memoria un catalogo sintetico (vedi bench_common.py) e un
+frigo di --owned ingredienti casuali, poi misura la latenza mediana di una query completa
+(bitmap del frigo, owned_count bit-sliced e confronto con la soglia, filtro categoria):
+  - makeable:    ricette con tutti gli ingredienti
+  - missing<=k:  ricette a cui mancano al massimo --max-missing ingredienti
+  - ratio>=t:    ricette con owned_ratio >= --min-ratio
+  - matvec:      riferimento con OwnedRatioEngine (prodotto matrice-vettore + maschere)
+Verifica che i tre insiemi coincidano con quelli calcolati da OwnedRatioEngine, poi esegue le
+stesse query da --threads thread in parallelo sull'indice condiviso e riporta throughput e p99.
+Non usa il database.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_fridge_index.py [--sizes 1000 10000 50000] [--owned 30] [--threads 1 8]
+"""
+
+import argparse
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import median_us, synthetic_catalog  # noqa: E402
+from recommendation.fridge_index import FridgeIndex  # noqa: E402
+from recommendation.ranking import OwnedRatioEngine  # noqa: E402
+
+
+def concurrent_queries(index: FridgeIndex, fridges, category_id: int, n_threads: int, per_thread: int):
+    """Throughput (query/s) e latenza p99 (µs) con n_threads thread che interrogano lo stesso indice."""
+    latencies = [[] for _ in range(n_threads)]
+    barrier = threading.Barrier(n_threads + 1)
+
+    def worker(t: int) -> None:
+        barrier.wait()
+        for q in range(per_thread):
+            t0 = time.perf_counter()
+            index.count(index.match(fridges[(t + q) % len(fridges)]).makeable(category_id))
+            latencies[t].append((time.perf_counter() - t0) * 1e6)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for th in threads:
+        th.start()
+    barrier.wait()
+    t0 = time.perf_counter()
+    for th in threads:
+        th.join()
+    elapsed = time.perf_counter() - t0
+    all_latencies = np.concatenate([np.asarray(lat) for lat in latencies])
+    return n_threads * per_thread / elapsed, float(np.percentile(all_latencies, 99))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--owned", type=int, default=30)
+    parser.add_argument("--max-missing", type=int, default=2)
+    parser.add_argument("--min-ratio", type=float, default=0.5)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    category_id = 2
+    mismatches = 0
+    print(f"{'ricette':>8} {'build ms':>9} {'makeable µs':>12} {'missing µs':>11} {'ratio µs':>9} {'matvec µs':>10}")
+    concurrency = []
+    for n in args.sizes:
+        catalog = synthetic_catalog(n, args.ingredients, args.per_recipe)
+        t0 = time.perf_counter()
+        index = FridgeIndex(catalog)
+        build_ms = (time.perf_counter() - t0) * 1000
+        engine = OwnedRatioEngine(catalog)
+        fridges = [rng.choice(catalog.ingredient_ids, size=args.owned, replace=False) for _ in range(16)]
+        owned = fridges[0]
+
+        # riferimento: owned_count da OwnedRatioEngine, stesse maschere in forma densa
+        owned_count = engine.owned_counts(engine.owned_vector(owned))
+        total = engine.total_count
+        ratio = np.zeros(n, dtype=np.float64)
+        np.divide(owned_count, total, out=ratio, where=total > 0)
+        scope = engine.category_mask(category_id) & (total > 0)
+        match = index.match(owned)
+        for name, got, expected in (
+            ("makeable", match.makeable(category_id), scope & (owned_count == total)),
+            ("missing", match.missing_at_most(args.max_missing, category_id), scope & (total - owned_count <= args.max_missing)),
+            ("ratio", match.ratio_at_least(args.min_ratio, category_id), scope & (ratio >= args.min_ratio)),
+        ):
+            if not np.array_equal(index.rows(got), np.flatnonzero(expected)):
+                mismatches += 1
+                print(f"  DIFFERENZA {name} su {n} ricette")
+
+        makeable_us = median_us(lambda: index.count(index.match(owned).makeable(category_id)), args.repeat)
+        missing_us = median_us(
+            lambda: index.count(index.match(owned).missing_at_most(args.max_missing, category_id)), args.repeat
+        )
+        ratio_us = median_us(
+            lambda: index.count(index.match(owned).ratio_at_least(args.min_ratio, category_id)), args.repeat
+        )
+
+        def matvec():
+            counts = engine.owned_counts(engine.owned_vector(owned))
+            return int((engine.category_mask(category_id) & (total > 0) & (counts == total)).sum())
+
+        matvec_us = median_us(matvec, args.repeat)
+        print(f"{n:>8} {build_ms:>9.1f} {makeable_us:>12.0f} {missing_us:>11.0f} {ratio_us:>9.0f} {matvec_us:>10.0f}")
+        concurrency.append((n, [concurrent_queries(index, fridges, category_id, t, args.repeat) for t in args.threads]))
+
+    print(f"\nQuery makeable concorrenti sull'indice condiviso ({args.repeat} per thread)")
+    print(f"{'ricette':>8} {'thread':>7} {'query/s':>9} {'p99 µs':>8}")
+    for n, results in concurrency:
+        for n_threads, (qps, p99) in zip(args.threads, results):
+            print(f"{n:>8} {n_threads:>7} {qps:>9.0f} {p99:>8.0f}")
+
+    if mismatches:
+        print(f"ERRORE: {mismatches} query diverse dal riferimento")
+        return 1
+    print("OK: le query bitmap coincidono con il riferimento")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
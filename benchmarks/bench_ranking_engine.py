@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark del ranking per percentuale di ingredienti posseduti: backend SQL contro motore in memoria.
+
+Per ogni dimensione crea uno schema temporaneo con un catalogo sintetico (ricette distribuite su
+alcune categorie, ingredienti casuali per ricetta) e un utente che possiede una parte degli
+ingredienti, poi misura la latenza mediana per richiesta (un click su una categoria):
+  - sql:     recommendation.ranking.fetch_top_recipes_by_owned_ratio
+  - memory:  query degli ingredienti posseduti + OwnedRatioEngine.top_recipes
+  - engine:  solo il calcolo in memoria (mat-vec, filtro categoria, top-K)
+Con --match-mode class conta anche i sostituti della stessa classe (gli ingredienti sono distribuiti
+su --classes classi): lato SQL TOP_RECIPES_BY_CLASS_RATIO_SQL, in memoria l'espansione sparsa per classe.
+Con --ratio-mode quantity owned_ratio pesa le quantità (casuali da 1 a 5) con i pesi di
+RANKING_CLASS_WEIGHTS: lato SQL TOP_RECIPES_BY_QUANTITY_RATIO_SQL, in memoria la matrice pesata.
+Verifica inoltre che i due backend restituiscano le stesse ricette con lo stesso owned_ratio.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_ranking_engine.py [--sizes 1000 10000 100000] [--repeat 20] [--match-mode class]
+        [--ratio-mode quantity]
+"""
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+import psycopg2
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import CATEGORIES, create_synthetic_schema, median_ms  # noqa: E402
+from recommendation import catalog, db, ranking  # noqa: E402
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--owned", type=int, default=300)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--classes", type=int, default=100)
+    parser.add_argument("--match-mode", choices=ranking.RANKING_MATCH_MODES, default="exact")
+    parser.add_argument("--ratio-mode", choices=ranking.RANKING_RATIO_MODES, default="count")
+    args = parser.parse_args()
+    mode, ratio_mode = args.match_mode, args.ratio_mode
+
+    def top(backend: str, user_id: int, category_id: int):
+        return ranking.top_recipes_by_owned_ratio(
+            user_id, category_id, args.limit, backend, mode, ratio_mode=ratio_mode
+        )
+
+    admin = psycopg2.connect(**db.DB_CONFIG)
+    mismatches = 0
+    print(f"{'ricette':>8} {'build ms':>9} {'sql ms':>8} {'memory ms':>10} {'engine ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        schema = f"bench_rank_{uuid.uuid4().hex[:8]}"
+        db.init_pool(options=f"-c search_path={schema}")
+        try:
+            user_id = create_synthetic_schema(
+                admin, schema, n, args.ingredients, args.per_recipe, n_classes=args.classes, owned=args.owned
+            )
+            catalog.invalidate_catalog()
+
+            t0 = time.perf_counter()
+            engine = ranking.get_ranking_engine()
+            build_ms = (time.perf_counter() - t0) * 1000
+            owned_ids = ranking.fetch_owned_ingredient_ids(user_id)
+
+            # category_id = posizione (da 1) del nome in CATEGORIES, come in create_synthetic_schema
+            for category_id, category in enumerate(CATEGORIES, start=1):
+                sql_rows = top("sql", user_id, category_id)
+                mem_rows = top("memory", user_id, category_id)
+                if [(r["recipe_id"], r["owned_ratio"]) for r in sql_rows] != [
+                    (r["recipe_id"], r["owned_ratio"]) for r in mem_rows
+                ]:
+                    mismatches += 1
+                    print(f"  DIFFERENZA in '{category}': sql={[r['recipe_id'] for r in sql_rows]} "
+                          f"memory={[r['recipe_id'] for r in mem_rows]}")
+
+            category_id = 2
+            sql_ms = median_ms(lambda: top("sql", user_id, category_id), args.repeat)
+            mem_ms = median_ms(lambda: top("memory", user_id, category_id), args.repeat)
+            engine_ms = median_ms(
+                lambda: engine.top_recipes(owned_ids, category_id, args.limit, mode, ratio_mode=ratio_mode),
+                args.repeat,
+            )
+            print(f"{n:>8} {build_ms:>9.1f} {sql_ms:>8.2f} {mem_ms:>10.2f} {engine_ms:>10.2f} {sql_ms / mem_ms:>7.1f}x")
+        finally:
+            db.close_pool()
+            catalog.invalidate_catalog()
+            admin.rollback()
+            with admin.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            admin.commit()
+
+    admin.close()
+    if mismatches:
+        print(f"ERRORE: {mismatches} categorie con risultati diversi tra i due backend")
+        return 1
+    print("OK: i due backend restituiscono le stesse ricette")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
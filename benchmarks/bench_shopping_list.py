@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark della lista della spesa (recommendation.shopping_list.suggest_purchases).
+
+Per ogni dimensione genera in memoria un catalogo sintetico con popolarità degli ingredienti di
+tipo Zipf (vedi bench_common.py) e alcuni frighi estratti secondo la stessa popolarità,
+poi per ogni budget misura la latenza mediana di:
+  - incremental: suggest_purchases (guadagni aggiornati con le sole chiavi cambiate dall'acquisto)
+  - naive:       stesso greedy in Python puro, ricalcolando a ogni passo il guadagno di tutti i pacchetti
+Verifica che i due piani coincidano e che le ricette sbloccate dichiarate corrispondano a quelle
+dell'indice bitmap con il frigo più gli ingredienti comprati. Sulla dimensione più piccola
+confronta anche con l'ottimo esatto (ricerca esaustiva sugli ingredienti rilevanti).
+Non usa il database.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_shopping_list.py [--sizes 1000 10000 50000] [--ingredients 500] [--budgets 1 3 5]
+"""
+
+import argparse
+import itertools
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import median_ms, synthetic_catalog  # noqa: E402
+from recommendation.fridge_index import FridgeIndex, FridgeMatch  # noqa: E402
+from recommendation.shopping_list import _candidate_residuals, suggest_purchases  # noqa: E402
+
+
+def _submasks(mask: int):
+    """Sottoinsiemi non vuoti di un bitset."""
+    sub = mask
+    while sub:
+        yield sub
+        sub = (sub - 1) & mask
+
+
+def _bits(mask: int):
+    return [b for b in range(mask.bit_length()) if mask >> b & 1]
+
+
+def naive_plan(match: FridgeMatch, budget: int):
+    """
+    Stesso greedy di suggest_purchases senza aggiornamenti incrementali: a ogni passo ricalcola il
+    guadagno di tutti i pacchetti dai residui correnti. Ritorna gli ingredienti comprati per passo.
+    """
+    slots, sizes, indptr, _members, relevant = _candidate_residuals(match, budget, None)
+    counts = np.diff(indptr)
+    bundles = [sum(1 << int(x) for x in row[:size]) for row, size in zip(slots, sizes)]
+    rows = {}
+    for bundle, count in zip(bundles, counts):
+        rows[bundle] = rows.get(bundle, 0) + int(count)
+
+    def gain(mask: int) -> int:
+        return sum(rows.get(sub, 0) for sub in _submasks(mask))
+
+    def plan_of(purchases):
+        return [sorted(int(match.index.catalog.ingredient_ids[relevant[b]]) for b in _bits(p)) for p in purchases]
+
+    initial = [(gain(b), -bin(b).count("1"), -i) for i, b in enumerate(bundles)]
+    single = bundles[-max(initial)[2]]
+    steps, bought, left, total = [], 0, budget, 0
+    while left > 0:
+        best = None
+        for i, bundle in enumerate(bundles):
+            mask = bundle & ~bought
+            size = bin(mask).count("1")
+            if 0 < size <= left:
+                g = gain(mask)
+                if g and (best is None or (-g / size, size, i) < best[0]):
+                    best = ((-g / size, size, i), mask, g)
+        if best is None:
+            break
+        _key, purchase, g = best
+        bought |= purchase
+        left -= bin(purchase).count("1")
+        total += g
+        steps.append(purchase)
+        for residual in [r for r in rows if r & purchase]:
+            count = rows.pop(residual)
+            rest = residual & ~purchase
+            if rest:
+                rows[rest] = rows.get(rest, 0) + count
+    if max(initial)[0] > total:
+        steps = [single]
+    return plan_of(steps)
+
+
+def exhaustive_best(index: FridgeIndex, owned, match: FridgeMatch, budget: int, max_combinations: int):
+    """Massimo di ricette sbloccabili con al massimo budget ingredienti (None se le combinazioni sono troppe)."""
+    _slots, _sizes, _indptr, _members, relevant = _candidate_residuals(match, budget, None)
+    if sum(math.comb(len(relevant), k) for k in range(1, budget + 1)) > max_combinations:
+        return None
+    base = index.count(match.makeable())
+    ids = index.catalog.ingredient_ids[relevant].tolist()
+    best = 0
+    for k in range(1, budget + 1):
+        for extra in itertools.combinations(ids, k):
+            best = max(best, index.count(index.match(list(owned) + list(extra)).makeable()) - base)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--ingredients", type=int, default=500)
+    parser.add_argument("--per-recipe", type=int, default=8)
+    parser.add_argument("--skew", type=float, default=1.0)
+    parser.add_argument("--owned", type=int, default=40)
+    parser.add_argument("--fridges", type=int, default=5)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-combinations", type=int, default=20000, help="limite per la ricerca esaustiva")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(11)
+    popularity = 1.0 / np.arange(1, args.ingredients + 1) ** args.skew
+    popularity /= popularity.sum()
+    failures = 0
+    print(f"{'ricette':>8} {'budget':>6} {'residui':>9} {'sbloccate':>9} {'incr ms':>8} {'naive ms':>9} {'speedup':>8} {'ottimo':>7}")
+    for size_pos, n in enumerate(args.sizes):
+        catalog = synthetic_catalog(n, args.ingredients, args.per_recipe, skew=args.skew)
+        index = FridgeIndex(catalog)
+        fridges = [
+            catalog.ingredient_ids[rng.choice(args.ingredients, size=args.owned, replace=False, p=popularity)]
+            for _ in range(args.fridges)
+        ]
+        for budget in args.budgets:
+            unlocked, candidates, incr, naive, optimum = [], [], [], [], []
+            for owned in fridges:
+                match = index.match(owned)
+                steps = suggest_purchases(match, budget)
+                bought = [i for s in steps for i in s["ingredient_ids"]]
+                claimed = sum(len(s["recipe_ids"]) for s in steps)
+                actual = index.count(index.match(list(owned) + bought).makeable()) - index.count(match.makeable())
+                plan = naive_plan(match, budget)
+                if claimed != actual or plan != [sorted(s["ingredient_ids"]) for s in steps]:
+                    failures += 1
+                    print(f"  DIFFERENZA: dichiarate {claimed}, effettive {actual}, piano {plan} contro {steps}")
+                unlocked.append(claimed)
+                candidates.append(_candidate_residuals(match, budget, None)[0].shape[0])
+                incr.append(median_ms(lambda: suggest_purchases(match, budget), args.repeat))
+                naive.append(median_ms(lambda: naive_plan(match, budget), args.repeat))
+                if size_pos == 0:
+                    best = exhaustive_best(index, owned, match, budget, args.max_combinations)
+                    if best is not None:
+                        optimum.append((claimed, best))
+            opt = "-"
+            if optimum:
+                opt = f"{sum(c for c, _b in optimum) / max(sum(b for _c, b in optimum), 1):.0%}"
+            incr_ms, naive_ms = float(np.median(incr)), float(np.median(naive))
+            print(
+                f"{n:>8} {budget:>6} {np.mean(candidates):>9.0f} {np.mean(unlocked):>9.1f} "
+                f"{incr_ms:>8.2f} {naive_ms:>9.2f} {naive_ms / incr_ms:>7.1f}x {opt:>7}"
+            )
+
+    if failures:
+        print(f"ERRORE: {failures} piani non coerenti")
+        return 1
+    print("OK: piani coerenti con l'indice bitmap e con il greedy non incrementale")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
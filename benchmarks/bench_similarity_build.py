@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark della costruzione parallela dell'indice di similarità.
+
+Genera in memoria un catalogo sintetico (titoli, categorie, ingredienti con classe e metaclasse),
+confronta le due modalità di feature (compute_item_similarity.fit_catalog_features: "text" con
+TF-IDF sul testo concatenato, "structured" dagli id, vedi recipe_features.py) per tempo e numero
+di colonne, poi costruisce l'indice top-K con diversi numeri di thread
+(similarity_index.build_similarity_index, parametro workers), riportando tempo, speedup rispetto
+a un thread e verificando che l'indice sia identico in tutti i casi.
+Non usa il database.
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_similarity_build.py [--recipes 50000] [--workers 1 2 4 8] [--features structured]
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import synthetic_catalog  # noqa: E402
+from recommendation import compute_item_similarity as cis  # noqa: E402
+from recommendation.similarity_index import build_similarity_index  # noqa: E402
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=50000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--top-k", type=int, default=cis.SIMILARITY_TOP_K)
+    parser.add_argument("--block-size", type=int, default=cis.SIMILARITY_BLOCK_SIZE)
+    parser.add_argument("--features", choices=cis.FEATURE_MODES, default=cis.SIMILARITY_FEATURES)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=sorted({1, 2, 4, 8, os.cpu_count() or 1}),
+    )
+    args = parser.parse_args()
+
+    catalog = synthetic_catalog(args.recipes, args.ingredients, args.per_recipe)
+    print(f"{args.recipes} ricette, {args.ingredients} ingredienti, {os.cpu_count()} CPU")
+    print(f"{'feature':>10} {'fit s':>7} {'colonne':>8} {'nnz/riga':>9}")
+    matrices = {}
+    for features in cis.FEATURE_MODES:
+        t0 = time.perf_counter()
+        _vocabulary, _idf, X, _hashes = cis.fit_catalog_features(catalog, features)
+        elapsed = time.perf_counter() - t0
+        matrices[features] = X
+        print(f"{features:>10} {elapsed:>7.2f} {X.shape[1]:>8} {X.nnz / max(X.shape[0], 1):>9.1f}")
+    X = matrices[args.features]
+    recipe_ids = catalog.recipe_ids
+    print(f"\nIndice top-{args.top_k} con feature {args.features}")
+
+    reference = None
+    base_s = None
+    mismatches = 0
+    print(f"{'workers':>7} {'build s':>8} {'speedup':>8}  identico")
+    for workers in args.workers:
+        t0 = time.perf_counter()
+        index = build_similarity_index(
+            X, recipe_ids, top_k=args.top_k, block_size=args.block_size, workers=workers
+        )
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference, base_s = index, elapsed
+        same = np.array_equal(index.neighbor_idx, reference.neighbor_idx) and np.array_equal(
+            index.neighbor_scores, reference.neighbor_scores
+        )
+        mismatches += not same
+        print(f"{workers:>7} {elapsed:>8.2f} {base_s / elapsed:>7.1f}x  {'sì' if same else 'NO'}")
+
+    if mismatches:
+        print(f"ERRORE: {mismatches} costruzioni diverse da quella con {args.workers[0]} thread")
+        return 1
+    print("OK: l'indice non dipende dal numero di thread")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
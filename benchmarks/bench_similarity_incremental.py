@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Benchmark dell'aggiornamento incrementale dell'artefatto di similarità.
+
+Crea uno schema temporaneo con un catalogo sintetico, costruisce l'artefatto da zero
+(addestramento TF-IDF + top-K di tutte le righe), poi aggiunge/modifica/rimuove alcune ricette e
+confronta:
+  - incremental: compute_item_similarity.update_similarity_index_from_db (vocabolario e idf
+    salvati, ricalcolo delle sole righe interessate)
+  - full:        ricostruzione completa con riaddestramento del TF-IDF
+Verifica che l'indice aggiornato coincida con un top-K esatto calcolato sugli stessi vettori
+(score identici; indici identici a meno di vicini a pari score sul bordo del top-K) e riporta
+quanto i vicini si discostano da quelli del riaddestramento completo (effetto dell'idf congelato).
+
+Uso (dalla root del progetto):
+    python benchmarks/bench_similarity_incremental.py [--recipes 50000] [--added 100] [--changed 0] [--removed 0]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+import numpy as np
+import psycopg2
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+
+from bench_common import create_synthetic_schema, insert_recipes  # noqa: E402
+from recommendation import catalog, db  # noqa: E402
+from recommendation import compute_item_similarity as cis  # noqa: E402
+from recommendation.similarity_index import top_k_per_row  # noqa: E402
+
+def modify_catalog(conn, schema: str, args) -> None:
+    """Aggiunge args.added ricette, cambia gli ingredienti di args.changed e rimuove args.removed."""
+    rng = np.random.default_rng(7)
+    ids = rng.choice(np.arange(1, args.recipes + 1), size=args.changed + args.removed, replace=False)
+    changed = [int(r) for r in ids[:args.changed]]
+    removed = [int(r) for r in ids[args.changed:]]
+    with conn.cursor() as cur:
+        cur.execute(f"SET search_path TO {schema}")
+        if args.added:
+            insert_recipes(cur, args.recipes + 1, args.recipes + args.added, args.ingredients, args.per_recipe)
+        if changed:
+            cur.execute("DELETE FROM recipe_ingredients WHERE recipe_id = ANY(%s)", (changed,))
+            cur.execute(
+                """
+                INSERT INTO recipe_ingredients (recipe_id, ingredient_id, quantity)
+                SELECT r, 1 + floor(random() * %s)::int, 1
+                FROM unnest(%s::int[]) r, generate_series(1, %s) k
+                ON CONFLICT DO NOTHING
+                """,
+                (args.ingredients, changed, args.per_recipe),
+            )
+        if removed:
+            cur.execute("DELETE FROM recipes WHERE recipe_id = ANY(%s)", (removed,))
+        cur.execute("SET search_path TO DEFAULT")
+    conn.commit()
+
+
+def exact_top_k(X, k: int, block_size: int):
+    """Top-K esatto di ogni riga di X (già normalizzata), come riferimento."""
+    n = X.shape[0]
+    XT = X.T.tocsc()
+    idx = np.empty((n, k), dtype=np.int32)
+    scores = np.empty((n, k), dtype=np.float32)
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        idx[start:stop], scores[start:stop] = top_k_per_row(
+            (X[start:stop] @ XT).toarray(), k, self_columns=np.arange(start, stop)
+        )
+    return idx, scores
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=50000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--added", type=int, default=100)
+    parser.add_argument("--changed", type=int, default=0)
+    parser.add_argument("--removed", type=int, default=0)
+    parser.add_argument("--top-k", type=int, default=cis.SIMILARITY_TOP_K)
+    parser.add_argument("--block-size", type=int, default=cis.SIMILARITY_BLOCK_SIZE)
+    args = parser.parse_args()
+
+    admin = psycopg2.connect(**db.DB_CONFIG)
+    schema = f"bench_sim_{uuid.uuid4().hex[:8]}"
+    db.init_pool(options=f"-c search_path={schema}")
+    failures = 0
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            artifact_dir = Path(tmp) / "similarity"
+            print(f"Creo lo schema {schema} ({args.recipes} ricette)...")
+            create_synthetic_schema(admin, schema, args.recipes, args.ingredients, args.per_recipe)
+            catalog.invalidate_catalog()
+
+            t0 = time.perf_counter()
+            cis.refresh_similarity_artifact(
+                cis.current_catalog_hash(), artifact_dir, top_k=args.top_k, block_size=args.block_size, full=True
+            )
+            build_s = time.perf_counter() - t0
+
+            modify_catalog(admin, schema, args)
+            catalog.invalidate_catalog()
+            catalog.get_catalog()  # caricamento del catalogo fuori dalle misure
+
+            t0 = time.perf_counter()
+            result = cis.update_similarity_index_from_db(artifact_dir, top_k=args.top_k, block_size=args.block_size)
+            incremental_s = time.perf_counter() - t0
+            if result is None:
+                print("ERRORE: l'aggiornamento incrementale ha richiesto una ricostruzione completa")
+                return 1
+            index, _state = result
+
+            t0 = time.perf_counter()
+            full_index, _state = cis.build_similarity_index_from_db(top_k=args.top_k, block_size=args.block_size)
+            full_s = time.perf_counter() - t0
+
+            ref_idx, ref_scores = exact_top_k(index.vectors, index.top_k, args.block_size)
+            score_diff = int((ref_scores != index.neighbor_scores).any(axis=1).sum())
+            # gli indici devono coincidere tranne che tra vicini a pari score con il k-esimo
+            boundary = ref_scores == ref_scores[:, -1:]
+            idx_diff = int(((ref_idx != index.neighbor_idx) & ~boundary).any(axis=1).sum())
+            failures = score_diff + idx_diff
+
+            # vicinanza al riaddestramento completo (idf congelato contro idf ricalcolato)
+            top = min(10, index.top_k)
+            rows = full_index.rows_of(index.recipe_ids)
+            inc_ids = index.recipe_ids[index.neighbor_idx[:, :top]]
+            full_ids = full_index.recipe_ids[full_index.neighbor_idx[rows, :top]]
+            overlap = np.mean([len(set(a) & set(b)) / top for a, b in zip(inc_ids, full_ids)])
+
+            print(f"{'ricette':>8} {'build s':>8} {'incr s':>7} {'full s':>7} {'speedup':>8} {'diff':>5} {'overlap@10':>10}")
+            print(
+                f"{len(index):>8} {build_s:>8.2f} {incremental_s:>7.2f} {full_s:>7.2f} "
+                f"{full_s / incremental_s:>7.1f}x {failures:>5} {overlap:>10.3f}"
+            )
+    finally:
+        db.close_pool()
+        catalog.invalidate_catalog()
+        admin.rollback()
+        with admin.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        admin.commit()
+        admin.close()
+
+    if failures:
+        print(f"ERRORE: {failures} righe diverse dal top-K esatto sugli stessi vettori")
+        return 1
+    print("OK: l'indice aggiornato coincide con il top-K esatto")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
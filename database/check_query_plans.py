@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Verifica dei piani di esecuzione delle query calde su un dataset sintetico grande.
+
+Crea uno schema temporaneo eseguendo database_setup.sql (quindi con gli stessi indici del
+database reale), lo popola con un catalogo sintetico (molte categorie) e molti utenti con
+ingredienti posseduti e preferiti, esegue VACUUM ANALYZE
+e poi, per ogni query calda, EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON). Il controllo fallisce se
+una delle tabelle attese viene letta con un Seq Scan o senza l'indice previsto.
+
+Query verificate:
+  - ranking per percentuale di ingredienti posseduti (ranking.TOP_RECIPES_BY_OWNED_RATIO_SQL)
+  - preferiti ordinati per data di selezione (favorites.FAVORITES_SQL)
+  - ingredienti posseduti da un utente
+  - ricette e utenti che usano un ingrediente (lookup inverso, come le ON DELETE CASCADE)
+
+Uso (dalla root del progetto):
+    python database/check_query_plans.py [--recipes 100000] [--users 2000] [--keep]
+"""
+
+import argparse
+import json
+import sys
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple, Union
+
+import psycopg2
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+sys.path.insert(0, str(PROJECT_ROOT / "benchmarks"))
+
+from bench_common import create_synthetic_schema  # noqa: E402
+from recommendation.db import DB_CONFIG  # noqa: E402
+from recommendation.favorites import FAVORITES_SQL  # noqa: E402
+from recommendation.ranking import TOP_RECIPES_BY_OWNED_RATIO_SQL  # noqa: E402
+
+INDEX_SCANS = ("Index Scan", "Index Only Scan", "Bitmap Index Scan")
+
+# (nome, sql, parametri, {tabella: indice atteso oppure None = qualunque indice})
+HotQuery = Tuple[str, str, Union[Tuple, Dict], Dict[str, Optional[str]]]
+
+
+def hot_queries(user_id: int, category_id: int, ingredient_id: int) -> List[HotQuery]:
+    return [
+        (
+            "ranking owned_ratio",
+            TOP_RECIPES_BY_OWNED_RATIO_SQL,
+            {"user_id": user_id, "category_id": category_id, "limit": 10},
+            {
+                "recipe_stats": "idx_recipe_stats_category",
+                "recipes": None,
+                "recipe_ingredients": None,
+                "user_owned_ingredients": None,
+            },
+        ),
+        (
+            "preferiti per data",
+            FAVORITES_SQL,
+            (user_id,),
+            {"user_selected_recipes": "idx_user_selected_recipes_user_selected", "recipes": None},
+        ),
+        (
+            "ingredienti posseduti",
+            "SELECT ingredient_id FROM user_owned_ingredients WHERE user_id = %s",
+            (user_id,),
+            {"user_owned_ingredients": None},
+        ),
+        (
+            "ricette per ingrediente",
+            "SELECT recipe_id FROM recipe_ingredients WHERE ingredient_id = %s",
+            (ingredient_id,),
+            {"recipe_ingredients": "idx_recipe_ingredients_ingredient"},
+        ),
+        (
+            "utenti per ingrediente",
+            "SELECT user_id FROM user_owned_ingredients WHERE ingredient_id = %s",
+            (ingredient_id,),
+            {"user_owned_ingredients": "idx_user_owned_ingredients_ingredient_user"},
+        ),
+    ]
+
+
+def table_access(plan: Dict, access: Optional[Dict[str, Set[str]]] = None, heap: str = "?") -> Dict[str, Set[str]]:
+    """
+    tabella -> insieme dei metodi di accesso, es. {"Seq Scan"} o {"Index Scan:idx_..."}.
+    I Bitmap Index Scan sono attribuiti alla tabella del Bitmap Heap Scan che li contiene.
+    """
+    if access is None:
+        access = {}
+    node_type = plan["Node Type"]
+    if node_type == "Bitmap Heap Scan":
+        heap = plan["Relation Name"]
+    elif node_type == "Bitmap Index Scan":
+        access.setdefault(heap, set()).add(f"{node_type}:{plan['Index Name']}")
+    elif "Relation Name" in plan:
+        method = f"{node_type}:{plan['Index Name']}" if "Index Name" in plan else node_type
+        access.setdefault(plan["Relation Name"], set()).add(method)
+    for child in plan.get("Plans", []):
+        table_access(child, access, heap)
+    return access
+
+
+def check_access(access: Dict[str, Set[str]], expected: Dict[str, Optional[str]]) -> List[str]:
+    """Problemi trovati: tabelle lette senza indice o senza l'indice atteso."""
+    problems = []
+    for table, index_name in expected.items():
+        methods = access.get(table)
+        if not methods:
+            problems.append(f"{table}: non presente nel piano")
+            continue
+        not_indexed = sorted(m for m in methods if not m.startswith(INDEX_SCANS))
+        if not_indexed:
+            problems.append(f"{table}: {', '.join(not_indexed)}")
+        elif index_name and not any(m.endswith(f":{index_name}") for m in methods):
+            problems.append(f"{table}: indice {index_name} non usato ({', '.join(sorted(methods))})")
+    return problems
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=100000)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--per-recipe", type=int, default=10)
+    parser.add_argument("--categories", type=int, default=50)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--owned", type=int, default=200)
+    parser.add_argument("--favorites", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="non eliminare lo schema sintetico alla fine")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    schema = f"check_plans_{uuid.uuid4().hex[:8]}"
+    failures = 0
+    try:
+        print(f"Creo lo schema {schema} ({args.recipes} ricette, {args.users} utenti)...")
+        create_synthetic_schema(
+            conn,
+            schema,
+            args.recipes,
+            args.ingredients,
+            args.per_recipe,
+            categories=[f"Categoria {g}" for g in range(1, args.categories + 1)],
+            n_users=args.users,
+            owned=args.owned,
+            favorites=args.favorites,
+        )
+        queries = hot_queries(user_id=1, category_id=7, ingredient_id=42)
+
+        print(f"{'query':<24} {'ms':>8} {'hit':>7} {'read':>6}  esito")
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path TO {schema}")
+            for name, sql, params, expected in queries:
+                cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+                result = cur.fetchone()[0]
+                explain = (json.loads(result) if isinstance(result, str) else result)[0]
+                plan = explain["Plan"]
+                problems = check_access(table_access(plan), expected)
+                failures += bool(problems)
+                print(
+                    f"{name:<24} {explain['Execution Time']:>8.2f} {plan.get('Shared Hit Blocks', 0):>7} "
+                    f"{plan.get('Shared Read Blocks', 0):>6}  {'OK' if not problems else 'FALLITO'}"
+                )
+                for problem in problems:
+                    print(f"    - {problem}")
+        conn.rollback()
+    finally:
+        conn.rollback()
+        if not args.keep:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+            conn.commit()
+        conn.close()
+
+    if failures:
+        print(f"ERRORE: {failures} query non usano gli indici attesi")
+        return 1
+    print("OK: tutte le query calde usano un index scan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Verifica che il motore in memoria e le query SQL di riferimento diano lo stesso ranking.
+
+Per ogni utente con ingredienti posseduti, ogni categoria e ogni combinazione di modalità
+(RANKING_MATCH_MODES x RANKING_RATIO_MODES) calcola l'intera categoria con entrambi i backend
+(ranking.top_recipes_by_owned_ratio) e confronta ordinamento, owned_count, substitute_count e
+owned_ratio (uguaglianza esatta). Usa il database configurato in .env e i pesi per classe di
+RANKING_CLASS_WEIGHTS; con --class-weights li sostituisce per la verifica.
+
+Controlla anche che ogni ORDER BY sul nome delle query SQL fissi COLLATE "C": il motore in
+memoria ordina i nomi per code point, e con la collation predefinita del database (es.
+en_US.UTF-8) gli spareggi divergerebbero, anche quando sul database di prova coincidono.
+
+Uso (dalla root del progetto):
+    python database/check_ranking_backends.py [--users 50] [--class-weights "16:0.2,26:0.35"]
+"""
+
+import argparse
+import re
+import sys
+from typing import List
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "streamlit"))
+load_dotenv(PROJECT_ROOT / ".env")
+
+from recommendation import ranking  # noqa: E402
+from recommendation.catalog import get_catalog, get_categories  # noqa: E402
+from recommendation.db import get_conn  # noqa: E402
+
+COMPARED = ("recipe_id", "owned_count", "substitute_count", "owned_ratio")
+
+# Query del backend SQL (conteggio esatto, per classe, per quantità)
+RANKING_QUERIES = (
+    "TOP_RECIPES_BY_OWNED_RATIO_SQL",
+    "TOP_RECIPES_BY_CLASS_RATIO_SQL",
+    "TOP_RECIPES_BY_QUANTITY_RATIO_SQL",
+)
+
+# recipe_name in un ORDER BY senza collation esplicita
+UNPINNED_NAME_ORDER = re.compile(r"ORDER BY[^\n]*\brecipe_name\b(?!\s+COLLATE\s+\"C\")")
+
+
+def unpinned_queries() -> List[str]:
+    """Query SQL del ranking con almeno un ORDER BY sul nome senza COLLATE "C"."""
+    return [name for name in RANKING_QUERIES if UNPINNED_NAME_ORDER.search(getattr(ranking, name))]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="numero massimo di utenti verificati")
+    parser.add_argument("--class-weights", default=None, help="pesi per classe (class_id:peso,...) al posto di .env")
+    args = parser.parse_args()
+
+    if args.class_weights is not None:
+        # il motore legge i pesi alla costruzione: si sostituiscono prima di crearlo
+        ranking.RANKING_CLASS_WEIGHTS.clear()
+        ranking.RANKING_CLASS_WEIGHTS.update(ranking._parse_class_weights(args.class_weights))
+
+    unpinned = unpinned_queries()
+    if unpinned:
+        print(f"ERRORE: ordinamento per nome senza COLLATE \"C\" in {', '.join(unpinned)}")
+        return 1
+
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute("SELECT datcollate FROM pg_database WHERE datname = current_database()")
+        print(f"Collation del database: {cur.fetchone()[0]} (spareggio sul nome fissato a \"C\")")
+        cur.execute(
+            "SELECT DISTINCT user_id FROM user_owned_ingredients ORDER BY user_id LIMIT %s", (args.users,)
+        )
+        user_ids = [row[0] for row in cur.fetchall()]
+    limit = get_catalog().n_recipes
+    categories = get_categories()
+
+    checked = mismatches = 0
+    for user_id in user_ids:
+        for category_id, category_name in categories:
+            for match_mode in ranking.RANKING_MATCH_MODES:
+                for ratio_mode in ranking.RANKING_RATIO_MODES:
+                    rows = {
+                        backend: [
+                            tuple(row[key] for key in COMPARED)
+                            for row in ranking.top_recipes_by_owned_ratio(
+                                user_id, category_id, limit, backend, match_mode, ratio_mode=ratio_mode
+                            )
+                        ]
+                        for backend in ranking.RANKING_BACKENDS
+                    }
+                    checked += 1
+                    if rows["sql"] != rows["memory"]:
+                        mismatches += 1
+                        first = next(
+                            (i for i, (a, b) in enumerate(zip(rows["sql"], rows["memory"])) if a != b),
+                            min(len(rows["sql"]), len(rows["memory"])),
+                        )
+                        print(
+                            f"DIFFERENZA utente {user_id}, '{category_name}', {match_mode}/{ratio_mode} "
+                            f"alla posizione {first}: sql={rows['sql'][first:first + 2]} "
+                            f"memory={rows['memory'][first:first + 2]}"
+                        )
+
+    if not checked:
+        print("Nessun utente con ingredienti posseduti: niente da verificare")
+        return 0
+    if mismatches:
+        print(f"ERRORE: {mismatches} ranking diversi su {checked}")
+        return 1
+    print(f"OK: {checked} ranking identici ({len(user_ids)} utenti, {len(categories)} categorie)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,11 @@
 -- Setup schema
+DROP MATERIALIZED VIEW IF EXISTS recipe_stats;
+DROP TABLE IF EXISTS recipe_image_files;
 DROP TABLE IF EXISTS recipe_ingredients;
 DROP TABLE IF EXISTS user_selected_recipes;
 DROP TABLE IF EXISTS user_owned_ingredients;
 DROP TABLE IF EXISTS recipes;
+DROP TABLE IF EXISTS recipe_categories;
 DROP TABLE IF EXISTS ingredients;
 DROP TABLE IF EXISTS ingredient_classes;
 DROP TABLE IF EXISTS ingredients_metaclasses;
@@ -30,12 +33,17 @@ CREATE TABLE IF NOT EXISTS ingredients (
     class_name TEXT
 );
 
+CREATE TABLE IF NOT EXISTS recipe_categories (
+    category_id INTEGER PRIMARY KEY,
+    category_name TEXT NOT NULL
+);
+
 CREATE TABLE IF NOT EXISTS recipes (
     recipe_id INTEGER PRIMARY KEY,
     recipe_name TEXT NOT NULL,
     recipe_link TEXT,
     category_name TEXT,
-    category_id INTEGER,
+    category_id INTEGER REFERENCES recipe_categories(category_id),
     cost INTEGER,
     difficulty INTEGER,
     preparation_time INTEGER,
@@ -50,6 +58,38 @@ CREATE TABLE IF NOT EXISTS recipe_ingredients (
     PRIMARY KEY (recipe_id, ingredient_id)
 );
 
+-- Per-recipe statistics for ranking (recipe_name is the final tie-break), refreshed by
+-- populate_database.py after each load
+CREATE MATERIALIZED VIEW IF NOT EXISTS recipe_stats AS
+SELECT r.recipe_id,
+       r.category_id,
+       r.recipe_name,
+       COALESCE(c.ingredient_count, 0) AS ingredient_count,
+       r.cost,
+       r.difficulty,
+       r.preparation_time
+FROM recipes r
+LEFT JOIN (
+    SELECT recipe_id, COUNT(*)::int AS ingredient_count
+    FROM recipe_ingredients
+    GROUP BY recipe_id
+) c ON c.recipe_id = r.recipe_id;
+
+-- unique index required by REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS idx_recipe_stats_recipe
+    ON recipe_stats (recipe_id);
+
+CREATE INDEX IF NOT EXISTS idx_recipe_stats_category
+    ON recipe_stats (category_id) INCLUDE (ingredient_count);
+
+-- Image files assigned to recipes (state for incremental image assignment)
+CREATE TABLE IF NOT EXISTS recipe_image_files (
+    recipe_id INTEGER PRIMARY KEY REFERENCES recipes(recipe_id) ON DELETE CASCADE,
+    file_path TEXT NOT NULL,
+    file_size BIGINT NOT NULL,
+    file_mtime BIGINT NOT NULL -- st_mtime_ns
+);
+
 -- Users and relations
 CREATE TABLE IF NOT EXISTS users (
     user_id SERIAL PRIMARY KEY,
@@ -71,3 +111,21 @@ CREATE TABLE IF NOT EXISTS user_owned_ingredients (
     added_at TIMESTAMP DEFAULT NOW(),
     PRIMARY KEY (user_id, ingredient_id)
 );
+
+-- Indexes for the recommendation and favourites queries (see database/check_query_plans.py)
+-- category filter: WHERE category_id = %s (replaces the old LOWER(TRIM(category_name)) index)
+DROP INDEX IF EXISTS idx_recipes_category_norm;
+CREATE INDEX IF NOT EXISTS idx_recipes_category
+    ON recipes (category_id);
+
+-- reverse lookup ingredient -> recipes (and ON DELETE CASCADE from ingredients)
+CREATE INDEX IF NOT EXISTS idx_recipe_ingredients_ingredient
+    ON recipe_ingredients (ingredient_id);
+
+-- join on ingredient_id with the user filter (and ON DELETE CASCADE from ingredients)
+CREATE INDEX IF NOT EXISTS idx_user_owned_ingredients_ingredient_user
+    ON user_owned_ingredients (ingredient_id, user_id);
+
+-- favourites of a user ordered by selected_at DESC, read from the index without a sort step
+CREATE INDEX IF NOT EXISTS idx_user_selected_recipes_user_selected
+    ON user_selected_recipes (user_id, selected_at DESC) INCLUDE (recipe_id);
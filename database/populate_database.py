@@ -4,6 +4,7 @@ PostgreSQL Database Population Script for Italian Recipe Management System
 This script executes the database setup and populates it with data from translated CSV files.
 """
 
+import argparse
 import psycopg2
 import os
 import sys
@@ -11,6 +12,9 @@ import logging
 from pathlib import Path
 import csv
 import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
 
 # Cerca .env nella root del progetto
@@ -39,6 +43,19 @@ DB_CONFIG = {
     "port": int(os.getenv("PGPORT", "5432")),
 }
 
+# Caricamento CSV in streaming: dimensione dei blocchi letti da COPY e frequenza dei log di avanzamento
+COPY_BUFFER_SIZE = int(os.getenv("COPY_BUFFER_SIZE", "65536"))
+COPY_PROGRESS_EVERY = int(os.getenv("COPY_PROGRESS_EVERY", "100000"))
+
+# Caricamento bulk parallelo: connessioni/thread usati per COPY, indici e validazioni
+POPULATE_WORKERS = int(os.getenv("POPULATE_WORKERS", "4"))
+# memoria per sessione usata da CREATE INDEX / ADD CONSTRAINT durante il caricamento bulk
+POPULATE_MAINTENANCE_WORK_MEM = os.getenv("POPULATE_MAINTENANCE_WORK_MEM", "256MB")
+
+CSV_BASE_PATH = "data/processed/italian gastronomic recipes dataset/foods/CSV"
+# Le prime 8 colonne di recipes.csv vanno nella tabella recipes
+RECIPE_COLUMNS = 8
+
 def create_database():
     """Create the database if it doesn't exist."""
     try:
@@ -72,8 +89,12 @@ def create_database():
         logger.error(f"Error creating database: {e}")
         return False
 
-def execute_sql_script(script_path):
-    """Execute SQL script file."""
+def execute_sql_script(script_path, skip_drop_tables=False):
+    """
+    Execute SQL script file.
+    Con skip_drop_tables=True le istruzioni DROP TABLE / DROP MATERIALIZED VIEW vengono saltate:
+    lo schema viene solo completato (CREATE ... IF NOT EXISTS) senza cancellare dati esistenti.
+    """
     try:
         conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
@@ -102,6 +123,10 @@ def execute_sql_script(script_path):
         
         # Esegui in modo sicuro più statement separati da ';'
         statements = [s.strip() for s in sql_content.split(';') if s.strip()]
+        if skip_drop_tables:
+            statements = [
+                s for s in statements if not s.upper().startswith(('DROP TABLE', 'DROP MATERIALIZED VIEW'))
+            ]
         for stmt in statements:
             try:
                 cursor.execute(stmt)
@@ -162,167 +187,675 @@ def show_sample_queries():
         logger.error(f"Error showing sample queries: {e}")
         return False
     
-def load_csv_data():
-    """Carica i dati dai CSV nelle tabelle usando psycopg2.copy_expert()."""
+class LineStream(io.TextIOBase):
+    """
+    Adattatore file-like in sola lettura su un iteratore di righe di testo, da passare a
+    copy_expert: COPY legge a blocchi di dimensione fissa, quindi in memoria resta solo
+    il blocco corrente e non l'intero file.
+    """
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._buf = ""
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> str:
+        if size is None or size < 0:
+            data, self._buf = self._buf + "".join(self._lines), ""
+            return data
+        parts = [self._buf]
+        length = len(self._buf)
+        for line in self._lines:
+            parts.append(line)
+            length += len(line)
+            if length >= size:
+                break
+        data = "".join(parts)
+        self._buf = data[size:]
+        return data[:size]
+
+    def readline(self, size: Optional[int] = -1) -> str:
+        if not self._buf:
+            self._buf = next(self._lines, "")
+        line, self._buf = self._buf, ""
+        return line
+
+
+def csv_lines(rows: Iterable[Sequence]) -> Iterator[str]:
+    """Serializza le righe come righe CSV (delimitatore ';'), una alla volta."""
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=';', lineterminator='\n', quoting=csv.QUOTE_MINIMAL)
+    for row in rows:
+        writer.writerow(row)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+
+
+def with_progress(items: Iterable, table: str, every: int = COPY_PROGRESS_EVERY) -> Iterator:
+    """Inoltra gli elementi loggando ogni `every` righe quante ne sono passate e a che velocità."""
+    start = time.monotonic()
+    for n, item in enumerate(items, 1):
+        yield item
+        if every > 0 and n % every == 0:
+            elapsed = max(time.monotonic() - start, 1e-9)
+            logger.info(f"  {table}: {n} righe ({n / elapsed:.0f} righe/s)")
+
+
+def copy_lines(cursor, sql: str, lines: Iterable[str], table: str) -> int:
+    """Esegue COPY ... FROM STDIN leggendo le righe in streaming; ritorna le righe caricate."""
+    start = time.monotonic()
+    cursor.copy_expert(sql, LineStream(with_progress(lines, table)), size=COPY_BUFFER_SIZE)
+    elapsed = max(time.monotonic() - start, 1e-9)
+    rows = cursor.rowcount
+    logger.info(f"Tabella {table}: {rows} righe in {elapsed:.2f}s ({rows / elapsed:.0f} righe/s)")
+    return rows
+
+
+def read_recipes_header(recipes_path) -> Tuple[List[str], List[Tuple[int, int, int]]]:
+    """
+    Header di recipes.csv e posizioni delle triplette (Ingrediente, ID, Quantità) che seguono
+    le prime RECIPE_COLUMNS colonne.
+    """
+    with open(recipes_path, "r", encoding="utf-8", newline="") as rf:
+        reader = csv.reader(rf, delimiter=';')
+        try:
+            header = next(reader)
+        except StopIteration:
+            raise ValueError("Il file recipes.csv è vuoto")
+
+    # L’header del CSV contiene ripetizioni di colonne Ingrediente/ID/Quantità
+    # Identifica le posizioni di tutte le triplette
+    ingredient_triplets = []
+    i = RECIPE_COLUMNS  # dopo le prime 8 colonne iniziano gli ingredienti
+    while i + 2 < len(header):
+        col1 = header[i].strip().lower()
+        col2 = header[i+1].strip().lower()
+        col3 = header[i+2].strip().lower()
+        if ("ingrediente" in col1) and ("id" in col2) and ("quantit" in col3):
+            ingredient_triplets.append((i, i+1, i+2))
+            i += 3
+        else:
+            # potrebbe essere la sezione “Preparazione;ID;Quantità”
+            # quando la incontriamo, ci fermiamo
+            break
+    return header, ingredient_triplets
+
+
+def _iter_recipes_csv(recipes_path) -> Iterator[List[str]]:
+    """Righe dati di recipes.csv (header escluso), lette in streaming."""
+    with open(recipes_path, "r", encoding="utf-8", newline="") as rf:
+        reader = csv.reader(rf, delimiter=';')
+        next(reader, None)
+        yield from reader
+
+
+def iter_recipe_rows(recipes_path) -> Iterator[List[str]]:
+    """Righe per la tabella recipes: le prime RECIPE_COLUMNS colonne di ogni ricetta."""
+    for row in _iter_recipes_csv(recipes_path):
+        yield (row + [''] * RECIPE_COLUMNS)[:RECIPE_COLUMNS]
+
+
+def iter_recipe_category_rows(recipes_path) -> Iterator[Tuple[int, str]]:
+    """
+    Righe distinte (category_id, category_name) di recipes.csv per la tabella recipe_categories.
+    Se lo stesso id compare con nomi diversi vale il primo (con un warning).
+    """
+    names: Dict[int, str] = {}
+    conflicts = set()
+    for row in _iter_recipes_csv(recipes_path):
+        if len(row) < 5 or not row[4].strip():
+            continue
+        category_id, name = int(row[4]), row[3].strip()
+        if category_id not in names:
+            names[category_id] = name
+            yield (category_id, name)
+        elif names[category_id] != name and category_id not in conflicts:
+            conflicts.add(category_id)
+            logger.warning(f"Categoria {category_id}: nome '{name}' diverso da '{names[category_id]}', tengo il primo")
+
+
+def iter_recipe_ingredient_rows(recipes_path) -> Iterator[Tuple[int, int, int]]:
+    """Righe (recipe_id, ingredient_id, quantity) estratte dalle triplette ingrediente di recipes.csv."""
+    _, ingredient_triplets = read_recipes_header(recipes_path)
+    for row in _iter_recipes_csv(recipes_path):
+        # recipe_id è la seconda colonna (ID) tra le prime 8
+        try:
+            recipe_id = int(row[1])
+        except Exception:
+            continue
+        for (c_name, c_id, c_qty) in ingredient_triplets:
+            # proteggi da righe corte
+            if c_id >= len(row):
+                continue
+            ing_id_raw = row[c_id].strip()
+            if not ing_id_raw:
+                continue
+            try:
+                ing_id = int(ing_id_raw)
+            except ValueError:
+                continue
+            qty = 1
+            if c_qty < len(row):
+                qty_raw = row[c_qty].strip()
+                if qty_raw:
+                    try:
+                        qty = int(qty_raw)
+                    except ValueError:
+                        qty = 1
+            yield (recipe_id, ing_id, qty)
+
+
+def csv_table_loads(
+    base_path: str = CSV_BASE_PATH, target_prefix: str = ""
+) -> List[Tuple[str, str, Iterator[str]]]:
+    """
+    Elenco dei caricamenti (tabella, COPY sql, righe CSV in streaming), uno per tabella.
+    recipe_categories, recipes e recipe_ingredients sono passate indipendenti su recipes.csv.
+    Con target_prefix il COPY scrive in <prefix><tabella> (es. le tabelle di staging).
+    """
+    def file_lines(filepath: str) -> Iterator[str]:
+        with open(filepath, "r", encoding="utf-8", newline="") as f:
+            yield from f
+
+    recipes_path = f"{base_path}/recipes.csv"
+    return [
+        (
+            "ingredients_metaclasses",
+            f"COPY {target_prefix}ingredients_metaclasses (metaclass_name, metaclass_id) FROM STDIN WITH CSV HEADER DELIMITER ';'",
+            file_lines(f"{base_path}/ingredientsMetaclasses.csv"),
+        ),
+        (
+            "ingredient_classes",
+            f"COPY {target_prefix}ingredient_classes (class_name, class_id, metaclass_name, metaclass_id) FROM STDIN WITH CSV HEADER DELIMITER ';'",
+            file_lines(f"{base_path}/ingredientsClasses.csv"),
+        ),
+        (
+            "ingredients",
+            f"COPY {target_prefix}ingredients (ingredient_name, ingredient_id, class_name, class_id) FROM STDIN WITH CSV HEADER DELIMITER ';'",
+            file_lines(f"{base_path}/ingredients.csv"),
+        ),
+        (
+            "recipe_categories",
+            f"COPY {target_prefix}recipe_categories (category_id, category_name) FROM STDIN WITH CSV DELIMITER ';'",
+            csv_lines(iter_recipe_category_rows(recipes_path)),
+        ),
+        (
+            "recipes",
+            f"COPY {target_prefix}recipes (recipe_name, recipe_id, recipe_link, category_name, category_id, cost, difficulty, preparation_time) "
+            "FROM STDIN WITH CSV DELIMITER ';'",
+            csv_lines(iter_recipe_rows(recipes_path)),
+        ),
+        (
+            "recipe_ingredients",
+            f"COPY {target_prefix}recipe_ingredients (recipe_id, ingredient_id, quantity) FROM STDIN WITH CSV DELIMITER ';'",
+            csv_lines(iter_recipe_ingredient_rows(recipes_path)),
+        ),
+    ]
+
+
+def load_csv_data(base_path: str = CSV_BASE_PATH):
+    """
+    Carica i dati dai CSV nelle tabelle con COPY in streaming (copy_expert su un adattatore
+    file-like): la memoria resta costante qualunque sia la dimensione dei file.
+    """
     try:
         conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
 
-        base_path = "data/processed/italian gastronomic recipes dataset/foods/CSV"
-
         # Assicura che le colonne temporanee esistano per l'import
         cursor.execute("ALTER TABLE ingredient_classes ADD COLUMN IF NOT EXISTS metaclass_name TEXT;")
         cursor.execute("ALTER TABLE ingredients ADD COLUMN IF NOT EXISTS class_name TEXT;")
         conn.commit()
 
-        copy_commands = [
-            (
-                "ingredients_metaclasses",
-                f"{base_path}/ingredientsMetaclasses.csv",
-                "COPY ingredients_metaclasses (metaclass_name, metaclass_id) FROM STDIN WITH CSV HEADER DELIMITER ';'"
-            ),
-            (
-                "ingredient_classes",
-                f"{base_path}/ingredientsClasses.csv",
-                "COPY ingredient_classes (class_name, class_id, metaclass_name, metaclass_id) FROM STDIN WITH CSV HEADER DELIMITER ';'"
-            ),
-            (
-                "ingredients",
-                f"{base_path}/ingredients.csv",
-                "COPY ingredients (ingredient_name, ingredient_id, class_name, class_id) FROM STDIN WITH CSV HEADER DELIMITER ';'"
-            ),
-        ]
-
-        for table, filepath, sql in copy_commands:
-            with open(filepath, "r", encoding="utf-8") as f:
-                cursor.copy_expert(sql, f)
+        start = time.monotonic()
+        total = 0
+        for table, sql, lines in csv_table_loads(base_path):
+            total += copy_lines(cursor, sql, lines, table)
             conn.commit()
-            logger.info(f"Tabella {table} popolata da {os.path.basename(filepath)}")
+        elapsed = max(time.monotonic() - start, 1e-9)
+        logger.info(f"CSV caricati: {total} righe in {elapsed:.2f}s ({total / elapsed:.0f} righe/s)")
 
-        # Gestione speciale per recipes e recipe_ingredients: il CSV contiene molte più colonne
-        recipes_path = f"{base_path}/recipes.csv"
-        with open(recipes_path, "r", encoding="utf-8") as rf:
-            reader = csv.reader(rf, delimiter=';')
-            try:
-                header = next(reader)
-            except StopIteration:
-                raise ValueError("Il file recipes.csv è vuoto")
-
-            # Conserva solo le prime 8 colonne per la tabella recipes
-            selected_count = 8
-            selected_header = header[:selected_count]
-
-            # Prepara buffer per COPY in recipes
-            buf_recipes = io.StringIO()
-            writer_recipes = csv.writer(buf_recipes, delimiter=';', lineterminator='\n', quoting=csv.QUOTE_MINIMAL)
-            writer_recipes.writerow(selected_header)
-
-            # Prepara buffer per COPY in recipe_ingredients (senza header)
-            buf_ri = io.StringIO()
-            writer_ri = csv.writer(buf_ri, delimiter=';', lineterminator='\n', quoting=csv.QUOTE_MINIMAL)
-            # Nessun header: ordina colonne come (recipe_id, ingredient_id, quantity)
-
-            # L’header del CSV contiene ripetizioni di colonne Ingrediente/ID/Quantità
-            # Identifica le posizioni di tutte le triplette
-            ingredient_triplets = []
-            i = selected_count  # dopo le prime 8 colonne iniziano gli ingredienti
-            while i + 2 < len(header):
-                col1 = header[i].strip().lower()
-                col2 = header[i+1].strip().lower()
-                col3 = header[i+2].strip().lower()
-                if ("ingrediente" in col1) and ("id" in col2) and ("quantit" in col3):
-                    ingredient_triplets.append((i, i+1, i+2))
-                    i += 3
-                else:
-                    # potrebbe essere la sezione “Preparazione;ID;Quantità”
-                    # quando la incontriamo, ci fermiamo
-                    break
-
-            for row in reader:
-                # Scrivi la parte ricetta (prime 8 colonne)
-                row8 = (row + [''] * selected_count)[:selected_count]
-                writer_recipes.writerow(row8)
-
-                # Estrai tutte le triplette ingrediente
-                for (c_name, c_id, c_qty) in ingredient_triplets:
-                    # proteggi da righe corte
-                    if c_id < len(row):
-                        ing_id_raw = row[c_id].strip()
-                        if ing_id_raw:
-                            try:
-                                ing_id = int(ing_id_raw)
-                            except ValueError:
-                                continue
-                            qty = 1
-                            if c_qty < len(row):
-                                qty_raw = row[c_qty].strip()
-                                if qty_raw:
-                                    try:
-                                        qty = int(qty_raw)
-                                    except ValueError:
-                                        qty = 1
-                            # recipe_id è la seconda colonna (ID) tra le prime 8
-                            try:
-                                recipe_id = int(row[1])
-                            except Exception:
-                                continue
-                            writer_ri.writerow([recipe_id, ing_id, qty])
-
-            # COPY in recipes
-            buf_recipes.seek(0)
-            copy_sql_recipes = (
-                "COPY recipes (recipe_name, recipe_id, recipe_link, category_name, category_id, cost, difficulty, preparation_time) "
-                "FROM STDIN WITH CSV HEADER DELIMITER ';'"
-            )
-            cursor.copy_expert(copy_sql_recipes, buf_recipes)
-            conn.commit()
-            logger.info(f"Tabella recipes popolata da {os.path.basename(recipes_path)} (prime 8 colonne)")
+        # cleanup colonne temporanee (idempotente)
+        cursor.execute("ALTER TABLE ingredient_classes DROP COLUMN IF EXISTS metaclass_name;")
+        cursor.execute("ALTER TABLE ingredients DROP COLUMN IF EXISTS class_name;")
+        conn.commit()
+
+        refresh_recipe_stats(cursor)
+        conn.commit()
+
+        cursor.close()
+        conn.close()
+        return True
+
+    except Exception as e:
+        logger.error(f"Errore durante il caricamento dei CSV: {e}")
+        return False
 
-            # COPY in recipe_ingredients
-            buf_ri.seek(0)
-            copy_sql_ri = (
-                "COPY recipe_ingredients (recipe_id, ingredient_id, quantity) "
-                "FROM STDIN WITH CSV DELIMITER ';'"
+def refresh_recipe_stats(cursor, concurrently=False):
+    """
+    Ricalcola la vista materializzata recipe_stats (categoria, numero di ingredienti e attributi
+    di ogni ricetta) usata dal ranking. Con concurrently=True le letture non vengono bloccate.
+    """
+    start = time.monotonic()
+    cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}recipe_stats")
+    logger.info(f"Vista recipe_stats aggiornata in {time.monotonic() - start:.2f}s")
+
+
+# Tabelle del catalogo aggiornabili in modo incrementale, in ordine di dipendenza (FK):
+# tabella -> (chiave primaria, colonne dati provenienti dai CSV).
+# recipes.image_path non compare: viene gestita da assign_recipe_images e resta invariata.
+CATALOG_TABLES = {
+    "ingredients_metaclasses": (("metaclass_id",), ("metaclass_name",)),
+    "ingredient_classes": (("class_id",), ("class_name", "metaclass_id")),
+    "ingredients": (("ingredient_id",), ("ingredient_name", "class_id")),
+    "recipe_categories": (("category_id",), ("category_name",)),
+    "recipes": (
+        ("recipe_id",),
+        ("recipe_name", "recipe_link", "category_name", "category_id", "cost", "difficulty", "preparation_time"),
+    ),
+    "recipe_ingredients": (("recipe_id", "ingredient_id"), ("quantity",)),
+}
+STAGING_PREFIX = "staging_"
+# colonne presenti nei CSV ma non nelle tabelle finali
+STAGING_EXTRA_COLUMNS = {
+    "ingredient_classes": ("metaclass_name",),
+    "ingredients": ("class_name",),
+}
+
+
+def create_staging_tables(cursor):
+    """Crea (vuote) le tabelle UNLOGGED di staging con le stesse colonne delle tabelle del catalogo."""
+    for table in CATALOG_TABLES:
+        staging = f"{STAGING_PREFIX}{table}"
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+        cursor.execute(f"CREATE UNLOGGED TABLE {staging} (LIKE {table} INCLUDING DEFAULTS)")
+        for column in STAGING_EXTRA_COLUMNS.get(table, ()):
+            cursor.execute(f"ALTER TABLE {staging} ADD COLUMN IF NOT EXISTS {column} TEXT")
+
+
+def drop_staging_tables(cursor):
+    for table in CATALOG_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_PREFIX}{table}")
+
+
+def upsert_from_staging(cursor, table):
+    """
+    INSERT ... ON CONFLICT DO UPDATE dalla tabella di staging, limitato alle righe nuove o con
+    valori diversi: un anti-join (hash) scarta prima le righe invariate, così con un delta
+    piccolo non si paga una probe sull'indice né una nuova versione di riga per ogni riga del CSV.
+    Ritorna (inserite, aggiornate).
+    """
+    key, columns = CATALOG_TABLES[table]
+    all_columns = ", ".join(key + columns)
+    staged = ", ".join(f"s.{c}" for c in key + columns)
+    same_key = " AND ".join(f"t.{c} = s.{c}" for c in key)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in columns)
+    current = ", ".join(f"{table}.{c}" for c in columns)
+    incoming = ", ".join(f"EXCLUDED.{c}" for c in columns)
+    cursor.execute(
+        f"""
+        WITH changed AS (
+            INSERT INTO {table} ({all_columns})
+            SELECT {staged} FROM {STAGING_PREFIX}{table} s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table} t
+                WHERE {same_key}
+                  AND ROW({", ".join(f"t.{c}" for c in columns)}) IS NOT DISTINCT FROM ROW({", ".join(f"s.{c}" for c in columns)})
             )
-            cursor.copy_expert(copy_sql_ri, buf_ri)
-            conn.commit()
-            logger.info("Tabella recipe_ingredients popolata dai campi ingrediente del CSV delle ricette")
+            ON CONFLICT ({", ".join(key)}) DO UPDATE SET {updates}
+            WHERE ROW({current}) IS DISTINCT FROM ROW({incoming})
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM changed
+        """
+    )
+    inserted, updated = cursor.fetchone()
+    return inserted, updated
+
+
+def delete_missing_from_staging(cursor, table):
+    """Elimina le righe non più presenti nei CSV; ritorna quante."""
+    key, _ = CATALOG_TABLES[table]
+    match = " AND ".join(f"s.{c} = t.{c}" for c in key)
+    cursor.execute(
+        f"""
+        DELETE FROM {table} t
+        WHERE NOT EXISTS (SELECT 1 FROM {STAGING_PREFIX}{table} s WHERE {match})
+        """
+    )
+    return cursor.rowcount
+
+
+def load_csv_data_incremental(base_path: str = CSV_BASE_PATH):
+    """
+    Aggiornamento incrementale del catalogo senza ricreare lo schema: i CSV vengono copiati
+    in streaming in tabelle UNLOGGED di staging, poi nelle tabelle finali si inseriscono o
+    aggiornano solo le righe cambiate e si eliminano quelle sparite. Tutto avviene in
+    un'unica transazione, quindi le pagine non vedono mai un catalogo a metà (anche
+    recipe_stats, se ricette o ingredienti sono cambiati, viene aggiornata prima del commit).
+    Utenti, preferiti, ingredienti posseduti e image_path restano intatti (salvo le righe
+    collegate a ricette/ingredienti rimossi, eliminate in cascata).
+    Ritorna il dizionario tabella -> (inserite, aggiornate, eliminate), None in caso di errore.
+    """
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        start = time.monotonic()
 
-        # cleanup colonne temporanee (idempotente)
+        # le colonne temporanee create da database_setup.sql servono solo al caricamento completo
         cursor.execute("ALTER TABLE ingredient_classes DROP COLUMN IF EXISTS metaclass_name;")
         cursor.execute("ALTER TABLE ingredients DROP COLUMN IF EXISTS class_name;")
+
+        create_staging_tables(cursor)
+        for table, sql, lines in csv_table_loads(base_path, target_prefix=STAGING_PREFIX):
+            copy_lines(cursor, sql, lines, f"{STAGING_PREFIX}{table}")
+        for table in CATALOG_TABLES:
+            cursor.execute(f"ANALYZE {STAGING_PREFIX}{table}")
+
+        counts = {}
+        # inserimenti/aggiornamenti dai padri ai figli, eliminazioni dai figli ai padri (FK)
+        for table in CATALOG_TABLES:
+            counts[table] = upsert_from_staging(cursor, table)
+        for table in reversed(list(CATALOG_TABLES)):
+            counts[table] = counts[table] + (delete_missing_from_staging(cursor, table),)
+        # recipe_stats dipende solo da recipes e recipe_ingredients
+        if any(sum(counts[table]) for table in ("recipes", "recipe_ingredients")):
+            refresh_recipe_stats(cursor, concurrently=True)
+
+        drop_staging_tables(cursor)
         conn.commit()
+        cursor.close()
+        conn.close()
+
+        elapsed = time.monotonic() - start
+        for table, (inserted, updated, deleted) in counts.items():
+            logger.info(f"  {table}: {inserted} inserite, {updated} aggiornate, {deleted} eliminate")
+        changed = sum(sum(c) for c in counts.values())
+        logger.info(f"Aggiornamento incrementale completato in {elapsed:.2f}s ({changed} righe modificate)")
+        return counts
+
+    except Exception as e:
+        logger.error(f"Errore durante l'aggiornamento incrementale: {e}")
+        return None
+
+def fetch_table_constraints(cursor, tables):
+    """
+    Vincoli PK/UNIQUE delle tabelle e FK che le toccano (in uscita o in entrata), come
+    lista di (tabella, nome, definizione, tipo) con nomi già quotati.
+    """
+    cursor.execute(
+        """
+        SELECT c.conrelid::regclass::text, quote_ident(c.conname), pg_get_constraintdef(c.oid), c.contype
+        FROM pg_constraint c
+        WHERE c.contype IN ('p', 'u', 'f')
+          AND (c.conrelid = ANY(%s::regclass[]) OR c.confrelid = ANY(%s::regclass[]))
+        ORDER BY c.contype, c.conrelid::regclass::text, c.conname
+        """,
+        (list(tables), list(tables)),
+    )
+    return cursor.fetchall()
+
+
+def fetch_secondary_indexes(cursor, tables):
+    """Indici delle tabelle non legati a vincoli PK/UNIQUE, come lista di (tabella, nome, definizione)."""
+    cursor.execute(
+        """
+        SELECT i.indrelid::regclass::text, i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s::regclass[])
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_constraint c
+              WHERE c.conindid = i.indexrelid AND c.conrelid = i.indrelid AND c.contype IN ('p', 'u', 'x')
+          )
+        ORDER BY 1, 2
+        """,
+        (list(tables),),
+    )
+    return cursor.fetchall()
+
+
+def run_parallel(task, items, workers=POPULATE_WORKERS):
+    """Esegue task(item) su un pool di thread (ognuno con la propria connessione); ritorna i risultati."""
+    items = list(items)
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(items)))) as executor:
+        return list(executor.map(task, items))
+
+
+def run_statements(statements):
+    """Esegue in ordine gli statement su una connessione dedicata e fa commit."""
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SET maintenance_work_mem = %s", (POPULATE_MAINTENANCE_WORK_MEM,))
+            for stmt in statements:
+                cursor.execute(stmt)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _group_by_table(rows):
+    groups = {}
+    for table, stmt in rows:
+        groups.setdefault(table, []).append(stmt)
+    return list(groups.values())
+
+
+def _copy_table(load) -> int:
+    table, sql, lines = load
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            rows = copy_lines(cursor, sql, lines, table)
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+
+def load_csv_data_bulk(base_path: str = CSV_BASE_PATH, workers: int = POPULATE_WORKERS):
+    """
+    Caricamento completo parallelo per cataloghi grandi:
+      1. rimuove FK, PK/UNIQUE e indici secondari delle tabelle del catalogo (letti dal catalogo di
+         sistema, quindi vale anche per indici aggiunti in futuro allo schema)
+      2. esegue i COPY delle tabelle in parallelo, ognuno sulla propria connessione: senza vincoli
+         le tabelle sono indipendenti e non c'è manutenzione di indici riga per riga
+      3. ricrea PK/UNIQUE e indici (in parallelo per tabella), poi le FK come NOT VALID
+         seguite da VALIDATE CONSTRAINT, aggiorna recipe_stats e infine ANALYZE
+    In caso di errore i vincoli possono restare rimossi: rilanciare il caricamento completo,
+    che ricrea lo schema da database_setup.sql.
+    """
+    try:
+        tables = list(CATALOG_TABLES)
+        start = time.monotonic()
+        conn = psycopg2.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+
+        # Assicura che le colonne temporanee esistano per l'import
+        cursor.execute("ALTER TABLE ingredient_classes ADD COLUMN IF NOT EXISTS metaclass_name TEXT;")
+        cursor.execute("ALTER TABLE ingredients ADD COLUMN IF NOT EXISTS class_name TEXT;")
+
+        constraints = fetch_table_constraints(cursor, tables)
+        indexes = fetch_secondary_indexes(cursor, tables)
+        foreign_keys = [c for c in constraints if c[3] == 'f']
+        keys = [c for c in constraints if c[3] != 'f']
+        for table, name, _, _ in foreign_keys + keys:
+            cursor.execute(f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        for _, name, _ in indexes:
+            cursor.execute(f"DROP INDEX {name}")
+        conn.commit()
+        logger.info(
+            f"Rimossi {len(foreign_keys)} FK, {len(keys)} PK/UNIQUE e {len(indexes)} indici secondari "
+            "per il caricamento bulk"
+        )
+
+        # COPY in parallelo
+        copy_start = time.monotonic()
+        total = sum(run_parallel(_copy_table, csv_table_loads(base_path), workers))
+        copy_elapsed = max(time.monotonic() - copy_start, 1e-9)
+        logger.info(f"COPY paralleli: {total} righe in {copy_elapsed:.2f}s ({total / copy_elapsed:.0f} righe/s)")
+
+        cursor.execute("ALTER TABLE ingredient_classes DROP COLUMN IF EXISTS metaclass_name;")
+        cursor.execute("ALTER TABLE ingredients DROP COLUMN IF EXISTS class_name;")
+        conn.commit()
+
+        # PK/UNIQUE e indici secondari: una sequenza per tabella, tabelle in parallelo
+        step = time.monotonic()
+        run_parallel(
+            run_statements,
+            _group_by_table(
+                [(t, f"ALTER TABLE {t} ADD CONSTRAINT {n} {d}") for t, n, d, _ in keys]
+                + [(t, d) for t, _, d in indexes]
+            ),
+            workers,
+        )
+        logger.info(f"Vincoli PK/UNIQUE e indici ricreati in {time.monotonic() - step:.2f}s")
+
+        # FK: creazione NOT VALID (senza scansione), poi validazione per tabella in parallelo
+        step = time.monotonic()
+        for table, name, definition, _ in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition} NOT VALID")
+        conn.commit()
+        run_parallel(
+            run_statements,
+            _group_by_table([(t, f"ALTER TABLE {t} VALIDATE CONSTRAINT {n}") for t, n, _, _ in foreign_keys]),
+            workers,
+        )
+        logger.info(f"Vincoli FK ricreati e validati in {time.monotonic() - step:.2f}s")
+
+        refresh_recipe_stats(cursor)
+        conn.commit()
+
+        step = time.monotonic()
+        run_parallel(run_statements, [[f"ANALYZE {t}"] for t in tables + ["recipe_stats"]], workers)
+        logger.info(f"ANALYZE completato in {time.monotonic() - step:.2f}s")
 
         cursor.close()
         conn.close()
+        logger.info(f"Caricamento bulk completato in {time.monotonic() - start:.2f}s")
         return True
 
     except Exception as e:
-        logger.error(f"Errore durante il caricamento dei CSV: {e}")
+        logger.error(f"Errore durante il caricamento bulk dei CSV: {e}")
         return False
 
 # Metodo per assegnare immagini alle ricette
-def assign_recipe_images():
+IMAGES_DIR = Path("./images")
+
+
+def scan_recipe_images(images_dir=IMAGES_DIR):
+    """
+    Scansione unica (os.scandir) della cartella immagini: recipe_id -> (percorso, dimensione, mtime_ns)
+    per i file <recipe_id>.jpg.
+    """
+    images = {}
+    try:
+        entries = os.scandir(images_dir)
+    except FileNotFoundError:
+        logger.warning(f"Cartella immagini non trovata: {images_dir}")
+        return images
+    with entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext != ".jpg" or not stem.isdigit() or entry.name != f"{int(stem)}.jpg":
+                continue
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            images[int(stem)] = (str(Path(images_dir) / entry.name), st.st_size, st.st_mtime_ns)
+    return images
+
+
+def assign_recipe_images(incremental=False, images_dir=IMAGES_DIR):
+    """
+    Assegna recipes.image_path con operazioni set-based: la cartella viene letta una sola volta,
+    il risultato viene copiato (COPY) in una tabella temporanea e applicato con due statement.
+    recipe_image_files conserva percorso, dimensione e mtime dei file assegnati: in modalità
+    incrementale si toccano solo le ricette la cui immagine è comparsa, cambiata o sparita;
+    altrimenti lo stato viene ricostruito da zero.
+    """
     try:
+        start = time.monotonic()
+        images = scan_recipe_images(images_dir)
         conn = psycopg2.connect(**DB_CONFIG)
         cursor = conn.cursor()
 
-        images_dir = Path("./images")
-        cursor.execute("SELECT recipe_id FROM recipes")
-        recipe_ids = [row[0] for row in cursor.fetchall()]
-
-        for rid in recipe_ids:
-            img_path = images_dir / f"{rid}.jpg"
-            if img_path.exists():
-                cursor.execute(
-                    "UPDATE recipes SET image_path = %s WHERE recipe_id = %s",
-                    (str(img_path), rid)
-                )
-        
+        cursor.execute(
+            """
+            CREATE TEMP TABLE scanned_images (
+                recipe_id INTEGER PRIMARY KEY,
+                file_path TEXT NOT NULL,
+                file_size BIGINT NOT NULL,
+                file_mtime BIGINT NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        copy_lines(
+            cursor,
+            "COPY scanned_images (recipe_id, file_path, file_size, file_mtime) FROM STDIN WITH CSV DELIMITER ';'",
+            csv_lines((rid, path, size, mtime) for rid, (path, size, mtime) in images.items()),
+            "scanned_images",
+        )
+        cursor.execute("ANALYZE scanned_images")
+        if not incremental:
+            cursor.execute("TRUNCATE recipe_image_files")
+
+        # immagini comparse o modificate (percorso, dimensione o mtime diversi dallo stato)
+        cursor.execute(
+            """
+            WITH delta AS (
+                SELECT s.recipe_id, s.file_path, s.file_size, s.file_mtime
+                FROM scanned_images s
+                JOIN recipes r ON r.recipe_id = s.recipe_id
+                LEFT JOIN recipe_image_files f ON f.recipe_id = s.recipe_id
+                WHERE f.recipe_id IS NULL
+                   OR ROW(f.file_path, f.file_size, f.file_mtime)
+                      IS DISTINCT FROM ROW(s.file_path, s.file_size, s.file_mtime)
+            ), assigned AS (
+                UPDATE recipes r SET image_path = d.file_path
+                FROM delta d
+                WHERE r.recipe_id = d.recipe_id AND r.image_path IS DISTINCT FROM d.file_path
+            ), tracked AS (
+                INSERT INTO recipe_image_files (recipe_id, file_path, file_size, file_mtime)
+                SELECT recipe_id, file_path, file_size, file_mtime FROM delta
+                ON CONFLICT (recipe_id) DO UPDATE
+                SET file_path = EXCLUDED.file_path, file_size = EXCLUDED.file_size, file_mtime = EXCLUDED.file_mtime
+                RETURNING (xmax = 0) AS appeared
+            )
+            SELECT COUNT(*) FILTER (WHERE appeared), COUNT(*) FILTER (WHERE NOT appeared) FROM tracked
+            """
+        )
+        appeared, changed = cursor.fetchone()
+
+        # immagini sparite: si azzera image_path solo se punta ancora al file assegnato
+        cursor.execute(
+            """
+            WITH gone AS (
+                DELETE FROM recipe_image_files f
+                WHERE NOT EXISTS (SELECT 1 FROM scanned_images s WHERE s.recipe_id = f.recipe_id)
+                RETURNING f.recipe_id, f.file_path
+            ), cleared AS (
+                UPDATE recipes r SET image_path = NULL
+                FROM gone g
+                WHERE r.recipe_id = g.recipe_id AND r.image_path = g.file_path
+            )
+            SELECT COUNT(*) FROM gone
+            """
+        )
+        disappeared = cursor.fetchone()[0]
+
         conn.commit()
         cursor.close()
         conn.close()
-        logger.info("Immagini assegnate alle ricette con successo")
+        logger.info(
+            f"Immagini assegnate alle ricette in {time.monotonic() - start:.2f}s "
+            f"({len(images)} file: {appeared} nuove, {changed} modificate, {disappeared} rimosse)"
+        )
         return True
     except Exception as e:
         logger.error(f"Errore nell'assegnare le immagini: {e}")
@@ -330,8 +863,31 @@ def assign_recipe_images():
 
 
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Creazione e popolamento del database delle ricette")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--incremental",
+        action="store_true",
+        help="aggiorna il catalogo dai CSV senza ricreare le tabelle (conserva utenti, preferiti e dispensa)",
+    )
+    mode.add_argument(
+        "--parallel",
+        action="store_true",
+        help="caricamento completo con COPY paralleli e vincoli/indici ricreati dopo il caricamento",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=POPULATE_WORKERS,
+        help="connessioni parallele per --parallel (default: POPULATE_WORKERS)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """Main function to execute the database population."""
+    args = parse_args(argv)
     logger.info("=== AVVIO POPOLAMENTO DATABASE ===")
     
     # Check if CSV files exist
@@ -355,22 +911,33 @@ def main():
         logger.error("Errore nella creazione del database")
         sys.exit(1)
     
-    # 2. Execute SQL script (schema)
+    # 2. Execute SQL script (schema); in modalità incrementale senza DROP TABLE
     logger.info("\n2. Esecuzione script SQL (schema)...")
     sql_script_path = Path(__file__).parent / 'database_setup.sql'
-    if not execute_sql_script(sql_script_path):
+    if not execute_sql_script(sql_script_path, skip_drop_tables=args.incremental):
         logger.error("Errore nell'esecuzione dello script SQL")
         sys.exit(1)
 
     # 3. Load CSV data
-    logger.info("\n3. Caricamento CSV...")
-    if not load_csv_data():
-        logger.error("Errore nel caricamento dei dati CSV")
-        sys.exit(1)
+    if args.incremental:
+        logger.info("\n3. Aggiornamento incrementale dai CSV...")
+        if load_csv_data_incremental() is None:
+            logger.error("Errore nell'aggiornamento incrementale dei dati CSV")
+            sys.exit(1)
+    elif args.parallel:
+        logger.info(f"\n3. Caricamento CSV in parallelo ({args.workers} connessioni)...")
+        if not load_csv_data_bulk(workers=args.workers):
+            logger.error("Errore nel caricamento dei dati CSV")
+            sys.exit(1)
+    else:
+        logger.info("\n3. Caricamento CSV...")
+        if not load_csv_data():
+            logger.error("Errore nel caricamento dei dati CSV")
+            sys.exit(1)
 
     # 4. Assign images
     logger.info("\n4. Assegnazione immagini...")
-    if not assign_recipe_images():
+    if not assign_recipe_images(incremental=args.incremental):
         logger.error("Errore nell'assegnazione delle immagini")
         sys.exit(1)
 
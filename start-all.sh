@@ -1,4 +1,5 @@
 #!/bin/bash
 
 python3 database/populate_database.py
+python3 streamlit/recommendation/compute_item_similarity.py --build
 streamlit run streamlit/Login.py
\ No newline at end of file
@@ -12,6 +12,7 @@ except Exception:
     tomllib = None
 import psycopg2
 from psycopg2.extras import execute_values
+from recommendation.db import get_conn
 from typing import List, Tuple
 
 from dotenv import load_dotenv
@@ -33,19 +34,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
-DB_CONFIG = {
-    "host": os.getenv("PGHOST", "localhost"),
-    "database": os.getenv("PGDATABASE", "italian_recipes"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "port": int(os.getenv("PGPORT", "5432")),
-}
 # --------------- Utility DB ---------------
 
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
-
 def get_user_by_nickname(nickname: str) -> Dict | None:
     with get_conn() as conn, conn.cursor() as cur:
         cur.execute(
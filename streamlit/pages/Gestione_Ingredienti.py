@@ -1,10 +1,9 @@
-import os
 import sys
 import logging
 from typing import List, Dict, Tuple
 import streamlit as st
-import psycopg2
 from psycopg2.extras import execute_values
+from recommendation.db import get_conn
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -25,18 +24,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
-DB_CONFIG = {
-    "host": os.getenv("PGHOST", "localhost"),
-    "database": os.getenv("PGDATABASE", "italian_recipes"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "port": int(os.getenv("PGPORT", "5432")),
-}
-
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
-
 @st.cache_data(show_spinner=False)
 def get_all_ingredients() -> List[Tuple[int, str]]:
     with get_conn() as conn, conn.cursor() as cur:
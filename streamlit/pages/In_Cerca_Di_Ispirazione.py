@@ -1,15 +1,22 @@
 import os
-from typing import Dict, List, Tuple
 import logging
 import sys
 from pathlib import Path
 import streamlit as st
-import psycopg2
-from psycopg2.extras import DictCursor
-from recommendation.compute_item_similarity import (
-    build_recipe_corpus,
-    compute_similarity_matrix,
+from recommendation.catalog import current_catalog_version, get_catalog, get_categories, get_ingredient_lists
+from recommendation.compute_item_similarity import get_similarity_index
+from recommendation.facet_index import FACETS, get_facet_index
+from recommendation.favorites import add_favorite, fetch_favorite_ids, remove_favorite
+from recommendation.fridge_index import get_fridge_index
+from recommendation.ranking import (
+    RANKING_MATCH_MODE,
+    RANKING_RATIO_MODE,
+    RANKING_RATIO_MODES,
+    fetch_owned_ingredient_ids,
+    get_ranking_engine,
+    rank_recipes_for_user,
 )
+from recommendation.shopping_list import MAX_PURCHASE_BUDGET, suggest_purchases
 from dotenv import load_dotenv
 
 # Cerca .env nella root del progetto
@@ -29,148 +36,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
-DB_CONFIG = {
-    "host": os.getenv("PGHOST", "localhost"),
-    "database": os.getenv("PGDATABASE", "italian_recipes"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "port": int(os.getenv("PGPORT", "5432")),
-}
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
-
-
-# Funzioni per similarità ricette
-def fetch_recipes_and_ingredients_for_similarity() -> Tuple[List[Dict], Dict[int, List[str]]]:
-    """Replica fetch_recipes_and_ingredients usando la stessa connessione DB della pagina."""
-    with get_conn() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute(
-            """
-            SELECT recipe_id, recipe_name, category_name
-            FROM recipes
-            ORDER BY recipe_id
-            """
-        )
-        recipes = cur.fetchall()
-
-        cur.execute(
-            """
-            SELECT ri.recipe_id, i.ingredient_name
-            FROM recipe_ingredients ri
-            JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
-            ORDER BY ri.recipe_id
-            """
-        )
-        rows = cur.fetchall()
-
-    ing_by_recipe: Dict[int, List[str]] = {}
-    for r in rows:
-        rid = int(r["recipe_id"])  # DictCursor fornisce accesso per chiave
-        name = str(r["ingredient_name"]) if r["ingredient_name"] is not None else ""
-        if rid not in ing_by_recipe:
-            ing_by_recipe[rid] = []
-        if name:
-            ing_by_recipe[rid].append(name)
-
-    return recipes, ing_by_recipe
-
-
-@st.cache_resource(show_spinner=False)
-def get_similarity_resources():
-    recipes, ing_by_recipe = fetch_recipes_and_ingredients_for_similarity()
-
-    corpus, index_to_recipe = build_recipe_corpus(recipes, ing_by_recipe)
-
-    sim = compute_similarity_matrix(corpus)
-    
-    rid_to_idx = {rid: i for i, (rid, _name) in enumerate(index_to_recipe)}
-    return sim, rid_to_idx
- 
-
-def fetch_user_favorites(user_id: int) -> List[int]:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT recipe_id
-            FROM user_selected_recipes
-            WHERE user_id = %s
-            """,
-            (user_id,),
-        )
-        return [row[0] for row in cur.fetchall()]
-
-
-def fetch_categories() -> List[str]:
-    """Recupera le categorie disponibili dal DB, normalizzando eventuali spazi."""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT DISTINCT TRIM(category_name) AS category_name
-            FROM recipes
-            WHERE category_name IS NOT NULL AND TRIM(category_name) <> ''
-            ORDER BY 1
-            """
-        )
-        rows = cur.fetchall()
-        return [row[0] for row in rows]
-
-
-def fetch_top_recipes_by_owned_ratio(
-    user_id: int, category_name: str, limit: int = 10
-) -> List[Dict]:
-    """Restituisce le top ricette per categoria, ordinate per percentuale di ingredienti posseduti dall'utente."""
-    sql = """
-     SELECT r.recipe_id,
-         r.recipe_name,
-         r.recipe_link,
-         r.category_name,
-         r.cost,
-         r.difficulty,
-         r.preparation_time,
-         r.image_path,
-         COALESCE(SUM(CASE WHEN uoi.user_id IS NOT NULL THEN 1 ELSE 0 END), 0) AS owned_count,
-         COUNT(ri.ingredient_id) AS total_count,
-         COALESCE(SUM(CASE WHEN uoi.user_id IS NOT NULL THEN 1 ELSE 0 END), 0)::float
-           / NULLIF(COUNT(ri.ingredient_id), 0) AS owned_ratio
-     FROM recipes r
-     JOIN recipe_ingredients ri ON ri.recipe_id = r.recipe_id
-     LEFT JOIN user_owned_ingredients uoi
-         ON uoi.ingredient_id = ri.ingredient_id AND uoi.user_id = %s
-     WHERE LOWER(TRIM(r.category_name)) = LOWER(TRIM(%s))
-     GROUP BY r.recipe_id, r.recipe_name, r.recipe_link, r.category_name, r.cost, r.difficulty, r.preparation_time, r.image_path
-     ORDER BY owned_ratio DESC NULLS LAST, total_count DESC, r.recipe_name ASC
-     LIMIT %s
-    """
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(sql, (user_id, category_name, limit))
-        rows = cur.fetchall()
-        cols = [desc[0] for desc in cur.description]
-        return [dict(zip(cols, row)) for row in rows]
-
-
-def add_favorite(user_id: int, recipe_id: int) -> None:
-    """Aggiunge la ricetta ai preferiti dell'utente."""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO user_selected_recipes (user_id, recipe_id)
-            VALUES (%s, %s)
-            ON CONFLICT (user_id, recipe_id) DO NOTHING
-            """,
-            (user_id, recipe_id),
-        )
-        conn.commit()
-
-
-def remove_favorite(user_id: int, recipe_id: int) -> None:
-    """Rimuove la ricetta dai preferiti dell'utente."""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "DELETE FROM user_selected_recipes WHERE user_id = %s AND recipe_id = %s",
-            (user_id, recipe_id),
-        )
-        conn.commit()
 
 # Configurazione pagina e larghezza contenitore (per allargare le card)
 st.set_page_config(page_title="In Cerca Di Ispirazione", page_icon="💡", layout="wide")
@@ -198,69 +63,213 @@ if "user" not in st.session_state or not st.session_state["user"]:
 user = st.session_state["user"]
 st.caption(f"Utente: {user['nickname']}")
 
-# Selettore categorie con pulsanti orizzontali (dinamico da DB)
+# Selettore categorie con pulsanti orizzontali (tabella recipe_categories, in cache nel processo)
 try:
-    CATEGORIES = fetch_categories()
+    CATEGORIES = dict(get_categories())
 except Exception as e:
     st.error(f"Errore nel caricamento delle categorie: {e}")
-    CATEGORIES = []
+    CATEGORIES = {}
 
 if not CATEGORIES:
     st.info("Nessuna categoria trovata nel database.")
     st.stop()
 
 if (
-    "insp_selected_category" not in st.session_state
-    or st.session_state["insp_selected_category"] not in CATEGORIES
+    "insp_selected_category_id" not in st.session_state
+    or st.session_state["insp_selected_category_id"] not in CATEGORIES
 ):
-    st.session_state["insp_selected_category"] = CATEGORIES[0]
+    st.session_state["insp_selected_category_id"] = next(iter(CATEGORIES))
 
 st.write("Seleziona una categoria per vedere le ricette che puoi preparare con gli ingredienti che possiedi:")
 cols = st.columns(len(CATEGORIES))
-for i, cat in enumerate(CATEGORIES):
-    is_selected = st.session_state["insp_selected_category"].lower() == cat.lower()
+for i, (cat_id, cat) in enumerate(CATEGORIES.items()):
+    is_selected = st.session_state["insp_selected_category_id"] == cat_id
     btn_type = "primary" if is_selected else "secondary"
     with cols[i]:
-        if st.button(cat, key=f"insp_cat_{cat}", use_container_width=True, type=btn_type):
-            st.session_state["insp_selected_category"] = cat
+        if st.button(cat, key=f"insp_cat_{cat_id}", use_container_width=True, type=btn_type):
+            st.session_state["insp_selected_category_id"] = cat_id
             st.rerun()
 
-selected_category = st.session_state["insp_selected_category"]
-st.subheader(f"Categoria: {selected_category}")
+selected_category_id = st.session_state["insp_selected_category_id"]
+st.subheader(f"Categoria: {CATEGORIES[selected_category_id]}")
 
-# Carica top 10 ricette per percentuale di ingredienti posseduti e ricalcola ranking con similarity
-try:
-    recommendations = fetch_top_recipes_by_owned_ratio(
-        user_id=user["user_id"], category_name=selected_category, limit=10
+# Filtro "cosa posso cucinare adesso": query sull'indice bitmap del frigo, condiviso nel processo
+FRIDGE_FILTERS = {
+    "all": "Tutte",
+    "makeable": "Pronte da cucinare",
+    "missing": "Manca qualche ingrediente",
+    "ratio": "Percentuale minima posseduta",
+}
+fridge_filter = st.radio(
+    "Mostra",
+    options=list(FRIDGE_FILTERS),
+    format_func=FRIDGE_FILTERS.get,
+    horizontal=True,
+    key="insp_fridge_filter",
+)
+if fridge_filter == "missing":
+    max_missing = st.slider("Ingredienti mancanti al massimo", min_value=1, max_value=5, value=1, key="insp_max_missing")
+elif fridge_filter == "ratio":
+    min_percent = st.slider(
+        "Percentuale di ingredienti posseduti", min_value=0, max_value=100, value=50, step=10, key="insp_min_percent"
     )
 
-    # Risorse di similarità e preferiti utente
-    sim, rid_to_idx = get_similarity_resources()
-    fav_ids = fetch_user_favorites(user_id=user["user_id"]) or []
-    # Recupera gli ingredienti per ricetta (mappati per recipe_id) per poterli mostrare nella card
-    # (riusa la funzione già presente che restituisce la mappa recipe_id -> [ingredienti])
-    _, ing_by_recipe = fetch_recipes_and_ingredients_for_similarity()
+# Sostituti: un ingrediente mancante conta (con peso ridotto) se ne possiedi uno della stessa classe
+class_match = st.checkbox(
+    "Conta anche i sostituti della stessa classe di ingredienti",
+    value=RANKING_MATCH_MODE == "class",
+    key="insp_class_match",
+)
+match_mode = "class" if class_match else "exact"
+# Percentuale sul numero di ingredienti o pesata con le quantità della ricetta
+RATIO_MODES = {"count": "numero di ingredienti", "quantity": "quantità"}
+ratio_mode = st.radio(
+    "Percentuale calcolata su",
+    options=list(RANKING_RATIO_MODES),
+    format_func=RATIO_MODES.get,
+    index=RANKING_RATIO_MODES.index(RANKING_RATIO_MODE) if RANKING_RATIO_MODE in RANKING_RATIO_MODES else 0,
+    horizontal=True,
+    key="insp_ratio_mode",
+)
 
-    def user_similarity_for_recipe(rid: int) -> float:
-        if not fav_ids:
-            return 0.0
-        idx_r = rid_to_idx.get(rid)
-        if idx_r is None:
-            return 0.0
-        sims = []
-        for fid in fav_ids:
-            idx_f = rid_to_idx.get(fid)
-            if idx_f is not None:
-                sims.append(float(sim[idx_r][idx_f]))
-        return float(sum(sims) / len(sims)) if sims else 0.0
+owned_ids = None
+fridge = None
+fridge_query = None
+scope_bits = None
+filter_ids = None
+try:
+    owned_ids = fetch_owned_ingredient_ids(user["user_id"])
+    fridge_index = get_fridge_index()
+    fridge = fridge_index.match(owned_ids)
+    # con sostituti o percentuale sulle quantità i filtri seguono le modalità delle card
+    # (stesse query, bitmap nello stesso formato, calcolate dal motore in memoria)
+    if match_mode == "exact" and ratio_mode == "count":
+        fridge_query = fridge
+    else:
+        fridge_query = get_ranking_engine().match(owned_ids, match_mode, ratio_mode=ratio_mode)
+    makeable_count = fridge_index.count(fridge_query.makeable(selected_category_id))
+    almost_count = fridge_index.count(fridge_query.missing_at_most(1, selected_category_id))
+    st.caption(
+        f"Con i tuoi ingredienti{' e i sostituti' if match_mode == 'class' else ''}: "
+        f"{makeable_count} ricette pronte da cucinare, {almost_count} con al massimo un ingrediente mancante"
+    )
+    # ambito dei filtri: la categoria, eventualmente ristretta dal filtro sul frigo
+    scope_bits = fridge_index.scope_bits(selected_category_id)
+    if fridge_filter == "makeable":
+        scope_bits = fridge_query.makeable(selected_category_id)
+    elif fridge_filter == "missing":
+        scope_bits = fridge_query.missing_at_most(max_missing, selected_category_id)
+    elif fridge_filter == "ratio":
+        scope_bits = fridge_query.ratio_at_least(min_percent / 100, selected_category_id)
+    if fridge_filter != "all":
+        filter_ids = fridge_index.recipe_ids(scope_bits)
+except Exception as e:
+    logger.warning(f"Indice del frigo non disponibile: {e}")
+    st.warning("Filtro sugli ingredienti posseduti non disponibile al momento.")
+
+# Filtri a faccette (costo, difficoltà, tempo): bitmap precalcolate, intersecate con categoria e frigo
+# (lo scope_bits calcolato sopra con le modalità scelte, quindi conteggi e card coincidono);
+# i conteggi di ogni opzione tengono conto degli altri filtri scelti
+FACET_LABELS = {"cost": "Costo massimo", "difficulty": "Difficoltà massima", "preparation_time": "Tempo di preparazione"}
+TIME_LIMITS = (15, 30, 45, 60, 90, 120)
+if scope_bits is not None:
+    try:
+        facet_index = get_facet_index()
+        facet_options = {
+            name: [None] + (list(TIME_LIMITS) if name == "preparation_time" else facet_index.facets[name].values.tolist())
+            for name in FACETS
+        }
+        limits = {}
+        for name in FACETS:
+            # un valore non più presente nel catalogo torna a "Qualsiasi"
+            if st.session_state.get(f"insp_max_{name}") not in facet_options[name]:
+                st.session_state.pop(f"insp_max_{name}", None)
+            limits[name] = st.session_state.get(f"insp_max_{name}")
+        facets = facet_index.search(scope_bits, {name: (None, limit) for name, limit in limits.items()})
+
+        for col, name in zip(st.columns(len(FACETS)), FACETS):
+            thresholds = facet_options[name][1:]
+            counts = dict(zip(thresholds, facets.at_most_counts(name, thresholds)))
+            unit = " min" if name == "preparation_time" else ""
+            with col:
+                st.selectbox(
+                    FACET_LABELS[name],
+                    options=facet_options[name],
+                    format_func=lambda v, c=counts, u=unit: "Qualsiasi" if v is None else f"≤ {v}{u} ({c[v]})",
+                    key=f"insp_max_{name}",
+                )
+        if any(limit is not None for limit in limits.values()):
+            st.caption(f"{facets.count} ricette corrispondono ai filtri")
+            filter_ids = fridge_index.recipe_ids(facets.bits)
+    except Exception as e:
+        logger.warning(f"Indice delle faccette non disponibile: {e}")
+        st.warning("Filtri su costo, difficoltà e tempo non disponibili al momento.")
+
+# Lista della spesa: pochi ingredienti da comprare che sbloccano più ricette. Il corpo dell'expander
+# gira a ogni rerun anche da chiuso, quindi il calcolo parte solo dal pulsante e il risultato resta
+# in sessione finché non cambiano ingredienti posseduti, budget, categoria o versione del catalogo
+if fridge is not None:
+    with st.expander("🛒 Cosa comprare per cucinare di più"):
+        shop_budget = st.slider(
+            "Ingredienti da comprare al massimo",
+            min_value=1,
+            max_value=MAX_PURCHASE_BUDGET,
+            value=3,
+            key="insp_shop_budget",
+        )
+        shop_in_category = st.checkbox("Solo ricette della categoria selezionata", key="insp_shop_in_category")
+        shop_category_id = selected_category_id if shop_in_category else None
+        try:
+            catalog_version = current_catalog_version()
+        except Exception as e:
+            logger.warning(f"Versione del catalogo non disponibile: {e}")
+            catalog_version = None
+        shop_key = (frozenset(owned_ids), shop_budget, shop_category_id, catalog_version)
+        if st.button("Calcola cosa comprare", key="insp_shop_run"):
+            try:
+                purchases = suggest_purchases(fridge, budget=shop_budget, category_id=shop_category_id)
+            except Exception as e:
+                logger.warning(f"Lista della spesa non disponibile: {e}")
+                purchases = []
+            st.session_state["insp_shop_result"] = (shop_key, purchases)
+        shop_result = st.session_state.get("insp_shop_result")
+        if shop_result is None or shop_result[0] != shop_key:
+            st.caption("Premi il pulsante per calcolare gli acquisti con il budget scelto.")
+        elif not shop_result[1]:
+            st.caption("Nessun acquisto entro il budget sblocca nuove ricette.")
+        else:
+            purchases = shop_result[1]
+            unlocked_total = sum(len(step["recipe_ids"]) for step in purchases)
+            st.caption(f"Comprando questi ingredienti sblocchi {unlocked_total} ricette.")
+            for step in purchases:
+                st.markdown(
+                    f"**Compra: {', '.join(step['ingredient_names'])}** → "
+                    f"{len(step['recipe_ids'])} {'ricetta' if len(step['recipe_ids']) == 1 else 'ricette'}: "
+                    f"{', '.join(step['recipe_names'][:5])}"
+                    + (" …" if len(step["recipe_names"]) > 5 else "")
+                )
 
-    # Calcola punteggio finale e riordina
-    for rec in recommendations:
-        ratio = float(rec.get("owned_ratio") or 0.0)
-        sim_avg = user_similarity_for_recipe(int(rec["recipe_id"]))
-        rec["final_score"] = 0.7 * ratio + 0.3 * sim_avg
+# Top 10 della categoria per punteggio finale (owned_ratio + similarità con i preferiti), calcolato su tutta la categoria
+try:
+    # Risorse di similarità (indice condiviso del processo) e preferiti utente
+    sim_index = get_similarity_index()
+    fav_ids = fetch_favorite_ids(user_id=user["user_id"]) or []
+
+    # Backend SQL o motore in memoria secondo RANKING_BACKEND; pesi da RANKING_WEIGHT_*
+    recommendations = rank_recipes_for_user(
+        user_id=user["user_id"],
+        category_id=selected_category_id,
+        favorite_ids=fav_ids,
+        sim_index=sim_index,
+        limit=10,
+        recipe_ids=filter_ids,
+        owned_ingredient_ids=owned_ids,
+        match_mode=match_mode,
+        ratio_mode=ratio_mode,
+    )
 
-    recommendations.sort(key=lambda r: r.get("final_score", 0.0), reverse=True) # Ordina per punteggio finale
+    # Ingredienti da mostrare nelle card: solo le ricette a schermo, una query batch con cache per recipe_id
+    ing_by_recipe = get_ingredient_lists(int(rec["recipe_id"]) for rec in recommendations)
 except Exception as e:
     st.error(f"Errore nel calcolo delle raccomandazioni: {e}")
     recommendations = []
@@ -277,9 +286,11 @@ else:
         diff = rec.get("difficulty")
         prep = rec.get("preparation_time")
         owned = rec.get("owned_count") or 0
+        substitutes = rec.get("substitute_count") or 0
         total = rec.get("total_count") or 0
         ratio = rec.get("owned_ratio") or 0.0
         percent = int(round(ratio * 100)) if total else 0
+        percent_label = f"{percent}% delle quantità" if ratio_mode == "quantity" else f"{percent}%"
         image_path = rec.get("image_path")
 
         # Costruisci il percorso assoluto rispetto alla root del progetto
@@ -308,7 +319,12 @@ else:
                     meta_parts.append(f"Difficoltà: {diff}")
                 if prep is not None:
                     meta_parts.append(f"Tempo prep: {prep} min")
-                meta_parts.append(f"Ingredienti posseduti: {owned}/{total} ({percent}%)")
+                if substitutes:
+                    meta_parts.append(
+                        f"Ingredienti posseduti: {owned}/{total} + {substitutes} sostituibili ({percent_label})"
+                    )
+                else:
+                    meta_parts.append(f"Ingredienti posseduti: {owned}/{total} ({percent_label})")
                 # Mostra anche il punteggio finale calcolato (0..1)
                 score = rec.get("final_score")
                 if score is not None:
@@ -331,6 +347,19 @@ else:
                 if ing_list:
                     ing_str = ", ".join(ing_list)
                     st.caption("Ingredienti: " + ing_str)
+                # ingredienti mancanti (né posseduti né sostituibili, secondo la modalità scelta)
+                if fridge_query is not None and total and owned + substitutes < total:
+                    missing_list = fridge_query.missing_ingredients(rid_key)
+                    if missing_list:
+                        st.caption("Ti mancano: " + ", ".join(missing_list))
+                # sostituti della stessa classe tra gli ingredienti posseduti (dal catalogo, senza motore)
+                if substitutes and owned_ids is not None:
+                    swaps = get_catalog().substitutions(rid_key, owned_ids)
+                    if swaps:
+                        st.caption(
+                            "Puoi sostituire: "
+                            + "; ".join(f"{name} con {' o '.join(alts[:3])}" for name, alts in swaps.items())
+                        )
 
 
             with cols[2]:
@@ -1,12 +1,8 @@
 import os
-from typing import Dict, List, Tuple
 import streamlit as st
-import psycopg2
-from psycopg2.extras import DictCursor
-from recommendation.compute_item_similarity import (
-    build_recipe_corpus,
-    compute_similarity_matrix,
-)
+from recommendation.catalog import get_catalog
+from recommendation.compute_item_similarity import get_similarity_index
+from recommendation.favorites import fetch_favorites_with_ingredients, remove_favorite
 import pathlib
 import logging
 import sys
@@ -30,121 +26,6 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
-DB_CONFIG = {
-    "host": os.getenv("PGHOST", "localhost"),
-    "database": os.getenv("PGDATABASE", "italian_recipes"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "port": int(os.getenv("PGPORT", "5432")),
-}
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
-
-
-def fetch_ingredients_for_recipe(recipe_id: int) -> List[str]:
-    """Return list of ingredient names for a given recipe_id (ordered by ingredient name)."""
-    try:
-        with get_conn() as conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT i.ingredient_name
-                FROM recipe_ingredients ri
-                JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
-                WHERE ri.recipe_id = %s
-                ORDER BY i.ingredient_name
-                """,
-                (recipe_id,),
-            )
-            rows = cur.fetchall()
-            result: List[str] = []
-            for (name,) in rows:
-                if name:
-                    result.append(str(name))
-            return result
-    except Exception:
-        return []
-
-
-
-@st.cache_resource(show_spinner=False)
-def get_similarity_resources():
-    """Carica ricette/ingredienti, costruisce il corpus e calcola la matrice di similarità.
-    Ritorna anche mappe di supporto: recipe_id -> indice e recipe_id -> link.
-    """
-    with get_conn() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute(
-            """
-            SELECT recipe_id, recipe_name, category_name, recipe_link
-            FROM recipes
-            ORDER BY recipe_id
-            """
-        )
-        recipes = cur.fetchall()
-        cur.execute(
-            """
-            SELECT ri.recipe_id, i.ingredient_name
-            FROM recipe_ingredients ri
-            JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
-            ORDER BY ri.recipe_id
-            """
-        )
-        rows = cur.fetchall()
-    ing_by_recipe: Dict[int, List[str]] = {}
-    rid_to_link: Dict[int, str] = {}
-    for rec in recipes:
-        rid = int(rec["recipe_id"])
-        rid_to_link[rid] = rec.get("recipe_link") or ""
-    for r in rows:
-        rid = int(r["recipe_id"])
-        name = str(r["ingredient_name"]) if r["ingredient_name"] is not None else ""
-        if rid not in ing_by_recipe:
-            ing_by_recipe[rid] = []
-        if name:
-            ing_by_recipe[rid].append(name)
-    corpus, index_to_recipe = build_recipe_corpus(recipes, ing_by_recipe)
-    sim = compute_similarity_matrix(corpus)
-    rid_to_idx = {rid: i for i, (rid, _name) in enumerate(index_to_recipe)}
-    return sim, rid_to_idx, index_to_recipe, rid_to_link
-
-def fetch_favorites(user_id: int) -> List[Dict]:
-    """Ritorna le ricette preferite dell'utente con info ricetta, ordinate per data di selezione."""
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT r.recipe_id, r.recipe_name, r.recipe_link, r.category_name,
-                   r.cost, r.difficulty, r.preparation_time, r.image_path,
-                   usr.selected_at
-            FROM user_selected_recipes AS usr
-            JOIN recipes AS r ON r.recipe_id = usr.recipe_id
-            WHERE usr.user_id = %s
-            ORDER BY usr.selected_at DESC
-            """,
-            (user_id,)
-        )
-        rows = cur.fetchall()
-        cols = [desc[0] for desc in cur.description]
-        return [dict(zip(cols, row)) for row in rows]
-
-def remove_favorite(user_id: int, recipe_id: int) -> None:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            "DELETE FROM user_selected_recipes WHERE user_id = %s AND recipe_id = %s",
-            (user_id, recipe_id)
-        )
-        conn.commit()
-
-def add_favorite(user_id: int, recipe_id: int) -> None:
-    with get_conn() as conn, conn.cursor() as cur:
-        cur.execute(
-            """
-            INSERT INTO user_selected_recipes (user_id, recipe_id)
-            VALUES (%s, %s)
-            ON CONFLICT (user_id, recipe_id) DO NOTHING
-            """,
-            (user_id, recipe_id),
-        )
-        conn.commit()
 
 # Configurazione pagina e larghezza contenitore
 st.set_page_config(page_title="Le tue ricette preferite", page_icon="❤️", layout="wide")
@@ -171,18 +52,19 @@ if "user" not in st.session_state or not st.session_state["user"]:
 user = st.session_state["user"]
 st.caption(f"Utente: {user['nickname']}")
 
-# Carica preferiti
+# Carica preferiti (e ingredienti di tutte le card con una sola query batch)
 try:
-    favorites = fetch_favorites(user_id=user["user_id"])
+    favorites, ing_by_recipe = fetch_favorites_with_ingredients(user_id=user["user_id"])
 except Exception as e:
     st.error(f"Errore durante il caricamento dei preferiti: {e}")
-    favorites = []
+    favorites, ing_by_recipe = [], {}
 
 if not favorites:
     st.info("Non hai ancora aggiunto ricette ai preferiti.")
 else:
-    # Risorse similarità con mappe
-    sim, rid_to_idx, index_to_recipe, rid_to_link = get_similarity_resources()
+    # Risorse similarità (indice e catalogo condivisi del processo)
+    sim_index = get_similarity_index()
+    catalog = get_catalog()
     for rec in favorites:
         name = rec.get("recipe_name") or f"Ricetta #{rec.get('recipe_id')}"
         link = rec.get("recipe_link")
@@ -230,7 +112,7 @@ else:
                 except Exception:
                     rid_key = rec.get("recipe_id")
                 try:
-                    ingredients = fetch_ingredients_for_recipe(rid_key)
+                    ingredients = ing_by_recipe.get(rid_key, [])
                     if ingredients:
                         ing_str = ", ".join(ingredients)
                         st.caption("Ingredienti: " + ing_str)
@@ -283,17 +165,14 @@ else:
                 # Se attivo, mostra top3 simili con link
                 if st.session_state.get(sim_key, False):
                     try:
-                        idx = rid_to_idx.get(rid)
-                        if idx is None:
+                        if sim_index.index_of(rid) is None:
                             st.warning("Impossibile calcolare similarità per questa ricetta.")
                         else:
-                            scores = [(j, float(sim[idx][j])) for j in range(len(index_to_recipe)) if j != idx]
-                            scores.sort(key=lambda x: x[1], reverse=True)
-                            top3 = scores[:3]
+                            top3 = sim_index.neighbors(rid, k=3)
                             st.caption("Ricette simili:")
-                            for j, s in top3:
-                                rid_j, name_j = index_to_recipe[j]
-                                link_j = rid_to_link.get(rid_j)
+                            for rid_j, s in top3:
+                                name_j = catalog.recipe_name(rid_j) or f"Ricetta #{rid_j}"
+                                link_j = catalog.recipe_link(rid_j)
                                 if link_j:
                                     st.markdown(f"- [{name_j}]({link_j}) (sim: {s:.2f})")
                                 else:
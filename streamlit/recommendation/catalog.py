@@ -0,0 +1,429 @@
+"""
+Catalogo ricette condiviso (data-access unico per pagine e CLI).
+
+Ricette, ingredienti e mapping ricetta -> ingredienti vengono letti una sola volta
+per processo e tenuti in array compatti:
+  - id interi ordinati (recipe_ids, ingredient_ids) con ricerca per searchsorted
+  - tabella dei nomi ingrediente internata, allineata a ingredient_ids
+  - mapping ricetta -> ingredienti in formato CSR (indptr / indici di colonna / quantità)
+Tutti i consumatori (pagine Streamlit e compute_item_similarity) condividono la stessa
+istanza tramite get_catalog(), quindi memoria e warm-up scalano con una sola copia.
+
+Per le card che mostrano pochi risultati c'è anche una lookup leggera
+(get_ingredient_lists) che interroga il DB solo per gli id richiesti, con una cache
+LRU per recipe_id invalidata quando cambia la versione del catalogo. Anche l'elenco
+delle categorie (get_categories, dalla tabella recipe_categories) è in cache e viene
+riletto solo quando la versione cambia.
+"""
+
+import os
+import sys
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from recommendation.db import get_conn
+
+logger = logging.getLogger(__name__)
+
+# Ogni quanti secondi ricontrollare la versione del catalogo nel DB
+CATALOG_VERSION_TTL = float(os.getenv("CATALOG_VERSION_TTL", "30"))
+# Numero massimo di ricette nella cache delle liste ingredienti
+INGREDIENT_CACHE_SIZE = int(os.getenv("INGREDIENT_CACHE_SIZE", "5000"))
+
+CATALOG_TABLES = ("ingredient_classes", "ingredients", "recipe_categories", "recipe_ingredients", "recipes")
+
+
+@dataclass
+class Catalog:
+    """
+    Snapshot in memoria del catalogo. Le ricette sono ordinate per recipe_id e la riga i
+    di ogni array per-ricetta corrisponde a recipe_ids[i]; lo stesso vale per gli ingredienti.
+    """
+    recipe_ids: np.ndarray              # (R,) int64
+    recipe_names: List[str]
+    recipe_links: List[str]
+    category_names: List[str]
+    category_ids: np.ndarray            # (R,) int32, -1 se assente
+    cost: np.ndarray                    # (R,) int32, -1 se assente
+    difficulty: np.ndarray              # (R,) int32, -1 se assente
+    preparation_time: np.ndarray        # (R,) int32, -1 se assente
+    image_paths: List[Optional[str]]
+    ingredient_ids: np.ndarray          # (I,) int64
+    ingredient_names: List[str]         # nomi internati, allineati a ingredient_ids
+    ingredient_class_ids: np.ndarray    # (I,) int32
+    ingredient_metaclass_ids: np.ndarray  # (I,) int32, -1 se assente
+    ri_indptr: np.ndarray               # (R+1,) int64
+    ri_ingredients: np.ndarray          # (nnz,) int32, indice di colonna in ingredient_ids
+    ri_quantities: np.ndarray           # (nnz,) int32
+    _rid_to_idx: Dict[int, int] = field(default_factory=dict, repr=False)
+
+    def __post_init__(self):
+        if not self._rid_to_idx:
+            self._rid_to_idx = {int(rid): i for i, rid in enumerate(self.recipe_ids)}
+
+    @property
+    def n_recipes(self) -> int:
+        return int(self.recipe_ids.shape[0])
+
+    @property
+    def n_ingredients(self) -> int:
+        return int(self.ingredient_ids.shape[0])
+
+    def index_of(self, recipe_id: int) -> Optional[int]:
+        return self._rid_to_idx.get(int(recipe_id))
+
+    def ingredient_positions(self, i: int) -> np.ndarray:
+        """Indici di colonna (nella tabella ingredienti) della ricetta alla riga i."""
+        return self.ri_ingredients[self.ri_indptr[i]:self.ri_indptr[i + 1]]
+
+    def ingredient_names_for(self, recipe_id: int) -> List[str]:
+        i = self.index_of(recipe_id)
+        if i is None:
+            return []
+        return [self.ingredient_names[j] for j in self.ingredient_positions(i) if self.ingredient_names[j]]
+
+    def ingredient_positions_of(self, ingredient_ids: Iterable[int]) -> np.ndarray:
+        """Indici di colonna degli ingredient_id dati (searchsorted); gli id sconosciuti sono ignorati."""
+        ids = np.fromiter((int(i) for i in ingredient_ids), dtype=np.int64)
+        if not ids.size or not self.n_ingredients:
+            return np.empty(0, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.ingredient_ids, ids), self.n_ingredients - 1)
+        return pos[self.ingredient_ids[pos] == ids]
+
+    def substitutions(self, recipe_id: int, owned_ingredient_ids: Iterable[int]) -> Dict[str, List[str]]:
+        """Ingredienti mancanti della ricetta -> nomi degli ingredienti posseduti della stessa classe."""
+        i = self.index_of(recipe_id)
+        if i is None:
+            return {}
+        owned = np.zeros(self.n_ingredients, dtype=bool)
+        owned[self.ingredient_positions_of(owned_ingredient_ids)] = True
+        by_class: Dict[int, List[str]] = {}
+        for k in np.flatnonzero(owned & (self.ingredient_class_ids >= 0)):
+            by_class.setdefault(int(self.ingredient_class_ids[k]), []).append(self.ingredient_names[k])
+        result = {}
+        for j in self.ingredient_positions(i):
+            alternatives = by_class.get(int(self.ingredient_class_ids[j])) if not owned[j] else None
+            if alternatives:
+                result[self.ingredient_names[j]] = sorted(alternatives)
+        return result
+
+    def recipe_name(self, recipe_id: int) -> str:
+        i = self.index_of(recipe_id)
+        return self.recipe_names[i] if i is not None else ""
+
+    def recipe_link(self, recipe_id: int) -> str:
+        i = self.index_of(recipe_id)
+        return self.recipe_links[i] if i is not None else ""
+
+    def recipe_rows(self) -> List[Dict]:
+        """Ricette come lista di dict (recipe_id, recipe_name, category_name), ordinate per id."""
+        return [
+            {"recipe_id": int(rid), "recipe_name": name, "category_name": cat}
+            for rid, name, cat in zip(self.recipe_ids, self.recipe_names, self.category_names)
+        ]
+
+    def ingredients_by_recipe(self) -> Dict[int, List[str]]:
+        """Mapping recipe_id -> lista nomi ingredienti (vista compatibile con build_recipe_corpus)."""
+        return {
+            int(rid): [self.ingredient_names[j] for j in self.ingredient_positions(i) if self.ingredient_names[j]]
+            for i, rid in enumerate(self.recipe_ids)
+        }
+
+
+def _int_column(values: List, default: int = -1) -> np.ndarray:
+    return np.fromiter((default if v is None else int(v) for v in values), dtype=np.int32, count=len(values))
+
+
+def load_catalog(conn) -> Catalog:
+    """Legge il catalogo con tre query (ricette, ingredienti, mapping) e lo converte in array compatti."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT recipe_id, recipe_name, recipe_link, category_name, category_id,
+                   cost, difficulty, preparation_time, image_path
+            FROM recipes
+            ORDER BY recipe_id
+            """
+        )
+        recipes = cur.fetchall()
+
+        cur.execute(
+            """
+            SELECT i.ingredient_id, i.ingredient_name, i.class_id, c.metaclass_id
+            FROM ingredients i
+            LEFT JOIN ingredient_classes c ON c.class_id = i.class_id
+            ORDER BY i.ingredient_id
+            """
+        )
+        ingredients = cur.fetchall()
+
+        cur.execute(
+            """
+            SELECT recipe_id, ingredient_id, quantity
+            FROM recipe_ingredients
+            ORDER BY recipe_id
+            """
+        )
+        links = cur.fetchall()
+
+    recipe_cols = list(zip(*recipes)) if recipes else [[] for _ in range(9)]
+    recipe_ids = np.asarray(recipe_cols[0], dtype=np.int64)
+    ingredient_cols = list(zip(*ingredients)) if ingredients else [[] for _ in range(4)]
+    ingredient_ids = np.asarray(ingredient_cols[0], dtype=np.int64)
+
+    if links:
+        ri = np.asarray(links, dtype=np.int64)
+        rows = np.searchsorted(recipe_ids, ri[:, 0])
+        cols = np.searchsorted(ingredient_ids, ri[:, 1])
+        # difesa da righe orfane (non dovrebbero esistere grazie alle FK)
+        valid = (
+            (rows < recipe_ids.shape[0]) & (cols < ingredient_ids.shape[0])
+        )
+        valid[valid] &= (recipe_ids[rows[valid]] == ri[valid, 0]) & (ingredient_ids[cols[valid]] == ri[valid, 1])
+        rows, cols, qty = rows[valid], cols[valid], ri[valid, 2]
+        order = np.argsort(rows, kind="stable")
+        rows, cols, qty = rows[order], cols[order], qty[order]
+    else:
+        rows = cols = qty = np.empty(0, dtype=np.int64)
+
+    indptr = np.zeros(recipe_ids.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=recipe_ids.shape[0]), out=indptr[1:])
+
+    return Catalog(
+        recipe_ids=recipe_ids,
+        recipe_names=[str(v) if v is not None else "" for v in recipe_cols[1]],
+        recipe_links=[str(v) if v is not None else "" for v in recipe_cols[2]],
+        category_names=[str(v) if v is not None else "" for v in recipe_cols[3]],
+        category_ids=_int_column(recipe_cols[4]),
+        cost=_int_column(recipe_cols[5]),
+        difficulty=_int_column(recipe_cols[6]),
+        preparation_time=_int_column(recipe_cols[7]),
+        image_paths=list(recipe_cols[8]),
+        ingredient_ids=ingredient_ids,
+        ingredient_names=[sys.intern(str(v)) if v is not None else "" for v in ingredient_cols[1]],
+        ingredient_class_ids=_int_column(ingredient_cols[2]),
+        ingredient_metaclass_ids=_int_column(ingredient_cols[3]),
+        ri_indptr=indptr,
+        ri_ingredients=cols.astype(np.int32),
+        ri_quantities=qty.astype(np.int32),
+    )
+
+
+def fetch_catalog_hash(conn) -> str:
+    """
+    Hash di contenuto delle tabelle usate per la similarità (recipes, recipe_ingredients, ingredients
+    con classe e metaclasse). L'aggregazione md5 avviene lato server: viaggiano solo due digest, non le righe.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT md5(COALESCE(string_agg(
+                concat_ws('|', recipe_id, recipe_name, category_name), E'\\n' ORDER BY recipe_id
+            ), ''))
+            FROM recipes
+        """)
+        recipes_md5 = cur.fetchone()[0]
+        cur.execute("""
+            SELECT md5(COALESCE(string_agg(
+                concat_ws('|', ri.recipe_id, ri.ingredient_id, i.ingredient_name, ri.quantity,
+                          i.class_id, c.metaclass_id), E'\\n'
+                ORDER BY ri.recipe_id, ri.ingredient_id
+            ), ''))
+            FROM recipe_ingredients ri
+            JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+            LEFT JOIN ingredient_classes c ON c.class_id = i.class_id
+        """)
+        ingredients_md5 = cur.fetchone()[0]
+    return hashlib.sha256(f"{recipes_md5}:{ingredients_md5}".encode("utf-8")).hexdigest()
+
+
+def fetch_catalog_version(conn) -> str:
+    """
+    Token di versione economico (O(1)) del catalogo: relid e contatori di insert/update/delete
+    delle tabelle del catalogo da pg_stat_user_tables. Cambia a ogni modifica o ricreazione delle
+    tabelle; a differenza di fetch_catalog_hash non legge i dati.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT COALESCE(string_agg(
+                concat_ws(':', relname, relid, n_tup_ins, n_tup_upd, n_tup_del), ',' ORDER BY relname
+            ), '')
+            FROM pg_stat_user_tables
+            WHERE schemaname = ANY(current_schemas(false)) AND relname = ANY(%s)
+            """,
+            (list(CATALOG_TABLES),),
+        )
+        return cur.fetchone()[0]
+
+
+def fetch_ingredients_for_recipes(conn, recipe_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """
+    Nomi degli ingredienti (ordinati per nome) per le sole ricette richieste, in un'unica query
+    raggruppata per ricetta. Le ricette senza ingredienti compaiono con lista vuota.
+    """
+    ids = sorted({int(rid) for rid in recipe_ids})
+    result: Dict[int, List[str]] = {rid: [] for rid in ids}
+    if not ids:
+        return result
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT ri.recipe_id, array_agg(i.ingredient_name ORDER BY i.ingredient_name)
+            FROM recipe_ingredients ri
+            JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+            WHERE ri.recipe_id = ANY(%s)
+            GROUP BY ri.recipe_id
+            """,
+            (ids,),
+        )
+        for rid, names in cur.fetchall():
+            result[int(rid)] = [str(name) for name in names if name]
+    return result
+
+
+def fetch_categories(conn) -> List[Tuple[int, str]]:
+    """Categorie (category_id, category_name) della tabella recipe_categories, ordinate per nome."""
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT category_id, category_name
+            FROM recipe_categories
+            WHERE category_name <> ''
+            ORDER BY category_name, category_id
+            """
+        )
+        return [(int(cid), str(name)) for cid, name in cur.fetchall()]
+
+
+_version_lock = threading.Lock()
+_version_token: Optional[str] = None
+_version_checked_at = 0.0
+
+
+def current_catalog_version(max_age: float = CATALOG_VERSION_TTL) -> str:
+    """Versione del catalogo, riletta dal DB al più una volta ogni max_age secondi."""
+    global _version_token, _version_checked_at
+    with _version_lock:
+        now = time.monotonic()
+        if _version_token is None or now - _version_checked_at >= max_age:
+            with get_conn() as conn:
+                _version_token = fetch_catalog_version(conn)
+            _version_checked_at = now
+        return _version_token
+
+
+class IngredientListCache:
+    """
+    Cache LRU recipe_id -> lista ingredienti. Le mancanti vengono lette con una sola query
+    batch; l'intera cache si svuota quando cambia la versione del catalogo.
+    """
+
+    def __init__(self, maxsize: int = INGREDIENT_CACHE_SIZE):
+        self.maxsize = max(1, int(maxsize))
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._version: Optional[str] = None
+
+    def get_many(self, recipe_ids: Iterable[int]) -> Dict[int, List[str]]:
+        ids = [int(rid) for rid in recipe_ids]
+        version = current_catalog_version()
+        result: Dict[int, List[str]] = {}
+        missing: List[int] = []
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            for rid in ids:
+                names = self._entries.get(rid)
+                if names is None:
+                    missing.append(rid)
+                else:
+                    self._entries.move_to_end(rid)
+                    result[rid] = names
+
+        if missing:
+            with get_conn() as conn:
+                fetched = fetch_ingredients_for_recipes(conn, missing)
+            with self._lock:
+                if self._version == version:
+                    for rid, names in fetched.items():
+                        self._entries[rid] = names
+                        self._entries.move_to_end(rid)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+            result.update(fetched)
+        return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_catalog_lock = threading.Lock()
+_catalog: Optional[Catalog] = None
+_catalog_version: Optional[str] = None
+_ingredient_cache = IngredientListCache()
+_categories_lock = threading.Lock()
+_categories: Optional[List[Tuple[int, str]]] = None
+_categories_version: Optional[str] = None
+
+
+def get_catalog() -> Catalog:
+    """
+    Ritorna il catalogo del processo, caricandolo al primo accesso (thread-safe)
+    e ricaricandolo quando la versione del catalogo nel DB cambia.
+    """
+    global _catalog, _catalog_version
+    version = current_catalog_version()
+    if _catalog is None or _catalog_version != version:
+        with _catalog_lock:
+            if _catalog is None or _catalog_version != version:
+                with get_conn() as conn:
+                    _catalog = load_catalog(conn)
+                _catalog_version = version
+                logger.info(
+                    f"Catalogo caricato: {_catalog.n_recipes} ricette, "
+                    f"{_catalog.n_ingredients} ingredienti, {_catalog.ri_ingredients.shape[0]} associazioni"
+                )
+    return _catalog
+
+
+def get_ingredient_lists(recipe_ids: Iterable[int]) -> Dict[int, List[str]]:
+    """Liste ingredienti per le ricette richieste (cache condivisa del processo)."""
+    return _ingredient_cache.get_many(recipe_ids)
+
+
+def get_categories() -> List[Tuple[int, str]]:
+    """Categorie (category_id, category_name) per i selettori delle pagine (cache condivisa del processo)."""
+    global _categories, _categories_version
+    version = current_catalog_version()
+    with _categories_lock:
+        if _categories is None or _categories_version != version:
+            with get_conn() as conn:
+                _categories = fetch_categories(conn)
+            _categories_version = version
+        return list(_categories)
+
+
+def invalidate_catalog() -> None:
+    """Scarta catalogo e cache in memoria: il prossimo accesso rilegge dal DB."""
+    global _catalog, _catalog_version, _version_token, _categories, _categories_version
+    with _catalog_lock:
+        _catalog = None
+        _catalog_version = None
+    with _categories_lock:
+        _categories = None
+        _categories_version = None
+    with _version_lock:
+        _version_token = None
+    _ingredient_cache.clear()
@@ -1,18 +1,54 @@
 import os
 import sys
 import math
+import time
+import hashlib
 import logging
+import argparse
+import threading
 from pathlib import Path
-from typing import Dict, List, Tuple
-import psycopg2
-from psycopg2.extras import DictCursor
+from typing import Dict, List, Optional, Tuple
 import numpy as np
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from scipy import sparse
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.preprocessing import normalize
 
 
 from dotenv import load_dotenv
 
+# Consente l'esecuzione come script standalone (python streamlit/recommendation/compute_item_similarity.py)
+STREAMLIT_ROOT = Path(__file__).resolve().parents[1]
+if str(STREAMLIT_ROOT) not in sys.path:
+    sys.path.insert(0, str(STREAMLIT_ROOT))
+
+from recommendation.catalog import (  # noqa: E402
+    Catalog,
+    current_catalog_version,
+    fetch_catalog_hash,
+    get_catalog,
+)
+from recommendation.db import get_conn  # noqa: E402
+from recommendation.recipe_features import (  # noqa: E402
+    feature_params,
+    fit_recipe_features,
+    recipe_feature_hashes,
+    transform_recipe_features,
+)
+from recommendation.similarity_index import (  # noqa: E402
+    DEFAULT_BLOCK_SIZE,
+    DEFAULT_TOP_K,
+    DEFAULT_WORKERS,
+    SimilarityIndex,
+    build_similarity_index,
+    load_doc_hashes,
+    load_similarity_artifact,
+    load_vectorizer_state,
+    read_artifact_manifest,
+    save_similarity_artifact,
+    top_k_per_row,
+    update_similarity_index,
+)
+
 # Cerca .env nella root del progetto
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 env_path = PROJECT_ROOT / ".env"
@@ -30,52 +66,47 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
-DB_CONFIG = {
-    "host": os.getenv("PGHOST", "localhost"),
-    "database": os.getenv("PGDATABASE", "italian_recipes"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD"),
-    "port": int(os.getenv("PGPORT", "5432")),
+
+# Artefatto di similarità precalcolato (vedi --build)
+SIMILARITY_ARTIFACT_DIR = Path(
+    os.getenv("SIMILARITY_ARTIFACT_DIR", str(PROJECT_ROOT / "artifacts" / "similarity"))
+)
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", str(DEFAULT_TOP_K)))
+# Feature delle ricette: "structured" (id di ingredienti, classi e metaclassi più TF-IDF del
+# titolo, vedi recipe_features.py) oppure "text" (TF-IDF del testo titolo + categoria + ingredienti)
+SIMILARITY_FEATURES = os.getenv("SIMILARITY_FEATURES", "structured")
+FEATURE_MODES = ("structured", "text")
+# Thread e righe per blocco nel calcolo dei top-K (picco di memoria: workers x block_size x N float32)
+SIMILARITY_WORKERS = int(os.getenv("SIMILARITY_WORKERS", str(DEFAULT_WORKERS)))
+SIMILARITY_BLOCK_SIZE = int(os.getenv("SIMILARITY_BLOCK_SIZE", str(DEFAULT_BLOCK_SIZE)))
+# Aggiornamento incrementale dell'artefatto: vocabolario e idf restano quelli dell'ultimo
+# addestramento completo, che viene ripetuto quando le ricette aggiunte/modificate/rimosse da
+# allora superano questa frazione del catalogo o l'addestramento è più vecchio di questi giorni
+SIMILARITY_FULL_REBUILD_RATIO = float(os.getenv("SIMILARITY_FULL_REBUILD_RATIO", "0.1"))
+SIMILARITY_FULL_REBUILD_DAYS = float(os.getenv("SIMILARITY_FULL_REBUILD_DAYS", "7"))
+
+TFIDF_PARAMS = {
+    "lowercase": True,
+    "stop_words": None,
+    "max_features": None,
+    "ngram_range": (1, 2),
 }
 
 
-def get_conn():
-    return psycopg2.connect(**DB_CONFIG)
+def current_catalog_hash() -> str:
+    """Hash di contenuto del catalogo nel DB (vedi catalog.fetch_catalog_hash)."""
+    with get_conn() as conn:
+        return fetch_catalog_hash(conn)
 
 
 def fetch_recipes_and_ingredients() -> Tuple[List[Dict], Dict[int, List[str]]]:
     """
-    Ritorna:
+    Ritorna (dal catalogo condiviso del processo):
       - lista ricette con campi: recipe_id, recipe_name, category_name (se presente)
       - dizionario recipe_id -> lista di ingredienti (nomi)
     """
-    with get_conn() as conn, conn.cursor(cursor_factory=DictCursor) as cur:
-        cur.execute("""
-            SELECT recipe_id, recipe_name, category_name
-            FROM recipes
-            ORDER BY recipe_id
-        """)
-        recipes = cur.fetchall()
-
-        cur.execute("""
-            SELECT ri.recipe_id, i.ingredient_name
-            FROM recipe_ingredients ri
-            JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
-            ORDER BY ri.recipe_id
-        """)
-        rows = cur.fetchall()
-
-    ing_by_recipe: Dict[int, List[str]] = {}
-    for r in rows:
-        rid = int(r["recipe_id"])
-        name = str(r["ingredient_name"]) if r["ingredient_name"] is not None else ""
-        if rid not in ing_by_recipe:
-            ing_by_recipe[rid] = []
-        if name:
-            ing_by_recipe[rid].append(name)
-
-    return recipes, ing_by_recipe
+    catalog = get_catalog()
+    return catalog.recipe_rows(), catalog.ingredients_by_recipe()
 
 
 def build_recipe_corpus(recipes: List[Dict], ing_by_recipe: Dict[int, List[str]]) -> Tuple[List[str], List[Tuple[int, str]]]:
@@ -101,19 +132,356 @@ def build_recipe_corpus(recipes: List[Dict], ing_by_recipe: Dict[int, List[str]]
     return corpus, index_to_recipe
 
 
+def build_catalog_corpus(catalog: Catalog) -> Tuple[List[str], List[Tuple[int, str]]]:
+    """Corpus e mapping indice -> ricetta costruiti dal catalogo in memoria."""
+    return build_recipe_corpus(catalog.recipe_rows(), catalog.ingredients_by_recipe())
+
+
+def fit_tfidf_vectorizer(corpus: List[str]) -> Tuple[TfidfVectorizer, sparse.csr_matrix]:
+    """
+    Addestra il TfidfVectorizer sul corpus e ritorna (vectorizer, X) con righe L2-normalizzate.
+    """
+    vectorizer = TfidfVectorizer(**TFIDF_PARAMS)
+    X = vectorizer.fit_transform(corpus)
+    return vectorizer, X
+
+
+def transform_with_vocabulary(corpus: List[str], vocabulary: List[str], idf: np.ndarray) -> sparse.csr_matrix:
+    """
+    Vettori TF-IDF (righe L2-normalizzate) di nuovi testi con vocabolario e idf già addestrati:
+    stesso risultato di vectorizer.transform, i termini fuori vocabolario sono ignorati.
+    """
+    counter = CountVectorizer(
+        vocabulary={term: i for i, term in enumerate(vocabulary)}, dtype=np.float64, **TFIDF_PARAMS
+    )
+    X = sparse.csr_matrix(counter.transform(corpus))
+    X.data *= np.asarray(idf, dtype=np.float64)[X.indices]
+    return normalize(X, norm="l2", copy=False)
+
+
+def corpus_hashes(corpus: List[str]) -> np.ndarray:
+    """Hash a 64 bit del testo di ogni ricetta, per riconoscere quelle modificate tra due build."""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little") for text in corpus),
+        dtype=np.uint64,
+        count=len(corpus),
+    )
+
+
+def feature_config(features: str = SIMILARITY_FEATURES) -> Dict:
+    """Parametri delle feature salvati nel manifest: se cambiano serve una ricostruzione completa."""
+    if features not in FEATURE_MODES:
+        raise ValueError(f"SIMILARITY_FEATURES non valido: {features!r} (ammessi: {', '.join(FEATURE_MODES)})")
+    if features == "structured":
+        return {"features": features, "structured": feature_params()}
+    return {"features": features, "tfidf": {**TFIDF_PARAMS, "ngram_range": list(TFIDF_PARAMS["ngram_range"])}}
+
+
+def artifact_matches_features(manifest: Dict, features: str = SIMILARITY_FEATURES) -> bool:
+    """True se l'artefatto è stato costruito con gli stessi parametri delle feature."""
+    config = feature_config(features)
+    params = manifest.get("params") or {}
+    return {key: params.get(key) for key in config} == config
+
+
+def artifact_matches_top_k(manifest: Dict, top_k: int = SIMILARITY_TOP_K) -> bool:
+    """True se l'artefatto ha il top_k richiesto, limitato a n_recipes - 1 come in build_similarity_index."""
+    n_recipes = int(manifest.get("n_recipes", 0))
+    return manifest.get("top_k") == max(0, min(int(top_k), n_recipes - 1))
+
+
+def fit_catalog_features(
+    catalog: Catalog, features: str = SIMILARITY_FEATURES
+) -> Tuple[List[str], np.ndarray, sparse.csr_matrix, np.ndarray]:
+    """
+    Addestra le feature sull'intero catalogo. Ritorna (vocabolario, idf, X con righe
+    L2-normalizzate nell'ordine del catalogo, hash del contenuto di ogni ricetta).
+    """
+    feature_config(features)
+    if features == "structured":
+        vocabulary, idf, X = fit_recipe_features(catalog)
+        return vocabulary, idf, X, recipe_feature_hashes(catalog)
+    corpus, _index_to_recipe = build_catalog_corpus(catalog)
+    vectorizer, X = fit_tfidf_vectorizer(corpus)
+    return vectorizer.get_feature_names_out().tolist(), vectorizer.idf_, X, corpus_hashes(corpus)
+
+
+def catalog_feature_hashes(catalog: Catalog, features: str = SIMILARITY_FEATURES) -> np.ndarray:
+    """Hash del contenuto di ogni ricetta del catalogo, per riconoscere quelle cambiate tra due build."""
+    if features == "structured":
+        return recipe_feature_hashes(catalog)
+    corpus, _index_to_recipe = build_catalog_corpus(catalog)
+    return corpus_hashes(corpus)
+
+
+def transform_catalog_rows(
+    catalog: Catalog, rows: np.ndarray, vocabulary: List[str], idf: np.ndarray, features: str = SIMILARITY_FEATURES
+) -> sparse.csr_matrix:
+    """Vettori delle righe indicate del catalogo con vocabolario e idf già addestrati."""
+    if features == "structured":
+        return transform_recipe_features(catalog, rows, vocabulary, idf)
+    recipes = [
+        {"recipe_id": int(catalog.recipe_ids[i]), "recipe_name": catalog.recipe_names[i],
+         "category_name": catalog.category_names[i]}
+        for i in rows
+    ]
+    ing_by_recipe = {r["recipe_id"]: catalog.ingredient_names_for(r["recipe_id"]) for r in recipes}
+    corpus, _index_to_recipe = build_recipe_corpus(recipes, ing_by_recipe)
+    return transform_with_vocabulary(corpus, vocabulary, idf)
+
+
+def compute_tfidf_vectors(corpus: List[str]) -> sparse.csr_matrix:
+    """
+    Usa TF-IDF per creare embedding testuali (righe L2-normalizzate, CSR).
+    """
+    _vectorizer, X = fit_tfidf_vectorizer(corpus)
+    return X
+
+
 def compute_similarity_matrix(corpus: List[str]) -> np.ndarray:
     """
-    Usa TF-IDF per creare embedding testuali e calcola la cosine similarity NxN.
+    Calcola la cosine similarity NxN densa (solo per ispezione/debug su cataloghi piccoli:
+    per l'uso nelle pagine vedi compute_similarity_index).
+    """
+    X = compute_tfidf_vectors(corpus)
+    return (X @ X.T).toarray()
+
+
+def compute_similarity_index(
+    corpus: List[str],
+    index_to_recipe: List[Tuple[int, str]],
+    top_k: int = SIMILARITY_TOP_K,
+    block_size: int = SIMILARITY_BLOCK_SIZE,
+    workers: int = SIMILARITY_WORKERS,
+) -> SimilarityIndex:
+    """
+    Costruisce l'indice sparso dei top-K vicini per ricetta, senza materializzare la matrice NxN.
+    """
+    X = compute_tfidf_vectors(corpus)
+    recipe_ids = [rid for rid, _name in index_to_recipe]
+    return build_similarity_index(X, recipe_ids, top_k=top_k, block_size=block_size, workers=workers)
+
+
+def build_similarity_index_from_db(
+    top_k: int = SIMILARITY_TOP_K,
+    block_size: int = SIMILARITY_BLOCK_SIZE,
+    workers: int = SIMILARITY_WORKERS,
+    features: str = SIMILARITY_FEATURES,
+) -> Tuple[SimilarityIndex, Dict]:
+    """
+    Legge il catalogo, addestra le feature (vedi SIMILARITY_FEATURES) e costruisce l'indice top-K.
+    Ritorna anche lo stato del modello da salvare nell'artefatto: vocabolario, idf, hash delle
+    ricette, parametri e informazioni sull'addestramento (usati dagli aggiornamenti incrementali).
+    """
+    catalog = get_catalog()
+    vocabulary, idf, X, hashes = fit_catalog_features(catalog, features)
+    index = build_similarity_index(X, catalog.recipe_ids, top_k=top_k, block_size=block_size, workers=workers)
+    state = {
+        "vocabulary": vocabulary,
+        "idf": idf,
+        "doc_hashes": hashes,
+        "params": feature_config(features),
+        "fit": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "timestamp": time.time(),
+            "n_recipes": catalog.n_recipes,
+            "changed_rows": 0,
+        },
+    }
+    return index, state
+
+
+def update_similarity_index_from_db(
+    artifact_dir: Path = SIMILARITY_ARTIFACT_DIR,
+    top_k: int = SIMILARITY_TOP_K,
+    block_size: int = SIMILARITY_BLOCK_SIZE,
+    workers: int = SIMILARITY_WORKERS,
+    features: str = SIMILARITY_FEATURES,
+) -> Optional[Tuple[SimilarityIndex, Dict]]:
+    """
+    Aggiorna l'artefatto esistente senza riaddestrare le feature: le ricette nuove o modificate
+    (hash del contenuto diverso) sono vettorizzate con vocabolario e idf salvati, quelle rimosse
+    escono dall'indice e si ricalcolano solo le righe interessate (vedi update_similarity_index).
+    Ritorna (indice, stato) come build_similarity_index_from_db, oppure None quando serve una
+    ricostruzione completa: artefatto senza stato incrementale, parametri delle feature o top_k
+    diversi, addestramento più vecchio di SIMILARITY_FULL_REBUILD_DAYS o troppe ricette cambiate da allora.
     """
-    vectorizer = TfidfVectorizer(
-        lowercase=True,
-        stop_words=None,       
-        max_features=None,      
-        ngram_range=(1, 2),     
+    manifest = read_artifact_manifest(artifact_dir)
+    if manifest is None:
+        return None
+    if not artifact_matches_features(manifest, features):
+        logger.info("Parametri delle feature cambiati: ricostruzione completa")
+        return None
+    fit = manifest.get("fit") or {}
+    vocabulary, idf = load_vectorizer_state(artifact_dir)
+    old_hashes = load_doc_hashes(artifact_dir)
+    if not fit or vocabulary is None or idf is None or old_hashes is None:
+        logger.info("Artefatto senza stato per l'aggiornamento incrementale: ricostruzione completa")
+        return None
+    age_days = (time.time() - float(fit.get("timestamp", 0))) / 86400
+    if age_days > SIMILARITY_FULL_REBUILD_DAYS:
+        logger.info(f"TF-IDF addestrato {age_days:.1f} giorni fa: ricostruzione completa")
+        return None
+
+    old_index, _manifest = load_similarity_artifact(artifact_dir, mmap=False)
+    if old_index.vectors is None or old_hashes.shape[0] != len(old_index):
+        return None
+    catalog = get_catalog()
+    recipe_ids = catalog.recipe_ids
+    n = catalog.n_recipes
+    if old_index.top_k != max(0, min(int(top_k), n - 1)):
+        return None
+
+    hashes = catalog_feature_hashes(catalog, features)
+    old_rows = old_index.rows_of(recipe_ids)
+    known = old_rows >= 0
+    changed = ~known
+    changed[known] = old_hashes[old_rows[known]] != hashes[known]
+    dirty = np.flatnonzero(changed)
+    removed = len(old_index) - int(known.sum())
+    changed_rows = int(fit.get("changed_rows", 0)) + int(dirty.shape[0]) + removed
+    if changed_rows > SIMILARITY_FULL_REBUILD_RATIO * max(n, 1):
+        logger.info(
+            f"{changed_rows} ricette cambiate dall'ultimo addestramento su {n}: ricostruzione completa"
+        )
+        return None
+
+    # vettori del nuovo catalogo: righe invariate dall'artefatto, le altre vettorizzate ora
+    # (float32 normalizzato come in build_similarity_index)
+    X_dirty = sparse.csr_matrix((0, len(vocabulary)), dtype=np.float32)
+    if dirty.shape[0]:
+        X_dirty = normalize(
+            sparse.csr_matrix(
+                transform_catalog_rows(catalog, dirty, vocabulary, idf, features), dtype=np.float32
+            ),
+            norm="l2",
+            copy=False,
+        )
+    selector = old_rows.copy()
+    selector[dirty] = len(old_index) + np.arange(dirty.shape[0])
+    X = sparse.vstack([old_index.vectors, X_dirty], format="csr")[selector]
+    index = update_similarity_index(
+        old_index, X, recipe_ids, dirty, block_size=block_size, workers=workers
+    )
+    logger.info(
+        f"Indice di similarità aggiornato: {dirty.shape[0]} ricette nuove o modificate, {removed} rimosse"
+    )
+    state = {
+        "vocabulary": vocabulary,
+        "idf": idf,
+        "doc_hashes": hashes,
+        "params": feature_config(features),
+        "fit": {**fit, "changed_rows": changed_rows},
+    }
+    return index, state
+
+
+def save_index_artifact(
+    index: SimilarityIndex,
+    state: Dict,
+    catalog_hash: str,
+    artifact_dir: Path = SIMILARITY_ARTIFACT_DIR,
+    block_size: int = SIMILARITY_BLOCK_SIZE,
+) -> Dict:
+    """Salva indice e stato delle feature come artefatto con manifest (hash del catalogo incluso)."""
+    manifest = save_similarity_artifact(
+        index,
+        artifact_dir,
+        catalog_hash=catalog_hash,
+        vocabulary=state["vocabulary"],
+        idf=state["idf"],
+        params={**state["params"], "block_size": block_size},
+        doc_hashes=state["doc_hashes"],
+        fit=state["fit"],
+    )
+    logger.info(
+        f"Artefatto di similarità scritto in {artifact_dir} "
+        f"({manifest['n_recipes']} ricette, top_k={manifest['top_k']})"
     )
-    X = vectorizer.fit_transform(corpus)   
-    sim = cosine_similarity(X)            
-    return sim
+    return manifest
+
+
+def refresh_similarity_artifact(
+    catalog_hash: str,
+    artifact_dir: Path = SIMILARITY_ARTIFACT_DIR,
+    top_k: int = SIMILARITY_TOP_K,
+    block_size: int = SIMILARITY_BLOCK_SIZE,
+    workers: int = SIMILARITY_WORKERS,
+    features: str = SIMILARITY_FEATURES,
+    full: bool = False,
+) -> SimilarityIndex:
+    """
+    Riallinea l'artefatto al catalogo: aggiornamento incrementale se possibile (e full=False),
+    altrimenti ricostruzione completa. Se la directory non è scrivibile l'indice resta solo in memoria.
+    """
+    result = None
+    if not full:
+        try:
+            result = update_similarity_index_from_db(
+                artifact_dir, top_k=top_k, block_size=block_size, workers=workers, features=features
+            )
+        except Exception as e:
+            logger.warning(f"Aggiornamento incrementale fallito, ricostruzione completa: {e}")
+    if result is None:
+        result = build_similarity_index_from_db(
+            top_k=top_k, block_size=block_size, workers=workers, features=features
+        )
+    index, state = result
+    try:
+        save_index_artifact(index, state, catalog_hash, artifact_dir, block_size=block_size)
+    except OSError as e:
+        # directory non scrivibile: si usa comunque l'indice in memoria
+        logger.warning(f"Impossibile salvare l'artefatto di similarità: {e}")
+    return index
+
+
+def load_or_build_similarity_index(
+    artifact_dir: Path = SIMILARITY_ARTIFACT_DIR,
+    top_k: int = SIMILARITY_TOP_K,
+) -> SimilarityIndex:
+    """
+    Avvio delle pagine: apre in memory-map l'artefatto se hash del catalogo, feature e top_k
+    coincidono con quelli correnti, altrimenti (assente o stale) lo aggiorna o ricostruisce e lo riscrive.
+    """
+    catalog_hash = current_catalog_hash()
+    manifest = read_artifact_manifest(artifact_dir)
+    full = manifest is None
+    if (
+        manifest is not None
+        and manifest.get("catalog_hash") == catalog_hash
+        and artifact_matches_features(manifest)
+        and artifact_matches_top_k(manifest, top_k)
+    ):
+        try:
+            index, _manifest = load_similarity_artifact(artifact_dir, mmap=True)
+            return index
+        except Exception as e:
+            logger.warning(f"Artefatto di similarità illeggibile, lo ricostruisco: {e}")
+            full = True
+    elif manifest is not None:
+        logger.info("Artefatto di similarità non aggiornato rispetto a catalogo o parametri, lo aggiorno")
+
+    return refresh_similarity_artifact(catalog_hash, artifact_dir, top_k=top_k, full=full)
+
+
+_index_lock = threading.Lock()
+_index: Optional[SimilarityIndex] = None
+_index_version: Optional[str] = None
+
+
+def get_similarity_index() -> SimilarityIndex:
+    """
+    Indice di similarità condiviso da tutte le pagine del processo (una sola copia).
+    Se la versione del catalogo cambia, l'artefatto viene ricontrollato (ed eventualmente ricostruito).
+    """
+    global _index, _index_version
+    version = current_catalog_version()
+    if _index is None or _index_version != version:
+        with _index_lock:
+            if _index is None or _index_version != version:
+                _index = load_or_build_similarity_index()
+                _index_version = version
+    return _index
 
 
 def print_matrix_and_summary(sim: np.ndarray, index_to_recipe: List[Tuple[int, str]], top_k: int = 5) -> None:
@@ -149,26 +517,75 @@ def print_matrix_and_summary(sim: np.ndarray, index_to_recipe: List[Tuple[int, s
         print(tail)
 
     print("\n=== Top similar recipes (per riga) ===")
+    # top-k per tutte le righe in forma vettoriale (argpartition a lotti), escludendo self
+    top_idx, top_scores = top_k_per_row(sim, top_k, self_columns=np.arange(n))
     for i in range(n):
-        # escludi self (i)
-        scores = [(j, sim[i, j]) for j in range(n) if j != i]
-        scores.sort(key=lambda x: x[1], reverse=True)
-        top = scores[:top_k]
         i_id, i_name = index_to_recipe[i]
         print(f"\nRicetta [{i}] id={i_id} name={i_name}")
-        for j, s in top:
+        for j, s in zip(top_idx[i], top_scores[i]):
+            if j < 0:
+                break
             j_id, j_name = index_to_recipe[j]
             print(f"  -> sim={s:.3f} con [{j}] id={j_id} name={j_name}")
 
 
-def main():
+def parse_args(argv: List[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Similarità tra ricette (TF-IDF + cosine)")
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="costruisce e salva l'artefatto di similarità invece di stampare la matrice",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="con --build, ricostruzione completa (riaddestra il TF-IDF) anche se l'artefatto "
+        "è già aggiornato o aggiornabile in modo incrementale",
+    )
+    parser.add_argument("--artifact-dir", type=Path, default=SIMILARITY_ARTIFACT_DIR)
+    parser.add_argument("--top-k", type=int, default=SIMILARITY_TOP_K)
+    parser.add_argument("--block-size", type=int, default=SIMILARITY_BLOCK_SIZE, help="righe per blocco")
+    parser.add_argument(
+        "--workers", type=int, default=SIMILARITY_WORKERS, help="thread per il calcolo dei blocchi"
+    )
+    parser.add_argument(
+        "--features", choices=FEATURE_MODES, default=SIMILARITY_FEATURES, help="feature delle ricette per l'indice"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] | None = None):
+    args = parse_args(argv)
     try:
-        recipes, ing_by_recipe = fetch_recipes_and_ingredients()
-        if not recipes:
+        if args.build:
+            catalog_hash = current_catalog_hash()
+            manifest = read_artifact_manifest(args.artifact_dir)
+            if (
+                not args.force
+                and manifest is not None
+                and manifest.get("catalog_hash") == catalog_hash
+                and artifact_matches_top_k(manifest, args.top_k)
+                and artifact_matches_features(manifest, args.features)
+            ):
+                print(f"Artefatto già aggiornato: {args.artifact_dir}")
+                return
+            refresh_similarity_artifact(
+                catalog_hash,
+                args.artifact_dir,
+                top_k=args.top_k,
+                block_size=args.block_size,
+                workers=args.workers,
+                features=args.features,
+                full=args.force,
+            )
+            return
+
+        catalog = get_catalog()
+        if not catalog.n_recipes:
             print("Nessuna ricetta trovata nel database.")
             sys.exit(0)
 
-        corpus, index_to_recipe = build_recipe_corpus(recipes, ing_by_recipe)
+        corpus, index_to_recipe = build_catalog_corpus(catalog)
         sim = compute_similarity_matrix(corpus)
         print_matrix_and_summary(sim, index_to_recipe, top_k=5)
     except Exception as e:
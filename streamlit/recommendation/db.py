@@ -0,0 +1,270 @@
+"""
+Pool di connessioni PostgreSQL condiviso dal processo (pagine Streamlit e motore di raccomandazione).
+
+get_conn() presta una connessione dal pool come context manager: commit all'uscita
+(rollback in caso di eccezione) e restituzione al pool, così il codice esistente
+`with get_conn() as conn, conn.cursor() as cur:` resta invariato ma non apre più
+una nuova connessione TCP/auth per ogni helper.
+Dimensioni e health check sono configurabili da .env:
+  PGPOOL_MIN, PGPOOL_MAX, PGPOOL_TIMEOUT, PGPOOL_HEALTHCHECK_INTERVAL
+"""
+
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+# Cerca .env nella root del progetto
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+env_path = PROJECT_ROOT / ".env"
+
+if not env_path.exists():
+    print(f"❌ ERRORE: file .env mancante! Crea {env_path}")
+    sys.exit(1)
+
+load_dotenv(dotenv_path=env_path)
+
+logger = logging.getLogger(__name__)
+
+# Database configuration (leggi user/password da env; non usare valori hardcoded sensibili)
+DB_CONFIG = {
+    "host": os.getenv("PGHOST", "localhost"),
+    "database": os.getenv("PGDATABASE", "italian_recipes"),
+    "user": os.getenv("PGUSER"),
+    "password": os.getenv("PGPASSWORD"),
+    "port": int(os.getenv("PGPORT", "5432")),
+}
+
+# Dimensioni del pool e attesa massima (secondi) per una connessione libera.
+# PGPOOL_MIN connessioni sono aperte alla creazione del pool; quelle restituite restano aperte
+# fino a PGPOOL_MAX, così sotto carico concorrente un prestito non riapre una connessione TCP/auth.
+PGPOOL_MIN = int(os.getenv("PGPOOL_MIN", "2"))
+PGPOOL_MAX = int(os.getenv("PGPOOL_MAX", "10"))
+PGPOOL_TIMEOUT = float(os.getenv("PGPOOL_TIMEOUT", "10"))
+# Una connessione inattiva da più di questi secondi viene verificata con SELECT 1 prima dell'uso
+PGPOOL_HEALTHCHECK_INTERVAL = float(os.getenv("PGPOOL_HEALTHCHECK_INTERVAL", "30"))
+
+
+class PoolTimeout(Exception):
+    """Nessuna connessione libera entro il timeout configurato."""
+
+
+class ConnectionPool:
+    """
+    Pool di connessioni con attesa bloccante quando è pieno, health check alla presa in
+    prestito e statistiche d'uso. A differenza di psycopg2.pool, che chiude le connessioni
+    restituite oltre minconn, tiene aperte tutte quelle inattive (al massimo maxconn, perché
+    se ne apre una nuova solo quando non ce ne sono di inattive). Le inattive sono in una pila:
+    si presta per prima la più recente.
+    """
+
+    def __init__(
+        self,
+        minconn: int = PGPOOL_MIN,
+        maxconn: int = PGPOOL_MAX,
+        timeout: float = PGPOOL_TIMEOUT,
+        healthcheck_interval: float = PGPOOL_HEALTHCHECK_INTERVAL,
+        **connect_kwargs,
+    ):
+        self.minconn = max(0, int(minconn))
+        self.maxconn = max(1, int(maxconn), self.minconn)
+        self.timeout = float(timeout)
+        self.healthcheck_interval = float(healthcheck_interval)
+        self._connect_kwargs = {**DB_CONFIG, **connect_kwargs}
+        self._slots = threading.BoundedSemaphore(self.maxconn)
+        self._lock = threading.Lock()
+        self._idle: List[psycopg2.extensions.connection] = []
+        # istante di restituzione delle sole connessioni inattive, rimosso al prestito o alla chiusura
+        self._last_used: Dict[psycopg2.extensions.connection, float] = {}
+        self._stats = {
+            "checkouts": 0,
+            "connects": 0,
+            "waits": 0,
+            "wait_time_ms": 0.0,
+            "timeouts": 0,
+            "healthchecks": 0,
+            "discarded": 0,
+        }
+        self._in_use = 0
+        self._closed = False
+        for _ in range(self.minconn):
+            conn = self._connect()
+            self._last_used[conn] = time.monotonic()
+            self._idle.append(conn)
+
+    def _connect(self) -> psycopg2.extensions.connection:
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._lock:
+            self._stats["connects"] += 1
+        return conn
+
+    def _is_healthy(self, conn, last_used: Optional[float]) -> bool:
+        if conn.closed:
+            return False
+        if conn.info.transaction_status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+            return False
+        if last_used is None or time.monotonic() - last_used < self.healthcheck_interval:
+            # usata di recente
+            return True
+        with self._lock:
+            self._stats["healthchecks"] += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn) -> None:
+        with self._lock:
+            self._stats["discarded"] += 1
+        if not conn.closed:
+            conn.close()
+
+    def _checkout(self) -> psycopg2.extensions.connection:
+        # le connessioni inattive rotte (es. server riavviato) vengono chiuse e si passa alla
+        # successiva; finite le inattive se ne apre una nuova (psycopg2.connect solleva se fallisce)
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                conn = self._idle.pop()
+                last_used = self._last_used.pop(conn, None)
+            if self._is_healthy(conn, last_used):
+                return conn
+            logger.warning("Connessione del pool non valida, la sostituisco")
+            self._discard(conn)
+        return self._connect()
+
+    def getconn(self):
+        start = time.monotonic()
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["waits"] += 1
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolTimeout(f"Nessuna connessione libera nel pool entro {self.timeout:.1f}s")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["wait_time_ms"] += (time.monotonic() - start) * 1000
+            self._in_use += 1
+        return conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        try:
+            status = None if conn.closed else conn.info.transaction_status
+            if not discard and status not in (None, psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN):
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    # transazione lasciata aperta dal chiamante: come psycopg2.pool, rollback
+                    conn.rollback()
+                with self._lock:
+                    if not self._closed:
+                        self._last_used[conn] = time.monotonic()
+                        self._idle.append(conn)
+                        return
+            self._discard(conn)
+        except psycopg2.Error:
+            self._discard(conn)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+        stats["open"] = stats["idle"] + stats["in_use"]
+        stats["minconn"] = self.minconn
+        stats["maxconn"] = self.maxconn
+        return stats
+
+    def close(self) -> None:
+        """Chiude le connessioni inattive; quelle in prestito vengono chiuse alla restituzione."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._last_used.clear()
+        for conn in idle:
+            if not conn.closed:
+                conn.close()
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_pool_lock = threading.Lock()
+_pool: Optional[ConnectionPool] = None
+
+
+def get_pool() -> ConnectionPool:
+    """Pool del processo, creato al primo utilizzo."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool()
+                logger.info(f"Pool PostgreSQL creato (min={_pool.minconn}, max={_pool.maxconn})")
+    return _pool
+
+
+def init_pool(**kwargs) -> ConnectionPool:
+    """(Ri)crea il pool del processo con parametri espliciti (es. per script e benchmark)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool = ConnectionPool(**kwargs)
+    return _pool
+
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def pool_stats() -> Dict:
+    """Statistiche del pool (connessioni aperte/in uso/inattive, prestiti, attese, scarti)."""
+    return get_pool().stats()
+
+
+@contextmanager
+def get_conn() -> Iterator[psycopg2.extensions.connection]:
+    """
+    Presta una connessione del pool. All'uscita esegue commit (rollback se il blocco solleva
+    un'eccezione) e la restituisce; le connessioni rotte vengono scartate.
+    """
+    pool = get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+        if not conn.closed:
+            conn.commit()
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        broken = True
+        raise
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
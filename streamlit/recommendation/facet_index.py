@@ -0,0 +1,145 @@
+"""
+Filtri a faccette su costo, difficoltà e tempo di preparazione, con bitmap precalcolate.
+
+Per ogni faccetta (colonna intera del catalogo, -1 se assente) si costruiscono una volta per
+snapshot del catalogo:
+  - values:      valori distinti presenti, ordinati
+  - value_bits:  (V, W) uint64, per ogni valore la bitmap delle ricette con quel valore
+  - at_most:     (V, W) uint64, OR cumulativo di value_bits: ricette con valore <= values[k]
+Un intervallo [lo, hi] è quindi at_most[hi] AND NOT at_most[lo - 1] (due ricerche binarie su
+values), senza scorrere le ricette; le ricette senza valore restano fuori appena la faccetta è
+filtrata. Le bitmap hanno lo stesso formato di fridge_index (bit i = riga i del catalogo), quindi
+si intersecano direttamente con le bitmap di categoria e del frigo.
+
+FacetIndex.search calcola in un solo passaggio il risultato (ambito AND filtri) e, per ogni
+faccetta, i conteggi per valore con tutti gli altri filtri applicati (il solito conteggio delle
+faccette: scegliere un valore non azzera le alternative della stessa faccetta). I conteggi sono
+popcount vettoriali sulle righe di value_bits.
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from recommendation.catalog import Catalog, get_catalog
+from recommendation.fridge_index import _n_words, _scatter_bits, popcount, popcount_rows
+
+logger = logging.getLogger(__name__)
+
+# Faccette indicizzate: colonne intere del catalogo
+FACETS = ("cost", "difficulty", "preparation_time")
+
+# Filtro di una faccetta: (minimo, massimo) inclusi, None = aperto
+FacetRange = Tuple[Optional[int], Optional[int]]
+
+
+class Facet:
+    """Indice di una colonna: valori distinti, bitmap per valore e bitmap cumulative "al massimo"."""
+
+    def __init__(self, column: np.ndarray, n_words: int):
+        n_recipes = column.shape[0]
+        rows = np.flatnonzero(column >= 0)
+        self.values, value_of = np.unique(column[rows], return_inverse=True)
+        self.n_words = n_words
+        self.value_bits = _scatter_bits(self.values.shape[0], n_recipes, value_of.ravel(), rows)
+        if self.values.size:
+            self.at_most = np.bitwise_or.accumulate(self.value_bits, axis=0)
+            self.present_bits = self.at_most[-1]
+        else:
+            self.at_most = self.value_bits
+            self.present_bits = np.zeros(n_words, dtype=self.value_bits.dtype)
+
+    def _at_most(self, value: int) -> np.ndarray:
+        k = int(np.searchsorted(self.values, value, side="right")) - 1
+        if k < 0:
+            return np.zeros(self.n_words, dtype=self.value_bits.dtype)
+        return self.at_most[k]
+
+    def range_bits(self, lo: Optional[int], hi: Optional[int]) -> np.ndarray:
+        """Ricette con valore in [lo, hi] (estremi None = aperti)."""
+        bits = self.present_bits if hi is None else self._at_most(int(hi))
+        if lo is not None:
+            bits = bits & ~self._at_most(int(lo) - 1)
+        return bits
+
+    def value_counts(self, bits: np.ndarray) -> np.ndarray:
+        """Ricette della bitmap per ogni valore (popcount di value_bits AND bits, riga per riga)."""
+        return popcount_rows(self.value_bits & bits)
+
+
+class FacetResult:
+    """
+    Esito di FacetIndex.search: bitmap (W,) delle ricette che passano ambito e filtri e, per ogni
+    faccetta, (valori, conteggi) con gli altri filtri applicati.
+    """
+
+    def __init__(self, bits: np.ndarray, counts: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        self.bits = bits
+        self.counts = counts
+
+    @property
+    def count(self) -> int:
+        return popcount(self.bits)
+
+    def value_counts(self, facet: str) -> List[Tuple[int, int]]:
+        """Coppie (valore, ricette) della faccetta, per valore crescente."""
+        values, counts = self.counts[facet]
+        return [(int(v), int(n)) for v, n in zip(values, counts)]
+
+    def at_most_counts(self, facet: str, thresholds: Sequence[int]) -> List[int]:
+        """Ricette con valore <= soglia per ogni soglia (somme cumulative dei conteggi per valore)."""
+        values, counts = self.counts[facet]
+        cumulative = np.concatenate([[0], np.cumsum(counts)])
+        return [int(cumulative[np.searchsorted(values, t, side="right")]) for t in thresholds]
+
+
+class FacetIndex:
+    """Bitmap delle faccette (FACETS) su uno snapshot del catalogo, nel formato di FridgeIndex."""
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        self.n_words = _n_words(catalog.n_recipes)
+        self.facets: Dict[str, Facet] = {name: Facet(getattr(catalog, name), self.n_words) for name in FACETS}
+
+    def search(self, scope: np.ndarray, filters: Optional[Dict[str, FacetRange]] = None) -> FacetResult:
+        """
+        Ricette dell'ambito (es. categoria o risultato di una query sul frigo) che rispettano i filtri,
+        con i conteggi delle faccette. I filtri con entrambi gli estremi None sono ignorati.
+        """
+        filters = {
+            name: bounds
+            for name, bounds in (filters or {}).items()
+            if name in self.facets and bounds is not None and any(b is not None for b in bounds)
+        }
+        filter_bits = {name: self.facets[name].range_bits(*bounds) for name, bounds in filters.items()}
+        counts = {}
+        for name, facet in self.facets.items():
+            others = scope
+            for other, bits in filter_bits.items():
+                if other != name:
+                    others = others & bits
+            counts[name] = (facet.values, facet.value_counts(others))
+        result = scope
+        for bits in filter_bits.values():
+            result = result & bits
+        return FacetResult(result, counts)
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_index_lock = threading.Lock()
+_index: Optional[FacetIndex] = None
+
+
+def get_facet_index() -> FacetIndex:
+    """Indice delle faccette del processo, ricostruito quando get_catalog() restituisce un nuovo snapshot."""
+    global _index
+    catalog = get_catalog()
+    if _index is None or _index.catalog is not catalog:
+        with _index_lock:
+            if _index is None or _index.catalog is not catalog:
+                _index = FacetIndex(catalog)
+                logger.info(f"Indice delle faccette costruito su {catalog.n_recipes} ricette")
+    return _index
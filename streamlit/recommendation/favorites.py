@@ -0,0 +1,82 @@
+"""
+Data-access dei preferiti utente (user_selected_recipes).
+
+La pagina dei preferiti legge tutto ciò che le serve con un numero costante di query,
+indipendente dal numero di preferiti: una per l'elenco e una batch per gli ingredienti.
+Aggiunte e rimozioni aggiornano anche il profilo di preferenza dell'utente in cache
+(vedi user_profiles), senza ricalcolarlo da zero.
+"""
+
+from typing import Dict, List, Tuple
+
+from recommendation.catalog import get_ingredient_lists
+from recommendation.db import get_conn
+from recommendation.user_profiles import notify_favorite_added, notify_favorite_removed
+
+# Preferiti con info ricetta (usata anche da database/check_query_plans.py)
+FAVORITES_SQL = """
+    SELECT r.recipe_id, r.recipe_name, r.recipe_link, r.category_name,
+           r.cost, r.difficulty, r.preparation_time, r.image_path,
+           usr.selected_at
+    FROM user_selected_recipes AS usr
+    JOIN recipes AS r ON r.recipe_id = usr.recipe_id
+    WHERE usr.user_id = %s
+    ORDER BY usr.selected_at DESC
+"""
+
+
+def fetch_favorite_ids(user_id: int) -> List[int]:
+    """Id delle ricette preferite dell'utente."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT recipe_id
+            FROM user_selected_recipes
+            WHERE user_id = %s
+            """,
+            (user_id,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+def fetch_favorites(user_id: int) -> List[Dict]:
+    """Ritorna le ricette preferite dell'utente con info ricetta, ordinate per data di selezione."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(FAVORITES_SQL, (user_id,))
+        rows = cur.fetchall()
+        cols = [desc[0] for desc in cur.description]
+        return [dict(zip(cols, row)) for row in rows]
+
+
+def fetch_favorites_with_ingredients(user_id: int) -> Tuple[List[Dict], Dict[int, List[str]]]:
+    """
+    Preferiti dell'utente più la mappa recipe_id -> ingredienti (ordinati per nome),
+    letta con un'unica query batch (vedi catalog.get_ingredient_lists).
+    """
+    favorites = fetch_favorites(user_id)
+    ing_by_recipe = get_ingredient_lists(int(rec["recipe_id"]) for rec in favorites)
+    return favorites, ing_by_recipe
+
+
+def add_favorite(user_id: int, recipe_id: int) -> None:
+    """Aggiunge la ricetta ai preferiti dell'utente."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO user_selected_recipes (user_id, recipe_id)
+            VALUES (%s, %s)
+            ON CONFLICT (user_id, recipe_id) DO NOTHING
+            """,
+            (user_id, recipe_id),
+        )
+    notify_favorite_added(user_id, recipe_id)
+
+
+def remove_favorite(user_id: int, recipe_id: int) -> None:
+    """Rimuove la ricetta dai preferiti dell'utente."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM user_selected_recipes WHERE user_id = %s AND recipe_id = %s",
+            (user_id, recipe_id),
+        )
+    notify_favorite_removed(user_id, recipe_id)
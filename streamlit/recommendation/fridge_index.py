@@ -0,0 +1,296 @@
+"""
+Indice bitmap ingrediente -> ricette per le query "cosa posso cucinare adesso".
+
+Su uno snapshot del catalogo si costruiscono, una volta per processo:
+  - recipe_bits:     (I, W) uint64, per ogni ingrediente la bitmap impaccata delle ricette che
+                     lo usano (bit i = riga i del catalogo, W = ceil(R / 64))
+  - ingredient_bits: (R, WI) uint64, per ogni ricetta la bitmap dei suoi ingredienti
+  - bitmap per categoria e delle ricette con almeno un ingrediente
+Per un frigo (ingredienti posseduti, FridgeIndex.match -> FridgeMatch) il numero di ingredienti posseduti di tutte le ricette si
+ottiene sommando in colonna le f righe di recipe_bits dei posseduti con un albero di addizionatori
+bit-sliced (contatore verticale: un piano di bit per cifra binaria), poi il confronto con la
+soglia di ogni ricetta è un'altra manciata di AND/OR/XOR sui piani:
+  - pronte:           owned_count == total_count
+  - mancano <= k:     owned_count >= total_count - k
+  - owned_ratio >= t: owned_count >= minimo intero n con n / total_count >= t
+Le soglie impaccate dipendono solo da k / t e sono in cache. Il conteggio dei risultati è un
+popcount (np.bitwise_count con numpy >= 2, altrimenti tabella di lookup a 8 bit).
+
+L'indice è di sola lettura e condiviso tra le sessioni (get_fridge_index): le query allocano
+solo array temporanei propri, senza lock, e costano O(f * R / 64) operazioni su parole.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from recommendation.catalog import Catalog, get_catalog
+
+logger = logging.getLogger(__name__)
+
+# popcount di ogni byte (ripiego quando numpy non ha bitwise_count)
+POPCOUNT_LUT = np.array([bin(b).count("1") for b in range(256)], dtype=np.uint8)
+_bitwise_count = getattr(np, "bitwise_count", None)
+# numero massimo di soglie (valori di k o t) tenute in cache per indice
+THRESHOLD_CACHE_SIZE = 64
+
+_WORD = np.dtype("<u8")
+
+
+def _n_words(n_bits: int) -> int:
+    return (n_bits + 63) // 64
+
+
+def pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Maschera booleana (N,) -> bitmap (ceil(N / 64),) uint64 (bit i = elemento i)."""
+    packed = np.packbits(np.asarray(mask, dtype=bool), bitorder="little")
+    out = np.zeros(_n_words(mask.shape[0]) * 8, dtype=np.uint8)
+    out[:packed.shape[0]] = packed
+    return out.view(_WORD)
+
+
+def unpack_bits(bits: np.ndarray, n_bits: int) -> np.ndarray:
+    """Bitmap uint64 -> maschera booleana (n_bits,)."""
+    return np.unpackbits(bits.view(np.uint8), count=n_bits, bitorder="little").astype(bool)
+
+
+def popcount(bits: np.ndarray) -> int:
+    """Numero di bit a 1 della bitmap."""
+    return int(popcount_rows(bits[np.newaxis])[0])
+
+
+def popcount_rows(bits: np.ndarray) -> np.ndarray:
+    """Numero di bit a 1 di ogni riga di una matrice di bitmap (n, W)."""
+    if _bitwise_count is not None:
+        return _bitwise_count(bits).sum(axis=1, dtype=np.int64)
+    return POPCOUNT_LUT[bits.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def _scatter_bits(n_rows: int, n_bits: int, rows: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    """Matrice (n_rows, ceil(n_bits / 64)) uint64 con il bit positions[j] acceso nella riga rows[j]."""
+    bits = np.zeros((n_rows, _n_words(n_bits)), dtype=_WORD)
+    positions = positions.astype(np.int64)
+    np.bitwise_or.at(
+        bits, (rows, positions >> 6), np.left_shift(np.uint64(1), (positions & 63).astype(np.uint64))
+    )
+    return bits
+
+
+def _add_planes(a: List[np.ndarray], b: List[np.ndarray], max_planes: int) -> List[np.ndarray]:
+    """Somma bit-sliced (ripple carry) di due numeri con lo stesso numero di piani, troncata a max_planes."""
+    out = []
+    carry = None
+    for pa, pb in zip(a, b):
+        s = pa ^ pb
+        c = pa & pb
+        if carry is not None:
+            c |= s & carry
+            s ^= carry
+        out.append(s)
+        carry = c
+    if len(out) < max_planes:
+        out.append(carry)
+    return out
+
+
+def column_counts(rows: np.ndarray, max_planes: int) -> List[np.ndarray]:
+    """
+    Conteggio per colonna di bit delle righe (m, W): piani di bit (W,) dal meno significativo.
+    Le righe sono sommate a coppie, un livello dell'albero alla volta e in forma vettoriale su
+    tutte le coppie, quindi servono O(log^2 m) operazioni numpy invece di O(m log m).
+    I conteggi devono stare in max_planes bit: i riporti oltre vengono scartati.
+    """
+    if rows.shape[0] == 0:
+        return []
+    planes = [rows]
+    while planes[0].shape[0] > 1:
+        if planes[0].shape[0] % 2:
+            planes = [np.concatenate([p, np.zeros((1, p.shape[1]), dtype=p.dtype)]) for p in planes]
+        planes = _add_planes([p[0::2] for p in planes], [p[1::2] for p in planes], max_planes)
+    return [p[0] for p in planes]
+
+
+def _bit_planes(values: np.ndarray, n_planes: int) -> List[np.ndarray]:
+    """Interi non negativi (N,) -> n_planes bitmap, dal bit meno significativo."""
+    return [pack_mask((values >> s) & 1) for s in range(n_planes)]
+
+
+def _greater_equal(a: List[np.ndarray], b: List[np.ndarray], n_words: int) -> np.ndarray:
+    """Bitmap dei bit in cui il numero bit-sliced a è >= b (confronto dal piano più significativo)."""
+    zero = np.zeros(n_words, dtype=_WORD)
+    n_planes = max(len(a), len(b))
+    a = a + [zero] * (n_planes - len(a))
+    b = b + [zero] * (n_planes - len(b))
+    greater = zero.copy()
+    equal = ~zero
+    for pa, pb in zip(reversed(a), reversed(b)):
+        greater |= equal & pa & ~pb
+        equal &= ~(pa ^ pb)
+    return greater | equal
+
+
+class FridgeIndex:
+    """
+    Indice bitmap su uno snapshot del catalogo. Le bitmap delle ricette (risultati delle query,
+    categorie) sono array (W,) uint64 con il bit i acceso per la riga i del catalogo; il frigo è
+    una bitmap (WI,) sugli ingredienti.
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        n_recipes, n_ingredients = catalog.n_recipes, catalog.n_ingredients
+        self.n_words = _n_words(n_recipes)
+        recipe_rows = np.repeat(np.arange(n_recipes, dtype=np.int64), np.diff(catalog.ri_indptr))
+        self.recipe_bits = _scatter_bits(n_ingredients, n_recipes, catalog.ri_ingredients, recipe_rows)
+        self.ingredient_bits = _scatter_bits(n_recipes, n_ingredients, recipe_rows, catalog.ri_ingredients)
+        self.total_count = np.diff(catalog.ri_indptr).astype(np.int64)
+        self.n_planes = int(self.total_count.max()).bit_length() if n_recipes else 0
+
+        # ricette con almeno un ingrediente (come la JOIN interna del ranking) e per categoria
+        self.nonempty_bits = pack_mask(self.total_count > 0)
+        self.category_bits: Dict[int, np.ndarray] = {
+            int(c): pack_mask(catalog.category_ids == c) & self.nonempty_bits
+            for c in np.unique(catalog.category_ids)
+            if c >= 0
+        }
+        self._thresholds: Dict[Tuple[str, float], List[np.ndarray]] = {}
+        self._thresholds_lock = threading.Lock()
+
+    # --------------- frigo e conteggi ---------------
+
+    def fridge_bits(self, ingredient_ids: Iterable[int]) -> np.ndarray:
+        """Bitmap (WI,) degli ingredienti posseduti; gli id sconosciuti al catalogo sono ignorati."""
+        c = self.catalog
+        ids = np.fromiter((int(i) for i in ingredient_ids), dtype=np.int64)
+        owned = np.zeros(c.n_ingredients, dtype=bool)
+        if ids.size and c.n_ingredients:
+            pos = np.minimum(np.searchsorted(c.ingredient_ids, ids), c.n_ingredients - 1)
+            owned[pos[c.ingredient_ids[pos] == ids]] = True
+        return pack_mask(owned)
+
+    def match(self, ingredient_ids: Iterable[int]) -> "FridgeMatch":
+        """Query sul frigo con gli ingredienti indicati (owned_count calcolati una volta sola)."""
+        return FridgeMatch(self, self.fridge_bits(ingredient_ids))
+
+    def owned_count_planes(self, fridge: np.ndarray) -> List[np.ndarray]:
+        """Numero di ingredienti posseduti di ogni ricetta, in forma bit-sliced."""
+        positions = np.flatnonzero(unpack_bits(fridge, self.catalog.n_ingredients))
+        # owned_count <= total_count < 2 ** n_planes: i piani più alti sarebbero sempre vuoti
+        return column_counts(self.recipe_bits[positions], self.n_planes)
+
+    # --------------- soglie e ambito ---------------
+
+    def missing_threshold(self, k: int) -> List[np.ndarray]:
+        """Piani di total_count - k (minimo owned_count per avere al massimo k mancanti)."""
+        k = max(0, int(k))
+        return self._threshold(("missing", k), lambda: np.maximum(self.total_count - k, 0))
+
+    def ratio_threshold(self, t: float) -> List[np.ndarray]:
+        """Piani del minimo owned_count per avere owned_ratio >= t."""
+        t = float(t)
+        return self._threshold(("ratio", t), lambda: self._ratio_need(t))
+
+    def _ratio_need(self, t: float) -> np.ndarray:
+        """Per ogni ricetta il minimo n in [0, total] con n / total >= t (total + 1 se nessuno)."""
+        total = self.total_count
+        safe = np.maximum(total, 1)
+        need = np.clip(np.ceil(t * total), 0, total + 1).astype(np.int64)
+        # correzione degli arrotondamenti, con lo stesso confronto in float64 del ranking
+        lower = np.maximum(need - 1, 0)
+        need = np.where((need > 0) & (lower / safe >= t), lower, need)
+        need = np.where((need <= total) & (need / safe < t), need + 1, need)
+        return need
+
+    def _threshold(self, key: Tuple[str, float], compute) -> List[np.ndarray]:
+        planes = self._thresholds.get(key)
+        if planes is None:
+            values = compute()
+            planes = _bit_planes(values, int(values.max()).bit_length() if values.size else 0)
+            with self._thresholds_lock:
+                if len(self._thresholds) >= THRESHOLD_CACHE_SIZE:
+                    self._thresholds.pop(next(iter(self._thresholds)))
+                self._thresholds[key] = planes
+        return planes
+
+    def scope_bits(self, category_id: Optional[int]) -> np.ndarray:
+        """Ricette (con ingredienti) della categoria; None = tutte."""
+        if category_id is None:
+            return self.nonempty_bits
+        bits = self.category_bits.get(int(category_id))
+        return bits if bits is not None else np.zeros(self.n_words, dtype=_WORD)
+
+    # --------------- risultati ---------------
+
+    def rows(self, bits: np.ndarray) -> np.ndarray:
+        """Righe del catalogo accese nella bitmap."""
+        return np.flatnonzero(unpack_bits(bits, self.catalog.n_recipes))
+
+    def recipe_ids(self, bits: np.ndarray) -> np.ndarray:
+        """recipe_id delle ricette accese nella bitmap, in ordine crescente."""
+        return self.catalog.recipe_ids[self.rows(bits)]
+
+    def count(self, bits: np.ndarray) -> int:
+        return popcount(bits)
+
+
+class FridgeMatch:
+    """
+    Frigo di un utente su un FridgeIndex: i piani di owned_count sono calcolati alla creazione,
+    poi ogni query è solo un confronto bit-sliced con la soglia e un AND con la categoria.
+    Le query restituiscono bitmap (W,) uint64 (vedi FridgeIndex.recipe_ids / count).
+    """
+
+    def __init__(self, index: FridgeIndex, fridge: np.ndarray):
+        self.index = index
+        self.fridge = fridge
+        self.owned_planes = index.owned_count_planes(fridge)
+
+    def makeable(self, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette con tutti gli ingredienti nel frigo."""
+        return self.missing_at_most(0, category_id)
+
+    def missing_at_most(self, k: int, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette a cui mancano al massimo k ingredienti."""
+        return self._at_least(self.index.missing_threshold(k), category_id)
+
+    def ratio_at_least(self, t: float, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette con owned_ratio (owned_count / total_count) >= t."""
+        return self._at_least(self.index.ratio_threshold(t), category_id)
+
+    def _at_least(self, threshold: List[np.ndarray], category_id: Optional[int]) -> np.ndarray:
+        result = _greater_equal(self.owned_planes, threshold, self.index.n_words)
+        return result & self.index.scope_bits(category_id)
+
+    def owned_counts(self, rows: np.ndarray) -> np.ndarray:
+        """owned_count delle righe indicate (popcount di ingredienti della ricetta AND frigo)."""
+        return popcount_rows(self.index.ingredient_bits[rows] & self.fridge)
+
+    def missing_ingredients(self, recipe_id: int) -> List[str]:
+        """Nomi degli ingredienti della ricetta che non sono nel frigo."""
+        c = self.index.catalog
+        i = c.index_of(recipe_id)
+        if i is None:
+            return []
+        missing = self.index.ingredient_bits[i] & ~self.fridge
+        positions = np.flatnonzero(unpack_bits(missing, c.n_ingredients))
+        return [c.ingredient_names[j] for j in positions if c.ingredient_names[j]]
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_index_lock = threading.Lock()
+_index: Optional[FridgeIndex] = None
+
+
+def get_fridge_index() -> FridgeIndex:
+    """Indice bitmap del processo, ricostruito quando get_catalog() restituisce un nuovo snapshot."""
+    global _index
+    catalog = get_catalog()
+    if _index is None or _index.catalog is not catalog:
+        with _index_lock:
+            if _index is None or _index.catalog is not catalog:
+                _index = FridgeIndex(catalog)
+                logger.info(f"Indice bitmap del frigo costruito su {catalog.n_recipes} ricette")
+    return _index
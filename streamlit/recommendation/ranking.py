@@ -0,0 +1,727 @@
+"""
+Ranking delle ricette per percentuale di ingredienti posseduti dall'utente.
+
+Due backend equivalenti, selezionabili con RANKING_BACKEND (.env):
+  - "sql": query eseguita dal DB a ogni richiesta; total_count viene dalla vista
+    materializzata recipe_stats (aggiornata da populate_database.py), quindi si aggrega solo
+    il lato posseduto (user_owned_ingredients ⋈ recipe_ingredients della categoria)
+  - "memory": motore in-process costruito sul catalogo condiviso. La matrice di incidenza
+    ricetta x ingrediente è tenuta in CSR; per una richiesta basta una query per gli
+    ingredienti dell'utente, poi owned_count è un unico prodotto matrice-vettore sparso,
+    total_count è la differenza di indptr e la selezione top-K usa argpartition.
+Entrambi restituiscono righe con le stesse chiavi e lo stesso ordinamento
+(owned_ratio desc, total_count desc, recipe_name asc). Lo spareggio sul nome usa COLLATE "C"
+in SQL (ordine dei byte UTF-8, cioè dei code point) come sorted() sulle stringhe in memoria,
+indipendentemente dalla collation del database. La categoria è filtrata per
+category_id (tabella recipe_categories), in SQL come nel motore in memoria.
+
+Il ranking ibrido (rank_recipes_for_user) combina owned_ratio e similarità media con i
+preferiti su tutte le ricette della categoria, non solo sulle prime per owned_ratio:
+final_score = RANKING_WEIGHT_RATIO * owned_ratio + RANKING_WEIGHT_SIMILARITY * similarità.
+
+Modalità di match (RANKING_MATCH_MODE): "exact" conta solo gli ingredienti posseduti; "class"
+conta anche, con peso RANKING_SUBSTITUTE_WEIGHT, gli ingredienti mancanti per cui l'utente ne
+possiede un altro della stessa classe (ingredient_classes), cioè un sostituto:
+owned_ratio = (owned_count + peso * substitute_count) / total_count. Nel motore in memoria
+l'espansione per classe è una matrice sparsa ingrediente x ingrediente costruita con il catalogo,
+quindi il vettore dei posseduti si espande con un prodotto sparso per richiesta; lato SQL la
+stessa definizione passa per una join con ingredients (TOP_RECIPES_BY_CLASS_RATIO_SQL).
+
+Modalità del rapporto (RANKING_RATIO_MODE): "count" conta gli ingredienti; "quantity" pesa ogni
+ingrediente con recipe_ingredients.quantity (e con un eventuale peso per classe,
+RANKING_CLASS_WEIGHTS), così a una ricetta a cui manca solo una guarnizione resta un rapporto più
+alto che a una a cui manca l'ingrediente principale:
+owned_ratio = Σ peso posseduti (+ peso sostituto * Σ peso sostituibili) / Σ peso totale.
+I pesi per classe sono arrotondati al centesimo e tenuti come interi (quantità x centesimi), quindi
+le somme sono esatte sia nel prodotto sparso in memoria sia in SQL (TOP_RECIPES_BY_QUANTITY_RATIO_SQL,
+implementazione di riferimento) e i due backend danno lo stesso owned_ratio.
+
+Con modalità diverse da exact/count i filtri "cosa posso cucinare" della pagina usano
+OwnedRatioEngine.match (OwnedRatioMatch), con la stessa interfaccia di FridgeMatch: i mancanti
+escludono i sostituibili e la percentuale è l'owned_ratio mostrato nelle card.
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from recommendation.catalog import Catalog, get_catalog
+from recommendation.db import get_conn
+from recommendation.fridge_index import pack_mask
+from recommendation.similarity_index import SimilarityIndex
+from recommendation.user_profiles import UserProfile, get_user_profile
+
+logger = logging.getLogger(__name__)
+
+RANKING_BACKENDS = ("sql", "memory")
+RANKING_BACKEND = os.getenv("RANKING_BACKEND", "sql").strip().lower()
+# Pesi del punteggio finale (owned_ratio e similarità media con i preferiti)
+RANKING_WEIGHT_RATIO = float(os.getenv("RANKING_WEIGHT_RATIO", "0.7"))
+RANKING_WEIGHT_SIMILARITY = float(os.getenv("RANKING_WEIGHT_SIMILARITY", "0.3"))
+# Match degli ingredienti: solo quelli posseduti ("exact") o anche i sostituti della stessa classe ("class")
+RANKING_MATCH_MODES = ("exact", "class")
+RANKING_MATCH_MODE = os.getenv("RANKING_MATCH_MODE", "exact").strip().lower()
+# Peso di un ingrediente mancante sostituibile con uno posseduto della stessa classe
+RANKING_SUBSTITUTE_WEIGHT = float(os.getenv("RANKING_SUBSTITUTE_WEIGHT", "0.5"))
+# Rapporto su numero di ingredienti ("count") o su quantità pesate ("quantity")
+RANKING_RATIO_MODES = ("count", "quantity")
+RANKING_RATIO_MODE = os.getenv("RANKING_RATIO_MODE", "count").strip().lower()
+
+
+def _parse_class_weights(value: str) -> Dict[int, int]:
+    """
+    Pesi per classe della modalità "quantity" da "class_id:peso,..." (es. "16:0.2,26:0.5"), in
+    centesimi interi; le classi non elencate pesano 1.
+    """
+    weights = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        try:
+            class_id, weight = item.split(":")
+            weights[int(class_id)] = int(round(float(weight) * 100))
+        except ValueError:
+            logger.warning(f"RANKING_CLASS_WEIGHTS: voce '{item}' non valida (atteso class_id:peso), ignorata")
+    return weights
+
+
+# Peso per classe degli ingredienti nella modalità "quantity" (class_id:peso, separati da virgole)
+RANKING_CLASS_WEIGHTS = _parse_class_weights(os.getenv("RANKING_CLASS_WEIGHTS", ""))
+
+
+def fetch_owned_ingredient_ids(user_id: int) -> List[int]:
+    """Id degli ingredienti posseduti dall'utente."""
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(
+            "SELECT ingredient_id FROM user_owned_ingredients WHERE user_id = %s",
+            (user_id,),
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+# Query del backend "sql" (usata anche da database/check_query_plans.py)
+TOP_RECIPES_BY_OWNED_RATIO_SQL = """
+     WITH owned AS (
+         -- solo il lato posseduto: gli ingredienti dell'utente presenti nelle ricette della categoria
+         SELECT ri.recipe_id, COUNT(*) AS owned_count
+         FROM user_owned_ingredients uoi
+         JOIN recipe_ingredients ri ON ri.ingredient_id = uoi.ingredient_id
+         JOIN recipe_stats rs ON rs.recipe_id = ri.recipe_id
+         WHERE uoi.user_id = %(user_id)s AND rs.category_id = %(category_id)s
+         GROUP BY ri.recipe_id
+     ),
+     ranked AS (
+         -- ordinamento e LIMIT tutti su recipe_stats: recipes viene letta solo per le righe restituite
+         SELECT rs.recipe_id,
+             rs.recipe_name,
+             rs.cost,
+             rs.difficulty,
+             rs.preparation_time,
+             COALESCE(o.owned_count, 0) AS owned_count,
+             0 AS substitute_count,
+             rs.ingredient_count AS total_count,
+             COALESCE(o.owned_count, 0)::float / rs.ingredient_count AS owned_ratio
+         FROM recipe_stats rs
+         LEFT JOIN owned o ON o.recipe_id = rs.recipe_id
+         WHERE rs.category_id = %(category_id)s AND rs.ingredient_count > 0
+         ORDER BY owned_ratio DESC, total_count DESC, rs.recipe_name COLLATE "C" ASC
+         LIMIT %(limit)s
+     )
+     SELECT k.recipe_id,
+         k.recipe_name,
+         r.recipe_link,
+         r.category_name,
+         k.cost,
+         k.difficulty,
+         k.preparation_time,
+         r.image_path,
+         k.owned_count,
+         k.substitute_count,
+         k.total_count,
+         k.owned_ratio
+     FROM ranked k
+     JOIN recipes r ON r.recipe_id = k.recipe_id
+     ORDER BY k.owned_ratio DESC, k.total_count DESC, k.recipe_name COLLATE "C" ASC
+"""
+
+# Variante con sostituti della stessa classe (RANKING_MATCH_MODE=class), stesse colonne e ordinamento.
+# Il peso è float8 come nel motore in memoria, così owned_ratio coincide bit per bit.
+TOP_RECIPES_BY_CLASS_RATIO_SQL = """
+     WITH owned_classes AS (
+         -- classi degli ingredienti posseduti
+         SELECT DISTINCT i.class_id
+         FROM user_owned_ingredients uoi
+         JOIN ingredients i ON i.ingredient_id = uoi.ingredient_id
+         WHERE uoi.user_id = %(user_id)s
+     ),
+     matched AS (
+         -- ingredienti della ricetta in una classe posseduta: posseduti o sostituibili
+         SELECT ri.recipe_id,
+             COUNT(uoi.ingredient_id) AS owned_count,
+             COUNT(*) - COUNT(uoi.ingredient_id) AS substitute_count
+         FROM recipe_ingredients ri
+         JOIN recipe_stats rs ON rs.recipe_id = ri.recipe_id
+         JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+         JOIN owned_classes oc ON oc.class_id = i.class_id
+         LEFT JOIN user_owned_ingredients uoi
+             ON uoi.user_id = %(user_id)s AND uoi.ingredient_id = ri.ingredient_id
+         WHERE rs.category_id = %(category_id)s
+         GROUP BY ri.recipe_id
+     ),
+     ranked AS (
+         SELECT rs.recipe_id,
+             rs.recipe_name,
+             rs.cost,
+             rs.difficulty,
+             rs.preparation_time,
+             COALESCE(m.owned_count, 0) AS owned_count,
+             COALESCE(m.substitute_count, 0) AS substitute_count,
+             rs.ingredient_count AS total_count,
+             (COALESCE(m.owned_count, 0) + %(substitute_weight)s::float8 * COALESCE(m.substitute_count, 0))
+                 / rs.ingredient_count AS owned_ratio
+         FROM recipe_stats rs
+         LEFT JOIN matched m ON m.recipe_id = rs.recipe_id
+         WHERE rs.category_id = %(category_id)s AND rs.ingredient_count > 0
+         ORDER BY owned_ratio DESC, total_count DESC, rs.recipe_name COLLATE "C" ASC
+         LIMIT %(limit)s
+     )
+     SELECT k.recipe_id,
+         k.recipe_name,
+         r.recipe_link,
+         r.category_name,
+         k.cost,
+         k.difficulty,
+         k.preparation_time,
+         r.image_path,
+         k.owned_count,
+         k.substitute_count,
+         k.total_count,
+         k.owned_ratio
+     FROM ranked k
+     JOIN recipes r ON r.recipe_id = k.recipe_id
+     ORDER BY k.owned_ratio DESC, k.total_count DESC, k.recipe_name COLLATE "C" ASC
+"""
+
+
+# Variante con quantità pesate (RANKING_RATIO_MODE=quantity), implementazione di riferimento del motore in
+# memoria: pesi interi (quantità x centesimi del peso di classe) e sostituti attivi con %(substitutes)s.
+TOP_RECIPES_BY_QUANTITY_RATIO_SQL = """
+     WITH class_weights AS (
+         SELECT w.class_id, w.weight
+         FROM unnest(%(class_ids)s::int[], %(class_weights)s::bigint[]) AS w(class_id, weight)
+     ),
+     owned_classes AS (
+         SELECT DISTINCT i.class_id
+         FROM user_owned_ingredients uoi
+         JOIN ingredients i ON i.ingredient_id = uoi.ingredient_id
+         WHERE uoi.user_id = %(user_id)s AND %(substitutes)s
+     ),
+     weighted AS (
+         -- tutti gli ingredienti delle ricette della categoria, con il peso e lo stato rispetto al frigo
+         SELECT ri.recipe_id,
+             ri.quantity * COALESCE(cw.weight, 100) AS weight,
+             uoi.ingredient_id IS NOT NULL AS owned,
+             uoi.ingredient_id IS NULL AND oc.class_id IS NOT NULL AS substitute
+         FROM recipe_ingredients ri
+         JOIN recipe_stats rs ON rs.recipe_id = ri.recipe_id
+         JOIN ingredients i ON i.ingredient_id = ri.ingredient_id
+         LEFT JOIN class_weights cw ON cw.class_id = i.class_id
+         LEFT JOIN owned_classes oc ON oc.class_id = i.class_id
+         LEFT JOIN user_owned_ingredients uoi
+             ON uoi.user_id = %(user_id)s AND uoi.ingredient_id = ri.ingredient_id
+         WHERE rs.category_id = %(category_id)s
+     ),
+     totals AS (
+         SELECT recipe_id,
+             COUNT(*) FILTER (WHERE owned) AS owned_count,
+             COUNT(*) FILTER (WHERE substitute) AS substitute_count,
+             COALESCE(SUM(weight) FILTER (WHERE owned), 0) AS owned_weight,
+             COALESCE(SUM(weight) FILTER (WHERE substitute), 0) AS substitute_weight,
+             SUM(weight) AS total_weight
+         FROM weighted
+         GROUP BY recipe_id
+     ),
+     ranked AS (
+         SELECT rs.recipe_id,
+             rs.recipe_name,
+             rs.cost,
+             rs.difficulty,
+             rs.preparation_time,
+             t.owned_count,
+             t.substitute_count,
+             rs.ingredient_count AS total_count,
+             CASE WHEN t.total_weight > 0
+                 THEN (t.owned_weight + %(substitute_weight)s::float8 * t.substitute_weight) / t.total_weight
+                 ELSE 0
+             END AS owned_ratio
+         FROM totals t
+         JOIN recipe_stats rs ON rs.recipe_id = t.recipe_id
+         ORDER BY owned_ratio DESC, total_count DESC, rs.recipe_name COLLATE "C" ASC
+         LIMIT %(limit)s
+     )
+     SELECT k.recipe_id,
+         k.recipe_name,
+         r.recipe_link,
+         r.category_name,
+         k.cost,
+         k.difficulty,
+         k.preparation_time,
+         r.image_path,
+         k.owned_count,
+         k.substitute_count,
+         k.total_count,
+         k.owned_ratio
+     FROM ranked k
+     JOIN recipes r ON r.recipe_id = k.recipe_id
+     ORDER BY k.owned_ratio DESC, k.total_count DESC, k.recipe_name COLLATE "C" ASC
+"""
+
+
+def fetch_top_recipes_by_owned_ratio(
+    user_id: int,
+    category_id: int,
+    limit: Optional[int] = 10,
+    match_mode: Optional[str] = None,
+    substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+    ratio_mode: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Restituisce le top ricette per categoria, ordinate per percentuale di ingredienti posseduti dall'utente.
+    Con limit=None restituisce tutta la categoria (LIMIT NULL).
+    """
+    params = {"user_id": user_id, "category_id": category_id, "limit": limit}
+    substitutes = _resolve_match_mode(match_mode) == "class"
+    query = TOP_RECIPES_BY_OWNED_RATIO_SQL
+    if _resolve_ratio_mode(ratio_mode) == "quantity":
+        query = TOP_RECIPES_BY_QUANTITY_RATIO_SQL
+        params.update(
+            substitutes=substitutes,
+            substitute_weight=float(substitute_weight),
+            class_ids=list(RANKING_CLASS_WEIGHTS),
+            class_weights=list(RANKING_CLASS_WEIGHTS.values()),
+        )
+    elif substitutes:
+        query = TOP_RECIPES_BY_CLASS_RATIO_SQL
+        params["substitute_weight"] = float(substitute_weight)
+    with get_conn() as conn, conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        cols = [desc[0] for desc in cur.description]
+        return [dict(zip(cols, row)) for row in rows]
+
+
+class OwnedRatioEngine:
+    """
+    Motore di ranking in memoria su uno snapshot del catalogo.
+      - incidence: CSR (R, I) float32 con 1 dove la ricetta usa l'ingrediente
+      - total_count: (R,) ingredienti per ricetta (diff di indptr)
+      - name_rank: (R,) posizione della ricetta nell'ordinamento per nome (spareggio, per code point
+        come COLLATE "C" nelle query SQL)
+      - class_expansion: CSR (I, I) float32 con 1 dove due ingredienti distinti sono della stessa classe
+      - weighted: CSR (R, I) float64 con quantità x peso di classe (in centesimi, interi esatti)
+      - total_weight: (R,) somma dei pesi per ricetta
+    """
+
+    def __init__(self, catalog: Catalog):
+        self.catalog = catalog
+        n_recipes, n_ingredients = catalog.n_recipes, catalog.n_ingredients
+        self.incidence = sparse.csr_matrix(
+            (
+                np.ones(catalog.ri_ingredients.shape[0], dtype=np.float32),
+                catalog.ri_ingredients,
+                catalog.ri_indptr,
+            ),
+            shape=(n_recipes, n_ingredients),
+        )
+        self.total_count = np.diff(catalog.ri_indptr).astype(np.int32)
+
+        self.name_rank = np.empty(n_recipes, dtype=np.int32)
+        self.name_rank[sorted(range(n_recipes), key=catalog.recipe_names.__getitem__)] = np.arange(
+            n_recipes, dtype=np.int32
+        )
+
+        # espansione per classe: appartenenza (I, C) per la sua trasposta, senza la diagonale
+        classes = catalog.ingredient_class_ids.astype(np.int64)
+        known = np.flatnonzero(classes >= 0)
+        membership = sparse.csr_matrix(
+            (np.ones(known.shape[0], dtype=np.float32), (known, classes[known])),
+            shape=(n_ingredients, int(classes[known].max()) + 1 if known.size else 0),
+        )
+        expansion = sparse.csr_matrix(membership @ membership.T)
+        expansion.setdiag(0)
+        expansion.eliminate_zeros()
+        self.class_expansion = expansion
+
+        # pesi della modalità "quantity": quantità x peso di classe in centesimi (100 se la classe non è pesata)
+        class_weight = np.full(n_ingredients, 100, dtype=np.int64)
+        for class_id, weight in RANKING_CLASS_WEIGHTS.items():
+            class_weight[classes == class_id] = weight
+        self.weighted = sparse.csr_matrix(
+            (
+                (catalog.ri_quantities.astype(np.int64) * class_weight[catalog.ri_ingredients]).astype(np.float64),
+                catalog.ri_ingredients,
+                catalog.ri_indptr,
+            ),
+            shape=(n_recipes, n_ingredients),
+        )
+        self.total_weight = np.asarray(self.weighted.sum(axis=1)).ravel()
+
+    def owned_vector(self, ingredient_ids: Iterable[int]) -> np.ndarray:
+        """Bitmap (I,) degli ingredienti posseduti; gli id sconosciuti al catalogo sono ignorati."""
+        owned = np.zeros(self.catalog.n_ingredients, dtype=np.float32)
+        owned[self.catalog.ingredient_positions_of(ingredient_ids)] = 1.0
+        return owned
+
+    def owned_counts(self, owned: np.ndarray) -> np.ndarray:
+        """owned_count per tutte le ricette con un solo prodotto matrice-vettore."""
+        return np.rint(self.incidence @ owned).astype(np.int32)
+
+    def substitute_vector(self, owned: np.ndarray) -> np.ndarray:
+        """Bitmap (I,) degli ingredienti non posseduti con almeno un ingrediente posseduto della stessa classe."""
+        return ((self.class_expansion @ owned > 0) & (owned == 0)).astype(np.float32)
+
+    def substitutions(self, recipe_id: int, owned_ingredient_ids: Iterable[int]) -> Dict[str, List[str]]:
+        """Ingredienti mancanti della ricetta -> nomi degli ingredienti posseduti della stessa classe."""
+        return self.catalog.substitutions(recipe_id, owned_ingredient_ids)
+
+    def category_mask(self, category_id: Optional[int]) -> np.ndarray:
+        """Ricette della categoria (confronto su category_id); None = tutte le categorie."""
+        if category_id is None:
+            return np.ones(self.catalog.n_recipes, dtype=bool)
+        return self.catalog.category_ids == int(category_id)
+
+    def _top_k(
+        self, candidates: np.ndarray, key: np.ndarray, ratio: np.ndarray, limit: int
+    ) -> np.ndarray:
+        """
+        Top-limit dei candidati per (key desc, ratio desc, total_count desc, nome asc).
+        argpartition isola la soglia di key; i pari merito alla soglia restano tutti
+        candidati, così lo spareggio resta esatto anche quando tagliano il limite.
+        """
+        if candidates.size > limit > 0:
+            k = key[candidates]
+            threshold = k[np.argpartition(-k, limit - 1)[:limit]].min()
+            candidates = candidates[k >= threshold]
+        order = np.lexsort(
+            (
+                self.name_rank[candidates],
+                -self.total_count[candidates],
+                -ratio[candidates],
+                -key[candidates],
+            )
+        )
+        return candidates[order[:limit]]
+
+    def score_category(
+        self,
+        owned_ingredient_ids: Iterable[int],
+        category_id: Optional[int],
+        match_mode: Optional[str] = None,
+        substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+        ratio_mode: Optional[str] = None,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ritorna (candidati, owned_count, substitute_count, owned_ratio): indici di riga delle ricette
+        della categoria con almeno un ingrediente (come la JOIN interna lato SQL) e gli array (R,) per
+        tutte le ricette. substitute_count è sempre 0 in modalità "exact".
+        """
+        owned = self.owned_vector(owned_ingredient_ids)
+        owned_count = self.owned_counts(owned)
+        substitutes = np.zeros(self.catalog.n_ingredients, dtype=np.float32)
+        substitute_count = np.zeros(self.catalog.n_recipes, dtype=np.int32)
+        if _resolve_match_mode(match_mode) == "class":
+            substitutes = self.substitute_vector(owned)
+            substitute_count = self.owned_counts(substitutes)
+        total = self.total_count
+        candidates = np.flatnonzero(self.category_mask(category_id) & (total > 0))
+        if _resolve_ratio_mode(ratio_mode) == "quantity":
+            # somme intere esatte in float64, poi stesse operazioni della query di riferimento
+            score = self.weighted @ owned + float(substitute_weight) * (self.weighted @ substitutes)
+            denominator = self.total_weight
+        else:
+            score = owned_count + float(substitute_weight) * substitute_count
+            denominator = total
+        ratio = np.zeros(self.catalog.n_recipes, dtype=np.float64)
+        np.divide(score, denominator, out=ratio, where=denominator > 0)
+        return candidates, owned_count, substitute_count, ratio
+
+    def match(
+        self,
+        owned_ingredient_ids: Iterable[int],
+        match_mode: Optional[str] = None,
+        substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+        ratio_mode: Optional[str] = None,
+    ) -> "OwnedRatioMatch":
+        """Query "cosa posso cucinare" con le modalità del ranking (stessa interfaccia di FridgeMatch)."""
+        return OwnedRatioMatch(self, owned_ingredient_ids, match_mode, substitute_weight, ratio_mode)
+
+    def top_recipes(
+        self,
+        owned_ingredient_ids: Iterable[int],
+        category_id: Optional[int],
+        limit: int = 10,
+        match_mode: Optional[str] = None,
+        substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+        ratio_mode: Optional[str] = None,
+    ) -> List[Dict]:
+        """Stesso risultato di fetch_top_recipes_by_owned_ratio, calcolato in memoria."""
+        candidates, owned_count, substitute_count, ratio = self.score_category(
+            owned_ingredient_ids, category_id, match_mode, substitute_weight, ratio_mode
+        )
+        top = self._top_k(candidates, ratio, ratio, max(0, int(limit)))
+        return [
+            self._row(int(i), int(owned_count[i]), int(substitute_count[i]), float(ratio[i])) for i in top
+        ]
+
+    def top_recipes_blended(
+        self,
+        owned_ingredient_ids: Iterable[int],
+        category_id: Optional[int],
+        profile: Optional[UserProfile],
+        limit: int = 10,
+        weight_ratio: float = RANKING_WEIGHT_RATIO,
+        weight_similarity: float = RANKING_WEIGHT_SIMILARITY,
+        recipe_ids: Optional[np.ndarray] = None,
+        match_mode: Optional[str] = None,
+        substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+        ratio_mode: Optional[str] = None,
+    ) -> List[Dict]:
+        """
+        Top-limit della categoria per final_score, valutando tutte le ricette candidate:
+        owned_ratio e similarità media con i preferiti (dal profilo utente) sono calcolati
+        in forma vettoriale. Con recipe_ids i candidati sono ristretti a quelle ricette.
+        """
+        candidates, owned_count, substitute_count, ratio = self.score_category(
+            owned_ingredient_ids, category_id, match_mode, substitute_weight, ratio_mode
+        )
+        if recipe_ids is not None:
+            candidates = candidates[np.isin(self.catalog.recipe_ids[candidates], recipe_ids)]
+        similarity = np.zeros(self.catalog.n_recipes, dtype=np.float64)
+        if profile is not None and profile.count and candidates.size:
+            similarity[candidates] = profile.mean_similarity(self.catalog.recipe_ids[candidates])
+        final = weight_ratio * ratio + weight_similarity * similarity
+        top = self._top_k(candidates, final, ratio, max(0, int(limit)))
+        rows = []
+        for i in top:
+            row = self._row(int(i), int(owned_count[i]), int(substitute_count[i]), float(ratio[i]))
+            row["similarity"] = float(similarity[i])
+            row["final_score"] = float(final[i])
+            rows.append(row)
+        return rows
+
+    def _row(self, i: int, owned_count: int, substitute_count: int, owned_ratio: float) -> Dict:
+        c = self.catalog
+
+        def _opt(arr: np.ndarray) -> Optional[int]:
+            v = int(arr[i])
+            return None if v < 0 else v
+
+        return {
+            "recipe_id": int(c.recipe_ids[i]),
+            "recipe_name": c.recipe_names[i],
+            "recipe_link": c.recipe_links[i],
+            "category_name": c.category_names[i],
+            "cost": _opt(c.cost),
+            "difficulty": _opt(c.difficulty),
+            "preparation_time": _opt(c.preparation_time),
+            "image_path": c.image_paths[i],
+            "owned_count": owned_count,
+            "substitute_count": substitute_count,
+            "total_count": int(self.total_count[i]),
+            "owned_ratio": owned_ratio,
+        }
+
+
+class OwnedRatioMatch:
+    """
+    Frigo di un utente valutato con le modalità del ranking. Le query restituiscono bitmap (W,)
+    nel formato di fridge_index, come FridgeMatch, ma in modalità "class" un ingrediente
+    sostituibile non conta tra i mancanti e ratio_at_least confronta l'owned_ratio della modalità
+    scelta (lo stesso delle card e del ranking).
+    """
+
+    def __init__(
+        self,
+        engine: OwnedRatioEngine,
+        owned_ingredient_ids: Iterable[int],
+        match_mode: Optional[str] = None,
+        substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+        ratio_mode: Optional[str] = None,
+    ):
+        owned_ingredient_ids = list(owned_ingredient_ids)
+        self.engine = engine
+        self.owned = engine.owned_vector(owned_ingredient_ids)
+        if _resolve_match_mode(match_mode) == "class":
+            self.substitutes = engine.substitute_vector(self.owned)
+        else:
+            self.substitutes = np.zeros_like(self.owned)
+        _candidates, owned_count, substitute_count, self.ratio = engine.score_category(
+            owned_ingredient_ids, None, match_mode, substitute_weight, ratio_mode
+        )
+        self.missing_count = engine.total_count - owned_count - substitute_count
+
+    def makeable(self, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette senza ingredienti mancanti (sostituti compresi in modalità "class")."""
+        return self.missing_at_most(0, category_id)
+
+    def missing_at_most(self, k: int, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette a cui mancano al massimo k ingredienti né posseduti né sostituibili."""
+        return self._bits(self.missing_count <= max(0, int(k)), category_id)
+
+    def ratio_at_least(self, t: float, category_id: Optional[int] = None) -> np.ndarray:
+        """Ricette con owned_ratio >= t nella modalità scelta."""
+        return self._bits(self.ratio >= float(t), category_id)
+
+    def _bits(self, mask: np.ndarray, category_id: Optional[int]) -> np.ndarray:
+        # come FridgeIndex.scope_bits: solo ricette della categoria con almeno un ingrediente
+        return pack_mask(mask & self.engine.category_mask(category_id) & (self.engine.total_count > 0))
+
+    def missing_ingredients(self, recipe_id: int) -> List[str]:
+        """Nomi degli ingredienti della ricetta né posseduti né sostituibili."""
+        c = self.engine.catalog
+        i = c.index_of(recipe_id)
+        if i is None:
+            return []
+        return [
+            c.ingredient_names[j]
+            for j in c.ingredient_positions(i)
+            if not self.owned[j] and not self.substitutes[j] and c.ingredient_names[j]
+        ]
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_engine_lock = threading.Lock()
+_engine: Optional[OwnedRatioEngine] = None
+
+
+def get_ranking_engine() -> OwnedRatioEngine:
+    """Motore in memoria del processo, ricostruito quando get_catalog() restituisce un nuovo snapshot."""
+    global _engine
+    catalog = get_catalog()
+    if _engine is None or _engine.catalog is not catalog:
+        with _engine_lock:
+            if _engine is None or _engine.catalog is not catalog:
+                _engine = OwnedRatioEngine(catalog)
+                logger.info(f"Motore di ranking in memoria costruito su {catalog.n_recipes} ricette")
+    return _engine
+
+
+def top_recipes_by_owned_ratio(
+    user_id: int,
+    category_id: int,
+    limit: int = 10,
+    backend: Optional[str] = None,
+    match_mode: Optional[str] = None,
+    substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+    ratio_mode: Optional[str] = None,
+) -> List[Dict]:
+    """Top ricette per percentuale di ingredienti posseduti, con backend e modalità configurati."""
+    if _resolve_backend(backend) == "memory":
+        engine = get_ranking_engine()
+        return engine.top_recipes(
+            fetch_owned_ingredient_ids(user_id), category_id, limit, match_mode, substitute_weight, ratio_mode
+        )
+    return fetch_top_recipes_by_owned_ratio(
+        user_id, category_id, limit, match_mode, substitute_weight, ratio_mode
+    )
+
+
+def rank_recipes_for_user(
+    user_id: int,
+    category_id: int,
+    favorite_ids: Iterable[int],
+    sim_index: Optional[SimilarityIndex],
+    limit: int = 10,
+    backend: Optional[str] = None,
+    weight_ratio: float = RANKING_WEIGHT_RATIO,
+    weight_similarity: float = RANKING_WEIGHT_SIMILARITY,
+    recipe_ids: Optional[Iterable[int]] = None,
+    owned_ingredient_ids: Optional[Iterable[int]] = None,
+    match_mode: Optional[str] = None,
+    substitute_weight: float = RANKING_SUBSTITUTE_WEIGHT,
+    ratio_mode: Optional[str] = None,
+) -> List[Dict]:
+    """
+    Ranking ibrido della categoria: top-limit per
+    final_score = weight_ratio * owned_ratio + weight_similarity * similarità media con i preferiti,
+    calcolato su tutte le ricette della categoria. Le righe hanno in più le chiavi
+    "similarity" e "final_score"; a parità di punteggio vale l'ordine del ranking per owned_ratio.
+    La similarità usa il profilo in cache dell'utente, allineato a favorite_ids per differenza.
+    recipe_ids restringe il ranking a un sottoinsieme (es. un filtro di fridge_index);
+    owned_ingredient_ids evita di rileggere dal DB gli ingredienti posseduti se già noti;
+    match_mode / substitute_weight scelgono se contare anche i sostituti della stessa classe,
+    ratio_mode se owned_ratio conta gli ingredienti o ne pesa le quantità.
+    """
+    profile = get_user_profile(user_id, sim_index, favorite_ids) if sim_index is not None else None
+    allowed = None if recipe_ids is None else np.fromiter((int(r) for r in recipe_ids), dtype=np.int64)
+    if _resolve_backend(backend) == "memory":
+        engine = get_ranking_engine()
+        if owned_ingredient_ids is None:
+            owned_ingredient_ids = fetch_owned_ingredient_ids(user_id)
+        return engine.top_recipes_blended(
+            owned_ingredient_ids,
+            category_id,
+            profile,
+            limit,
+            weight_ratio=weight_ratio,
+            weight_similarity=weight_similarity,
+            recipe_ids=allowed,
+            match_mode=match_mode,
+            substitute_weight=substitute_weight,
+            ratio_mode=ratio_mode,
+        )
+
+    # backend SQL: tutta la categoria (già ordinata per owned_ratio), poi punteggio vettoriale
+    rows = fetch_top_recipes_by_owned_ratio(
+        user_id, category_id, None, match_mode, substitute_weight, ratio_mode
+    )
+    if allowed is not None:
+        keep = np.isin([r["recipe_id"] for r in rows], allowed)
+        rows = [row for row, k in zip(rows, keep) if k]
+    if not rows:
+        return []
+    ratio = np.array([float(r.get("owned_ratio") or 0.0) for r in rows], dtype=np.float64)
+    similarity = np.zeros(len(rows), dtype=np.float64)
+    if profile is not None and profile.count:
+        similarity = profile.mean_similarity(r["recipe_id"] for r in rows)
+    final = weight_ratio * ratio + weight_similarity * similarity
+    # ordinamento stabile: a parità di final_score resta l'ordine SQL
+    order = np.argsort(-final, kind="stable")[: max(0, int(limit))]
+    result = []
+    for i in order:
+        row = rows[i]
+        row["similarity"] = float(similarity[i])
+        row["final_score"] = float(final[i])
+        result.append(row)
+    return result
+
+
+def _resolve_backend(backend: Optional[str]) -> str:
+    backend = (backend or RANKING_BACKEND).strip().lower()
+    if backend not in RANKING_BACKENDS:
+        logger.warning(f"RANKING_BACKEND '{backend}' non valido (ammessi: {', '.join(RANKING_BACKENDS)}), uso 'sql'")
+        return "sql"
+    return backend
+
+
+def _resolve_match_mode(match_mode: Optional[str]) -> str:
+    match_mode = (match_mode or RANKING_MATCH_MODE).strip().lower()
+    if match_mode not in RANKING_MATCH_MODES:
+        logger.warning(
+            f"RANKING_MATCH_MODE '{match_mode}' non valido (ammessi: {', '.join(RANKING_MATCH_MODES)}), uso 'exact'"
+        )
+        return "exact"
+    return match_mode
+
+
+def _resolve_ratio_mode(ratio_mode: Optional[str]) -> str:
+    ratio_mode = (ratio_mode or RANKING_RATIO_MODE).strip().lower()
+    if ratio_mode not in RANKING_RATIO_MODES:
+        logger.warning(
+            f"RANKING_RATIO_MODE '{ratio_mode}' non valido (ammessi: {', '.join(RANKING_RATIO_MODES)}), uso 'count'"
+        )
+        return "count"
+    return ratio_mode
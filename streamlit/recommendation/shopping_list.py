@@ -0,0 +1,230 @@
+"""
+Lista della spesa: pochi ingredienti da comprare che sbloccano più ricette possibili.
+
+Dato il frigo dell'utente (FridgeMatch di fridge_index) e un budget di 1-5 ingredienti, si cerca
+l'insieme S con |S| <= budget che massimizza le ricette nuove con tutti gli ingredienti in
+frigo ∪ S (budgeted max coverage). Una ricetta si sblocca solo quando si comprano tutti i suoi
+ingredienti mancanti, quindi il guadagno di un singolo ingrediente non è submodulare (comprarne
+uno può aumentare il guadagno di un altro) e il limite superiore della lazy greedy (CELF) non
+vale. Le unità di acquisto sono quindi i "pacchetti": l'insieme residuo di ingredienti mancanti
+di ciascuna ricetta candidata (mancano al massimo budget ingredienti, dall'indice bitmap). Il
+greedy sceglie a ogni passo il pacchetto con più ricette sbloccate per ingrediente comprato e alla
+fine confronta il risultato con il miglior pacchetto singolo entro il budget (come nel greedy per
+budgeted max coverage).
+
+Guadagni esatti e incrementali. Ogni residuo distinto R (al massimo budget slot, ingredienti
+ordinati) è sia un contatore (ricette ancora bloccate con residuo esattamente R) sia un pacchetto.
+I sottoinsiemi di tutti i residui formano un universo di chiavi e la matrice sparsa
+A (pacchetti x chiavi) vale 1 dove la chiave è un sottoinsieme del pacchetto; allora
+    guadagno(U \\ S) = (A @ cnt)[U]
+perché i residui correnti non contengono mai ingredienti già comprati. A è fissa: un acquisto P
+sposta solo i contatori dei residui che intersecano P (da R a R \\ P) e i guadagni si aggiornano
+con le sole colonne cambiate, guadagni += A[:, cambiate] @ delta.
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from recommendation.fridge_index import FridgeMatch, unpack_bits
+
+logger = logging.getLogger(__name__)
+
+# Budget massimo di ingredienti da comprare (le ricette candidate sono quelle a cui ne mancano al massimo tanti)
+MAX_PURCHASE_BUDGET = 5
+
+
+def _popcount_small(masks: np.ndarray) -> np.ndarray:
+    """Bit a 1 di maschere di slot (al massimo MAX_PURCHASE_BUDGET bit)."""
+    return sum((masks >> s) & 1 for s in range(MAX_PURCHASE_BUDGET))
+
+
+class _PurchasePlanner:
+    """
+    Stato del greedy sui residui distinti delle ricette candidate.
+      - slots:  (n, budget) int64, ingredienti (indici locali) di ogni residuo, ordinati, con m
+                come riempitivo
+      - keys:   (n, 2^budget) int64, indice nell'universo della chiave del sottoinsieme di slot
+                indicato dalla maschera (-1 se la maschera è vuota o usa slot vuoti)
+      - A:      CSC (n, K), pacchetto x sottoinsieme
+      - alive:  (n,) maschera degli slot non ancora comprati di ogni residuo
+    """
+
+    def __init__(self, slots: np.ndarray, sizes: np.ndarray, counts: np.ndarray, n_relevant: int):
+        n, width = slots.shape
+        self.slots = slots
+        self.counts = counts
+        radix = n_relevant + 1
+        raw = np.full((n, 1 << width), -1, dtype=np.int64)
+        for p in range(1, 1 << width):
+            chosen = [s for s in range(width) if p >> s & 1]
+            valid = sizes > chosen[-1]
+            key = np.zeros(n, dtype=np.int64)
+            for s in reversed(chosen):
+                key = key * radix + slots[:, s] + 1
+            raw[valid, p] = key[valid]
+        used = raw >= 0
+        universe, inverse = np.unique(raw[used], return_inverse=True)
+        self.keys = np.full(raw.shape, -1, dtype=np.int64)
+        self.keys[used] = inverse.ravel()
+        self.A = sparse.csc_matrix(
+            (np.ones(inverse.shape[0], dtype=np.int64), (np.nonzero(used)[0], self.keys[used])),
+            shape=(n, universe.shape[0]),
+        )
+        self.alive = (np.int64(1) << sizes) - 1
+        self.cnt = np.zeros(universe.shape[0], dtype=np.int64)
+        np.add.at(self.cnt, self.keys[np.arange(n), self.alive], counts)
+        self.gains = self.A @ self.cnt
+
+    def best(self, budget_left: int) -> Optional[int]:
+        """Pacchetto con più ricette per ingrediente entro il budget (a pari rapporto il più piccolo)."""
+        size = _popcount_small(self.alive)
+        eligible = np.flatnonzero((size > 0) & (size <= budget_left) & (self.gains > 0))
+        if eligible.size == 0:
+            return None
+        ratio = self.gains[eligible] / size[eligible]
+        order = np.lexsort((eligible, size[eligible], -ratio))
+        return int(eligible[order[0]])
+
+    def purchase_of(self, bundle: int) -> np.ndarray:
+        """Ingredienti (indici locali) ancora da comprare del pacchetto."""
+        alive = int(self.alive[bundle])
+        return np.array([self.slots[bundle, s] for s in range(self.slots.shape[1]) if alive >> s & 1], dtype=np.int64)
+
+    def buy(self, purchase: np.ndarray) -> np.ndarray:
+        """Compra gli ingredienti indicati: residui sbloccati, aggiornando contatori e guadagni."""
+        hit = np.isin(self.slots, purchase)
+        hit_mask = (hit.astype(np.int64) << np.arange(self.slots.shape[1])).sum(axis=1)
+        touched = np.flatnonzero((hit_mask & self.alive) != 0)
+        old_keys = self.keys[touched, self.alive[touched]]
+        self.alive[touched] &= ~hit_mask[touched]
+        new_alive = self.alive[touched]
+        new_keys = self.keys[touched, new_alive]
+        remaining = new_alive != 0
+
+        # i contatori passano da R a R \ P (o escono se la ricetta si sblocca)
+        columns = np.concatenate([old_keys, new_keys[remaining]])
+        values = np.concatenate([-self.counts[touched], self.counts[touched][remaining]])
+        changed, inverse = np.unique(columns, return_inverse=True)
+        delta = np.bincount(inverse.ravel(), weights=values, minlength=changed.shape[0]).astype(np.int64)
+        self.cnt[changed] += delta
+        self.gains += self.A[:, changed] @ delta
+        return touched[~remaining]
+
+
+def _candidate_residuals(
+    match: FridgeMatch, budget: int, category_id: Optional[int]
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Ricette bloccate a cui mancano al massimo budget ingredienti, raggruppate per residuo:
+    (slots (n, budget), sizes (n,), indptr e righe del catalogo di ogni residuo, ingredienti rilevanti).
+    """
+    index = match.index
+    catalog = index.catalog
+    candidates = match.missing_at_most(budget, category_id) & ~match.makeable(category_id)
+    rows = index.rows(candidates)
+    empty = np.zeros(0, dtype=np.int64)
+    if rows.size == 0:
+        return np.zeros((0, budget), dtype=np.int64), empty, np.zeros(1, dtype=np.int64), empty, empty
+
+    # ingredienti mancanti delle candidate dal CSR del catalogo, ordinati per ricetta e ingrediente
+    starts = catalog.ri_indptr[rows]
+    lengths = catalog.ri_indptr[rows + 1] - starts
+    row_of = np.repeat(np.arange(rows.shape[0]), lengths)
+    offsets = np.arange(row_of.shape[0]) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    positions = catalog.ri_ingredients[np.repeat(starts, lengths) + offsets].astype(np.int64)
+    owned = unpack_bits(match.fridge, catalog.n_ingredients)
+    missing = ~owned[positions]
+    row_of, positions = row_of[missing], positions[missing]
+    order = np.lexsort((positions, row_of))
+    row_of, positions = row_of[order], positions[order]
+
+    # le chiavi dei sottoinsiemi sono interi in base m + 1 a budget cifre: oltre max_relevant
+    # ingredienti rilevanti si tengono i più frequenti, scartando le ricette che ne chiedono altri
+    max_relevant = 2 ** (63 // budget) - 1
+    relevant, local, frequency = np.unique(positions, return_inverse=True, return_counts=True)
+    if relevant.shape[0] > max_relevant:
+        kept = np.zeros(relevant.shape[0], dtype=bool)
+        kept[np.argsort(-frequency, kind="stable")[:max_relevant]] = True
+        dropped = np.zeros(rows.shape[0], dtype=bool)
+        dropped[row_of[~kept[local.ravel()]]] = True
+        keep = ~dropped[row_of]
+        row_of, positions = row_of[keep], positions[keep]
+        rows = rows[~dropped]
+        row_of = np.cumsum(~dropped)[row_of] - 1
+        if rows.size == 0:
+            return np.zeros((0, budget), dtype=np.int64), empty, np.zeros(1, dtype=np.int64), empty, empty
+        relevant, local = np.unique(positions, return_inverse=True)
+    m = relevant.shape[0]
+    sizes = np.bincount(row_of, minlength=rows.shape[0])
+    slot = np.arange(row_of.shape[0]) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    per_recipe = np.full((rows.shape[0], budget), m, dtype=np.int64)
+    per_recipe[row_of, slot] = local.ravel()
+
+    # residui distinti e righe del catalogo di ciascuno
+    slots, residual_of, counts = np.unique(per_recipe, axis=0, return_inverse=True, return_counts=True)
+    members = rows[np.argsort(residual_of.ravel(), kind="stable")]
+    indptr = np.concatenate([[0], np.cumsum(counts)])
+    sizes = (slots < m).sum(axis=1)
+    return slots, sizes, indptr, members, relevant
+
+
+def suggest_purchases(
+    match: FridgeMatch, budget: int = 3, category_id: Optional[int] = None
+) -> List[Dict]:
+    """
+    Ingredienti da comprare (al massimo budget, fino a MAX_PURCHASE_BUDGET) per sbloccare più
+    ricette possibili, eventualmente solo nella categoria indicata. Ritorna i passi in ordine:
+    dict con ingredient_ids / ingredient_names comprati e recipe_ids / recipe_names sbloccate.
+    """
+    budget = max(0, min(int(budget), MAX_PURCHASE_BUDGET))
+    if budget == 0:
+        return []
+    slots, sizes, indptr, members, relevant = _candidate_residuals(match, budget, category_id)
+    if slots.shape[0] == 0:
+        return []
+    counts = np.diff(indptr)
+    planner = _PurchasePlanner(slots, sizes, counts, relevant.shape[0])
+
+    # miglior pacchetto singolo entro il budget, dai guadagni iniziali
+    single = int(np.lexsort((np.arange(sizes.shape[0]), sizes, -planner.gains))[0])
+    single_gain = int(planner.gains[single])
+    single_purchase = planner.purchase_of(single)
+
+    steps: List[Tuple[np.ndarray, np.ndarray]] = []
+    budget_left = budget
+    while budget_left > 0:
+        bundle = planner.best(budget_left)
+        if bundle is None:
+            break
+        purchase = planner.purchase_of(bundle)
+        steps.append((purchase, planner.buy(purchase)))
+        budget_left -= purchase.shape[0]
+
+    greedy_total = sum(int(counts[unlocked].sum()) for _purchase, unlocked in steps)
+    if single_gain > greedy_total:
+        replay = _PurchasePlanner(slots, sizes, counts, relevant.shape[0])
+        steps = [(single_purchase, replay.buy(single_purchase))]
+    return [_step_row(match, relevant, indptr, members, purchase, unlocked) for purchase, unlocked in steps]
+
+
+def _step_row(
+    match: FridgeMatch,
+    relevant: np.ndarray,
+    indptr: np.ndarray,
+    members: np.ndarray,
+    purchase: np.ndarray,
+    unlocked: np.ndarray,
+) -> Dict:
+    c = match.index.catalog
+    positions = relevant[purchase]
+    rows = [int(r) for u in unlocked for r in members[indptr[u]:indptr[u + 1]]]
+    rows.sort(key=c.recipe_names.__getitem__)
+    return {
+        "ingredient_ids": [int(c.ingredient_ids[p]) for p in positions],
+        "ingredient_names": [c.ingredient_names[p] for p in positions],
+        "recipe_ids": [int(c.recipe_ids[r]) for r in rows],
+        "recipe_names": [c.recipe_names[r] for r in rows],
+    }
@@ -0,0 +1,535 @@
+"""
+Indice di similarità sparso tra ricette.
+
+Invece della matrice densa NxN restituita da cosine_similarity, l'indice conserva
+solo i top-K vicini di ogni ricetta (array paralleli id/score in float32) e, se
+disponibili, i vettori TF-IDF normalizzati per calcolare on-demand la similarità
+esatta tra due ricette qualsiasi.
+La costruzione procede a blocchi di righe, quindi la matrice completa non esiste
+mai in memoria: il picco è workers x block_size x N float32. I blocchi sono
+indipendenti e vengono calcolati in parallelo su un pool di thread (prodotto sparso,
+toarray e argpartition rilasciano il GIL, e i thread condividono X senza copiarla).
+L'indice può essere salvato come artefatto versionato (file .npy + manifest.json)
+e ricaricato in memory-map all'avvio delle pagine.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK_SIZE = 512
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+
+class SimilarityIndex:
+    """
+    Top-K vicini per ricetta.
+      - recipe_ids: array (N,) con gli id ricetta nell'ordine delle righe
+      - neighbor_idx: array (N, K) int32 con gli indici di riga dei vicini (-1 = slot vuoto)
+      - neighbor_scores: array (N, K) float32 con le similarità, in ordine decrescente
+      - vectors: matrice CSR (N, V) L2-normalizzata, opzionale (per score esatti)
+    """
+
+    def __init__(
+        self,
+        recipe_ids: np.ndarray,
+        neighbor_idx: np.ndarray,
+        neighbor_scores: np.ndarray,
+        vectors: Optional[sparse.csr_matrix] = None,
+    ):
+        self.recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        self.neighbor_idx = neighbor_idx
+        self.neighbor_scores = neighbor_scores
+        self.vectors = vectors
+        self._rid_to_idx: Dict[int, int] = {int(rid): i for i, rid in enumerate(self.recipe_ids)}
+        self._sorter: Optional[np.ndarray] = None
+
+    def __len__(self) -> int:
+        return int(self.recipe_ids.shape[0])
+
+    @property
+    def top_k(self) -> int:
+        return int(self.neighbor_idx.shape[1])
+
+    def index_of(self, recipe_id: int) -> Optional[int]:
+        return self._rid_to_idx.get(int(recipe_id))
+
+    def rows_of(self, recipe_ids: Iterable[int]) -> np.ndarray:
+        """Versione vettoriale di index_of: array di indici di riga, -1 per le ricette fuori indice."""
+        ids = np.fromiter((int(r) for r in recipe_ids), dtype=np.int64)
+        n = len(self)
+        if n == 0 or ids.size == 0:
+            return np.full(ids.shape[0], -1, dtype=np.int64)
+        if self._sorter is None:
+            self._sorter = np.argsort(self.recipe_ids, kind="stable")
+        pos = np.minimum(np.searchsorted(self.recipe_ids[self._sorter], ids), n - 1)
+        rows = self._sorter[pos].astype(np.int64)
+        rows[self.recipe_ids[rows] != ids] = -1
+        return rows
+
+    def neighbors(self, recipe_id: int, k: Optional[int] = None) -> List[Tuple[int, float]]:
+        """Ritorna fino a k coppie (recipe_id, score) più simili, esclusa la ricetta stessa."""
+        i = self.index_of(recipe_id)
+        if i is None:
+            return []
+        k = self.top_k if k is None else min(int(k), self.top_k)
+        idx = self.neighbor_idx[i, :k]
+        scores = self.neighbor_scores[i, :k]
+        valid = idx >= 0
+        return [
+            (int(self.recipe_ids[j]), float(s))
+            for j, s in zip(idx[valid], scores[valid])
+        ]
+
+    def score(self, a: int, b: int) -> float:
+        """
+        Similarità tra le ricette a e b.
+        Esatta se i vettori sono disponibili, altrimenti letta dai top-K (0.0 se fuori dai top-K).
+        """
+        ia = self.index_of(a)
+        ib = self.index_of(b)
+        if ia is None or ib is None:
+            return 0.0
+        if self.vectors is not None:
+            return float(self.vectors[ia].multiply(self.vectors[ib]).sum())
+        if ia == ib:
+            return 1.0
+        for row, col in ((ia, ib), (ib, ia)):
+            hits = np.flatnonzero(self.neighbor_idx[row] == col)
+            if hits.size:
+                return float(self.neighbor_scores[row, hits[0]])
+        return 0.0
+
+    @property
+    def profile_size(self) -> int:
+        """Dimensione dei vettori profilo: feature TF-IDF se i vettori ci sono, altrimenti numero di ricette."""
+        return int(self.vectors.shape[1]) if self.vectors is not None else len(self)
+
+    def add_to_profile(self, profile: np.ndarray, recipe_id: int, sign: float = 1.0) -> bool:
+        """
+        Aggiunge (sign=1) o toglie (sign=-1) in place il contributo di una ricetta a un vettore
+        profilo di dimensione profile_size: la sua riga TF-IDF, oppure senza vettori la sua riga
+        di similarità top-K (più 1.0 su se stessa). Costo O(nnz della riga). False se fuori indice.
+        """
+        i = self.index_of(recipe_id)
+        if i is None:
+            return False
+        if self.vectors is not None:
+            start, stop = self.vectors.indptr[i], self.vectors.indptr[i + 1]
+            np.add.at(profile, self.vectors.indices[start:stop], sign * self.vectors.data[start:stop])
+        else:
+            idx = self.neighbor_idx[i]
+            hit = idx >= 0
+            np.add.at(profile, idx[hit], sign * self.neighbor_scores[i][hit])
+            profile[i] += sign
+        return True
+
+    def score_profile(self, recipe_ids: Iterable[int], profile: np.ndarray, count: int) -> np.ndarray:
+        """Similarità media delle ricette con le count sorgenti sommate in profile (0.0 fuori indice)."""
+        targets = self.rows_of(recipe_ids)
+        result = np.zeros(targets.shape[0], dtype=np.float64)
+        if count <= 0:
+            return result
+        valid = targets >= 0
+        if self.vectors is not None:
+            result[valid] = self.vectors[targets[valid]] @ profile
+        else:
+            result[valid] = profile[targets[valid]]
+        return result / count
+
+    def mean_similarity(self, recipe_ids: Iterable[int], source_ids: Iterable[int]) -> np.ndarray:
+        """
+        Similarità media di ciascuna ricetta di recipe_ids rispetto alle ricette source_ids
+        (es. i preferiti dell'utente), calcolata per tutte le ricette in un colpo solo.
+        Le sorgenti fuori indice sono ignorate; le ricette fuori indice valgono 0.0.
+        Con i vettori la media dei prodotti scalari è il prodotto con il vettore medio delle
+        sorgenti (un mat-vec sparso); senza, si sommano i top-K delle sorgenti.
+        """
+        profile = np.zeros(self.profile_size, dtype=np.float64)
+        count = sum(self.add_to_profile(profile, rid) for rid in set(int(r) for r in source_ids))
+        return self.score_profile(recipe_ids, profile, count)
+
+
+def _top_k_block(block: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Seleziona per ogni riga del blocco denso i k valori maggiori (argpartition),
+    ordinati per score decrescente e, a parità, per indice crescente.
+    """
+    n_rows, n_cols = block.shape
+    if k <= 0 or n_cols == 0:
+        return np.empty((n_rows, 0), dtype=np.int32), np.empty((n_rows, 0), dtype=np.float32)
+    if k < n_cols:
+        part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(n_cols), (n_rows, n_cols)).copy()
+    scores = np.take_along_axis(block, part, axis=1)
+    order = np.lexsort((part, -scores), axis=-1)
+    return (
+        np.take_along_axis(part, order, axis=1).astype(np.int32),
+        np.take_along_axis(scores, order, axis=1).astype(np.float32),
+    )
+
+
+def top_k_per_row(
+    scores: np.ndarray,
+    k: int,
+    self_columns: Optional[Iterable[int]] = None,
+    batch_size: int = DEFAULT_BLOCK_SIZE,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k colonne per ciascuna riga di una matrice densa di score (Q, N), a lotti di batch_size
+    righe: argpartition O(N) per riga, poi ordinamento dei soli k (score decrescente, indice
+    crescente a parità). self_columns indica per ogni riga la colonna da escludere (es. la
+    ricetta stessa; -1 = nessuna).
+    Ritorna (idx int32, score float32) di forma (Q, k); se una riga ha meno di k colonne
+    disponibili gli slot in eccesso valgono -1 / 0.0.
+    """
+    scores = np.atleast_2d(np.asarray(scores))
+    n_rows, n_cols = scores.shape
+    k = max(0, int(k))
+    if self_columns is not None:
+        self_columns = np.fromiter((int(c) for c in self_columns), dtype=np.int64)
+        if self_columns.shape[0] != n_rows:
+            raise ValueError("self_columns deve avere un elemento per riga")
+    out_idx = np.full((n_rows, k), -1, dtype=np.int32)
+    out_scores = np.zeros((n_rows, k), dtype=np.float32)
+    available = min(k, n_cols)
+    if available == 0:
+        return out_idx, out_scores
+
+    batch_size = max(1, int(batch_size))
+    for start in range(0, n_rows, batch_size):
+        stop = min(start + batch_size, n_rows)
+        # copia del lotto (nella precisione dell'input) su cui marcare le colonne escluse
+        block = np.array(scores[start:stop], dtype=np.result_type(scores.dtype, np.float32))
+        if self_columns is not None:
+            rows = np.arange(stop - start)
+            cols = self_columns[start:stop]
+            excluded = cols >= 0
+            block[rows[excluded], cols[excluded]] = -np.inf
+        idx, top = _top_k_block(block, available)
+        # le colonne escluse finiscono in coda solo quando k copre tutta la riga
+        empty = np.isneginf(top)
+        idx[empty] = -1
+        top[empty] = 0.0
+        out_idx[start:stop, :available] = idx
+        out_scores[start:stop, :available] = top
+    return out_idx, out_scores
+
+
+def _fill_top_k_rows(
+    X: sparse.csr_matrix,
+    XT: sparse.csc_matrix,
+    rows: np.ndarray,
+    k: int,
+    neighbor_idx: np.ndarray,
+    neighbor_scores: np.ndarray,
+    block_size: int,
+    workers: int,
+) -> None:
+    """
+    Scrive in neighbor_idx/neighbor_scores il top-K (self escluso) delle righe indicate,
+    calcolando X[blocco] @ X.T a blocchi di block_size righe su workers thread.
+    Ogni blocco scrive solo le proprie righe, quindi il risultato non dipende da workers.
+    """
+
+    def run(start: int) -> None:
+        sel = rows[start:start + block_size]
+        block = (X[sel] @ XT).toarray()
+        block[np.arange(sel.shape[0]), sel] = -np.inf  # escludi self
+        neighbor_idx[sel], neighbor_scores[sel] = _top_k_block(block, k)
+
+    starts = range(0, rows.shape[0], block_size)
+    workers = max(1, min(int(workers), len(starts)))
+    if workers == 1:
+        for start in starts:
+            run(start)
+        return
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # list() propaga le eventuali eccezioni dei thread
+        list(executor.map(run, starts))
+
+
+def build_similarity_index(
+    X: sparse.spmatrix,
+    recipe_ids: Iterable[int],
+    top_k: int = DEFAULT_TOP_K,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    keep_vectors: bool = True,
+    workers: int = 1,
+) -> SimilarityIndex:
+    """
+    Costruisce l'indice top-K calcolando X_block @ X.T per blocchi di righe, su workers thread.
+    La similarità coseno coincide con il prodotto scalare perché le righe sono L2-normalizzate.
+    """
+    X = normalize(sparse.csr_matrix(X, dtype=np.float32), norm="l2", copy=False)
+    recipe_ids = np.fromiter((int(r) for r in recipe_ids), dtype=np.int64)
+    n = X.shape[0]
+    if recipe_ids.shape[0] != n:
+        raise ValueError("recipe_ids e X devono avere lo stesso numero di righe")
+
+    k = max(0, min(int(top_k), n - 1))
+    block_size = max(1, int(block_size))
+    neighbor_idx = np.full((n, k), -1, dtype=np.int32)
+    neighbor_scores = np.zeros((n, k), dtype=np.float32)
+
+    _fill_top_k_rows(X, X.T.tocsc(), np.arange(n), k, neighbor_idx, neighbor_scores, block_size, workers)
+
+    return SimilarityIndex(
+        recipe_ids,
+        neighbor_idx,
+        neighbor_scores,
+        vectors=X if keep_vectors else None,
+    )
+
+
+def _merge_top_k(idx: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tiene per ogni riga i k migliori tra candidati (idx, score) già calcolati, ordinati per
+    score decrescente e, a parità, per indice crescente; gli slot vuoti (idx -1) finiscono in coda.
+    """
+    scores = np.where(idx >= 0, scores, -np.inf)
+    order = np.lexsort((idx, -scores), axis=-1)[:, :k]
+    idx = np.take_along_axis(idx, order, axis=1).astype(np.int32)
+    scores = np.take_along_axis(scores, order, axis=1).astype(np.float32)
+    scores[idx < 0] = 0.0
+    return idx, scores
+
+
+def update_similarity_index(
+    index: SimilarityIndex,
+    X: sparse.spmatrix,
+    recipe_ids: Iterable[int],
+    dirty_rows: Iterable[int],
+    block_size: int = DEFAULT_BLOCK_SIZE,
+    workers: int = 1,
+) -> SimilarityIndex:
+    """
+    Aggiorna l'indice dopo l'aggiunta, la modifica o la rimozione di alcune ricette senza
+    ricalcolare tutte le righe.
+
+    X sono i vettori L2-normalizzati del nuovo catalogo (righe nell'ordine di recipe_ids);
+    dirty_rows sono le righe di X nuove o con il vettore cambiato, mentre per tutte le altre
+    X deve coincidere con index.vectors. Le ricette dell'indice assenti da recipe_ids sono rimosse.
+      - righe sporche e vicini inversi (righe il cui top-K conteneva una ricetta modificata o
+        rimossa): ricalcolo completo con X_riga @ X.T;
+      - tutte le altre: il vecchio top-K resta valido e basta fonderlo con gli score verso le
+        righe sporche, calcolati solo per le righe in cui superano il k-esimo vicino.
+    Il risultato coincide con una ricostruzione completa sugli stessi vettori, a meno della
+    scelta tra vicini a pari score sul bordo del top-K.
+    """
+    if index.vectors is None:
+        raise ValueError("l'aggiornamento incrementale richiede i vettori nell'indice")
+    X = sparse.csr_matrix(X, dtype=np.float32)
+    recipe_ids = np.fromiter((int(r) for r in recipe_ids), dtype=np.int64)
+    n = X.shape[0]
+    if recipe_ids.shape[0] != n:
+        raise ValueError("recipe_ids e X devono avere lo stesso numero di righe")
+    k = index.top_k
+    if k > max(0, n - 1):
+        raise ValueError(f"top_k={k} non applicabile a un catalogo di {n} ricette")
+    block_size = max(1, int(block_size))
+
+    old_rows = index.rows_of(recipe_ids)
+    dirty = old_rows < 0
+    dirty[np.fromiter((int(r) for r in dirty_rows), dtype=np.int64)] = True
+    kept = np.flatnonzero(~dirty)
+    old_to_new = np.full(len(index), -1, dtype=np.int64)
+    old_to_new[old_rows[kept]] = kept
+
+    # vecchi top-K delle righe invariate: chi aveva tra i vicini una ricetta cambiata o rimossa
+    # ha perso un vicino e va ricalcolato (il successivo non è noto)
+    old_lists = np.asarray(index.neighbor_idx)[old_rows[kept]].astype(np.int64)
+    old_scores = np.asarray(index.neighbor_scores)[old_rows[kept]]
+    stale = (old_lists >= 0) & (old_to_new[np.maximum(old_lists, 0)] < 0)
+    touched = stale.any(axis=1)
+
+    neighbor_idx = np.full((n, k), -1, dtype=np.int32)
+    neighbor_scores = np.zeros((n, k), dtype=np.float32)
+    dirty_idx = np.flatnonzero(dirty)
+    recompute = np.union1d(dirty_idx, kept[touched])
+    _fill_top_k_rows(X, X.T.tocsc(), recompute, k, neighbor_idx, neighbor_scores, block_size, workers)
+
+    merge = kept[~touched]
+    lists = old_lists[~touched]
+    lists = np.where(lists >= 0, old_to_new[np.maximum(lists, 0)], -1)
+    scores = old_scores[~touched]
+    neighbor_idx[merge] = lists
+    neighbor_scores[merge] = scores
+    if merge.shape[0] and dirty_idx.shape[0] and k:
+        # score verso le righe sporche (prodotto sparso): servono solo dove superano il k-esimo vicino
+        cand = sparse.csr_matrix(X[merge] @ X[dirty_idx].T)
+        coo = cand.tocoo()
+        rows = np.unique(coo.row[coo.data > scores[coo.row, k - 1]])
+        for start in range(0, rows.shape[0], block_size):
+            sel = rows[start:start + block_size]
+            block = cand[sel].toarray()
+            idx, top = _merge_top_k(
+                np.hstack([lists[sel], np.broadcast_to(dirty_idx, block.shape)]),
+                np.hstack([scores[sel], block]),
+                k,
+            )
+            neighbor_idx[merge[sel]] = idx
+            neighbor_scores[merge[sel]] = top
+
+    return SimilarityIndex(recipe_ids, neighbor_idx, neighbor_scores, vectors=X)
+
+
+# --------------- Artefatto persistito ---------------
+
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VOCABULARY_FILE = "vocabulary.json"
+IDF_FILE = "idf.npy"
+DOC_HASHES_FILE = "doc_hashes.npy"
+_ARRAY_FILES = {
+    "recipe_ids": "recipe_ids.npy",
+    "neighbor_idx": "neighbor_idx.npy",
+    "neighbor_scores": "neighbor_scores.npy",
+    "vectors_data": "vectors_data.npy",
+    "vectors_indices": "vectors_indices.npy",
+    "vectors_indptr": "vectors_indptr.npy",
+}
+
+
+def save_similarity_artifact(
+    index: SimilarityIndex,
+    artifact_dir: Path,
+    catalog_hash: str,
+    vocabulary: Optional[List[str]] = None,
+    idf: Optional[np.ndarray] = None,
+    params: Optional[Dict] = None,
+    doc_hashes: Optional[np.ndarray] = None,
+    fit: Optional[Dict] = None,
+) -> Dict:
+    """
+    Scrive l'indice come insieme di file .npy memory-mappabili più un manifest JSON.
+    doc_hashes (un hash del testo per riga) e fit (informazioni sull'ultimo addestramento
+    completo del TF-IDF) servono agli aggiornamenti incrementali.
+    La scrittura avviene in una directory temporanea poi sostituita a quella esistente,
+    così un processo che legge non vede mai un artefatto scritto a metà.
+    """
+    artifact_dir = Path(artifact_dir)
+    artifact_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{artifact_dir.name}-", dir=artifact_dir.parent))
+    try:
+        arrays = {
+            "recipe_ids": index.recipe_ids,
+            "neighbor_idx": index.neighbor_idx,
+            "neighbor_scores": index.neighbor_scores,
+        }
+        if index.vectors is not None:
+            vectors = sparse.csr_matrix(index.vectors)
+            arrays["vectors_data"] = vectors.data.astype(np.float32, copy=False)
+            arrays["vectors_indices"] = vectors.indices
+            arrays["vectors_indptr"] = vectors.indptr
+        for key, arr in arrays.items():
+            np.save(tmp_dir / _ARRAY_FILES[key], np.ascontiguousarray(arr))
+
+        if vocabulary is not None:
+            with open(tmp_dir / VOCABULARY_FILE, "w", encoding="utf-8") as f:
+                json.dump(list(vocabulary), f, ensure_ascii=False)
+        if idf is not None:
+            np.save(tmp_dir / IDF_FILE, np.asarray(idf, dtype=np.float64))
+        if doc_hashes is not None:
+            np.save(tmp_dir / DOC_HASHES_FILE, np.asarray(doc_hashes, dtype=np.uint64))
+
+        manifest = {
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "catalog_hash": catalog_hash,
+            "n_recipes": len(index),
+            "top_k": index.top_k,
+            "n_features": int(index.vectors.shape[1]) if index.vectors is not None else None,
+            "files": sorted(_ARRAY_FILES[key] for key in arrays),
+            "params": params or {},
+            "fit": fit or {},
+        }
+        with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        old_dir = None
+        if artifact_dir.exists():
+            old_dir = artifact_dir.with_name(f".{artifact_dir.name}-old-{os.getpid()}")
+            os.replace(artifact_dir, old_dir)
+        os.replace(tmp_dir, artifact_dir)
+        if old_dir is not None:
+            shutil.rmtree(old_dir, ignore_errors=True)
+        return manifest
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def read_artifact_manifest(artifact_dir: Path) -> Optional[Dict]:
+    """Legge il manifest dell'artefatto; None se assente, illeggibile o di un formato diverso."""
+    try:
+        with open(Path(artifact_dir) / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        return None
+    return manifest
+
+
+def load_similarity_artifact(artifact_dir: Path, mmap: bool = True) -> Tuple[SimilarityIndex, Dict]:
+    """
+    Carica l'indice dall'artefatto. Con mmap=True gli array restano su disco (np.load mmap_mode='r')
+    e le pagine condividono la page cache del sistema operativo invece di copie private.
+    """
+    artifact_dir = Path(artifact_dir)
+    manifest = read_artifact_manifest(artifact_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Artefatto di similarità non valido in {artifact_dir}")
+    mmap_mode = "r" if mmap else None
+
+    def _load(key: str) -> np.ndarray:
+        return np.load(artifact_dir / _ARRAY_FILES[key], mmap_mode=mmap_mode, allow_pickle=False)
+
+    vectors = None
+    if _ARRAY_FILES["vectors_data"] in manifest.get("files", []):
+        indptr = _load("vectors_indptr")
+        vectors = sparse.csr_matrix(
+            (_load("vectors_data"), _load("vectors_indices"), indptr),
+            shape=(indptr.shape[0] - 1, int(manifest["n_features"])),
+            copy=False,
+        )
+    index = SimilarityIndex(
+        _load("recipe_ids"),
+        _load("neighbor_idx"),
+        _load("neighbor_scores"),
+        vectors=vectors,
+    )
+    return index, manifest
+
+
+def load_vectorizer_state(artifact_dir: Path) -> Tuple[Optional[List[str]], Optional[np.ndarray]]:
+    """Ritorna (vocabolario ordinato per colonna, idf) salvati nell'artefatto, se presenti."""
+    artifact_dir = Path(artifact_dir)
+    vocabulary = None
+    idf = None
+    if (artifact_dir / VOCABULARY_FILE).exists():
+        with open(artifact_dir / VOCABULARY_FILE, "r", encoding="utf-8") as f:
+            vocabulary = json.load(f)
+    if (artifact_dir / IDF_FILE).exists():
+        idf = np.load(artifact_dir / IDF_FILE, allow_pickle=False)
+    return vocabulary, idf
+
+
+def load_doc_hashes(artifact_dir: Path) -> Optional[np.ndarray]:
+    """Hash del testo di ogni ricetta (ordine delle righe dell'indice), se salvati nell'artefatto."""
+    path = Path(artifact_dir) / DOC_HASHES_FILE
+    if not path.exists():
+        return None
+    return np.load(path, allow_pickle=False)
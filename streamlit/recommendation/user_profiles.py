@@ -0,0 +1,143 @@
+"""
+Profili di preferenza per utente, condivisi dal processo.
+
+Il profilo di un utente è la somma dei vettori TF-IDF delle sue ricette preferite più il loro
+numero: la similarità media di una ricetta con i preferiti è il prodotto scalare con
+somma / numero, quindi valutare una candidata costa un solo prodotto, qualunque sia la
+lunghezza dello storico. Senza vettori nell'indice il profilo è la somma delle righe di
+similarità top-K (vedi SimilarityIndex.add_to_profile).
+
+I profili vivono in una cache LRU (USER_PROFILE_CACHE_SIZE utenti) e vengono aggiornati in
+modo incrementale: add_favorite/remove_favorite sommano o sottraggono una sola riga e, a ogni
+lettura, l'insieme dei preferiti letto dal DB viene riconciliato applicando solo le differenze
+(es. modifiche fatte da un altro processo). Quando cambia l'indice di similarità la cache si svuota.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional, Set
+
+import numpy as np
+
+from recommendation.similarity_index import SimilarityIndex
+
+logger = logging.getLogger(__name__)
+
+# Numero massimo di profili utente tenuti in memoria
+USER_PROFILE_CACHE_SIZE = int(os.getenv("USER_PROFILE_CACHE_SIZE", "256"))
+
+
+class UserProfile:
+    """Somma dei contributi dei preferiti (vector) e insieme dei preferiti che vi contribuiscono."""
+
+    def __init__(self, index: SimilarityIndex):
+        self.index = index
+        self.vector = np.zeros(index.profile_size, dtype=np.float64)
+        self.favorite_ids: Set[int] = set()
+        self.count = 0  # preferiti presenti nell'indice
+
+    def add(self, recipe_id: int) -> None:
+        recipe_id = int(recipe_id)
+        if recipe_id in self.favorite_ids:
+            return
+        self.favorite_ids.add(recipe_id)
+        if self.index.add_to_profile(self.vector, recipe_id, 1.0):
+            self.count += 1
+
+    def remove(self, recipe_id: int) -> None:
+        recipe_id = int(recipe_id)
+        if recipe_id not in self.favorite_ids:
+            return
+        self.favorite_ids.discard(recipe_id)
+        if self.index.add_to_profile(self.vector, recipe_id, -1.0):
+            self.count -= 1
+            if self.count == 0:
+                # azzera l'errore di arrotondamento accumulato
+                self.vector.fill(0.0)
+
+    def sync(self, favorite_ids: Iterable[int]) -> None:
+        """Allinea il profilo all'insieme di preferiti dato applicando solo le differenze."""
+        target = {int(fid) for fid in favorite_ids}
+        for rid in self.favorite_ids - target:
+            self.remove(rid)
+        for rid in target - self.favorite_ids:
+            self.add(rid)
+
+    def mean_similarity(self, recipe_ids: Iterable[int]) -> np.ndarray:
+        """Similarità media di ciascuna ricetta con i preferiti (0.0 se nessun preferito nell'indice)."""
+        return self.index.score_profile(recipe_ids, self.vector, self.count)
+
+
+class UserProfileStore:
+    """Cache LRU user_id -> UserProfile, legata a una specifica istanza dell'indice di similarità."""
+
+    def __init__(self, maxsize: int = USER_PROFILE_CACHE_SIZE):
+        self.maxsize = max(1, int(maxsize))
+        self._lock = threading.Lock()
+        self._profiles: "OrderedDict[int, UserProfile]" = OrderedDict()
+        self._index: Optional[SimilarityIndex] = None
+
+    def get(self, user_id: int, index: SimilarityIndex, favorite_ids: Iterable[int]) -> UserProfile:
+        """Profilo dell'utente allineato a favorite_ids (creato se assente, aggiornato per differenza)."""
+        user_id = int(user_id)
+        with self._lock:
+            if index is not self._index:
+                self._profiles.clear()
+                self._index = index
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                profile = UserProfile(index)
+                self._profiles[user_id] = profile
+                while len(self._profiles) > self.maxsize:
+                    self._profiles.popitem(last=False)
+            else:
+                self._profiles.move_to_end(user_id)
+            profile.sync(favorite_ids)
+            return profile
+
+    def favorite_added(self, user_id: int, recipe_id: int) -> None:
+        """Aggiorna il profilo in cache (se presente) dopo l'aggiunta di un preferito."""
+        with self._lock:
+            profile = self._profiles.get(int(user_id))
+            if profile is not None:
+                profile.add(recipe_id)
+
+    def favorite_removed(self, user_id: int, recipe_id: int) -> None:
+        """Aggiorna il profilo in cache (se presente) dopo la rimozione di un preferito."""
+        with self._lock:
+            profile = self._profiles.get(int(user_id))
+            if profile is not None:
+                profile.remove(recipe_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+            self._index = None
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+
+# --------------- Istanza condivisa per processo ---------------
+
+_store = UserProfileStore()
+
+
+def get_user_profile(user_id: int, index: SimilarityIndex, favorite_ids: Iterable[int]) -> UserProfile:
+    """Profilo di preferenza dell'utente (cache condivisa del processo)."""
+    return _store.get(user_id, index, favorite_ids)
+
+
+def notify_favorite_added(user_id: int, recipe_id: int) -> None:
+    _store.favorite_added(user_id, recipe_id)
+
+
+def notify_favorite_removed(user_id: int, recipe_id: int) -> None:
+    _store.favorite_removed(user_id, recipe_id)
+
+
+def invalidate_user_profiles() -> None:
+    """Scarta tutti i profili in memoria: verranno ricalcolati al prossimo accesso."""
+    _store.clear()